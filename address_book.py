@@ -0,0 +1,164 @@
+"""
+账户地址簿的本地索引
+
+从 Bitget 地址簿页面（/asset/addressBook）批量读取已添加的地址，保存为每个账户一个 JSON 索引，
+批量添加前用它过滤掉已经在白名单中的地址。
+
+- 读取在新标签页中进行，不影响正在填写的批量添加表单
+- 增量同步：地址簿按添加时间从新到旧排列，从第一页开始读，读到上次同步时就在地址簿中的地址为止（之后的都更早）；
+  提交后用 add() 加入索引的地址只用于过滤，不算作已同步，不会让增量同步提前停止
+- 完整同步：读完所有页并替换索引（地址簿中删除的地址也会从索引中移除）
+"""
+
+import os
+import re
+import json
+import time
+
+ADDRESS_BOOK_URL = "https://www.bitget.com/asset/addressBook"
+INDEX_DIR = "address_book"
+DEFAULT_ACCOUNT = "default"
+ANY_CHAIN = "*"  # 地址簿中看不出链时，按任意链匹配
+
+CHAIN_ALIASES = {"SOLANA": "SOL", "TRON": "TRX", "ETHEREUM": "ETH", "BNB": "BSC"}
+KNOWN_CHAINS = {
+    "SOL", "TRX", "TRC20", "ETH", "BSC", "BEP20", "ERC20", "ARB", "ARBITRUM", "OP", "OPTIMISM",
+    "BASE", "POLYGON", "MATIC", "AVAX", "AVAXC",
+}
+EVM_ADDRESS = re.compile(r"\b0x[0-9a-fA-F]{40}\b")
+BASE58_ADDRESS = re.compile(r"\b[1-9A-HJ-NP-Za-km-z]{32,44}\b")
+
+# 地址簿表格每一行的文字（Element UI 表格，兼容普通表格）
+ROWS_SCRIPT = """
+const rows = document.querySelectorAll('.el-table__body tr, table tbody tr');
+return Array.from(rows).map(row => row.innerText);
+"""
+# 点击下一页，没有下一页返回 false
+NEXT_PAGE_SCRIPT = """
+const button = document.querySelector('.el-pagination .btn-next');
+if (!button || button.disabled || button.classList.contains('is-disabled')) return false;
+button.click();
+return true;
+"""
+
+def normalize(address):
+    """EVM 地址不区分大小写，统一为小写"""
+    return address.lower() if address.startswith("0x") else address
+
+def parse_row(text):
+    """从一行文字中取出 [(地址, {链})]"""
+    words = {CHAIN_ALIASES.get(word, word) for word in re.findall(r"[A-Za-z0-9]+", text.upper())}
+    chains = words & KNOWN_CHAINS or {ANY_CHAIN}
+    found = [(addr, chains) for addr in EVM_ADDRESS.findall(text)]
+    for addr in BASE58_ADDRESS.findall(text):
+        if not addr.startswith("0x"):
+            found.append((addr, chains))
+    return found
+
+def _wait_for_rows(driver, previous=None, timeout=15):
+    """等待表格出现（或翻页后内容变化），返回每一行的文字，超时返回 []"""
+    end = time.time() + timeout
+    while time.time() < end:
+        rows = driver.execute_script(ROWS_SCRIPT) or []
+        if rows and rows != previous:
+            return rows
+        time.sleep(0.3)
+    return []
+
+class AddressBook:
+    """一个账户的地址簿索引: 地址 -> 链集合"""
+
+    def __init__(self, account=DEFAULT_ACCOUNT, base_path="."):
+        self.account = account
+        self.path = os.path.join(base_path, INDEX_DIR, f"{account}.json")
+        self.entries = {}
+        self.synced = set()  # 上次同步时从地址簿页面读到的地址
+        self.synced_at = None
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = {addr: set(chains) for addr, chains in data.get("entries", {}).items()}
+            # 旧的索引没有记录同步时读到的地址，下次同步按完整同步处理
+            if "synced" in data:
+                self.synced = set(data["synced"])
+                self.synced_at = data.get("synced_at")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def contains(self, address, chain):
+        """地址是否已在该链的地址簿中"""
+        chains = self.entries.get(normalize(address))
+        return bool(chains) and (ANY_CHAIN in chains or chain.upper() in chains)
+
+    def add(self, addresses, chain):
+        """把刚提交成功的地址加入索引（不必等下次同步），不加入 synced"""
+        for addr in addresses:
+            self.entries.setdefault(normalize(addr), set()).add(chain.upper())
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "account": self.account,
+            "synced_at": self.synced_at,
+            "synced": sorted(self.synced),
+            "entries": {addr: sorted(chains) for addr, chains in self.entries.items()},
+        }
+        temp_path = self.path + ".temp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    def sync(self, driver, full=False, timeout=15):
+        """从地址簿页面读取地址，返回 (读到的地址数, 新增的地址数, 读取的页数)"""
+        incremental = not full and self.synced_at is not None
+        fresh = {}
+        added = 0
+        pages = 0
+        original = driver.current_window_handle
+        driver.switch_to.new_window("tab")
+        try:
+            driver.get(ADDRESS_BOOK_URL)
+            rows = _wait_for_rows(driver, timeout=timeout)
+            while rows:
+                pages += 1
+                reached_synced = False
+                for text in rows:
+                    for addr, chains in parse_row(text):
+                        key = normalize(addr)
+                        if key not in self.entries and key not in fresh:
+                            added += 1
+                        reached_synced = reached_synced or key in self.synced
+                        fresh.setdefault(key, set()).update(chains)
+                if incremental and reached_synced:
+                    break
+                if not driver.execute_script(NEXT_PAGE_SCRIPT):
+                    break
+                rows = _wait_for_rows(driver, previous=rows, timeout=timeout)
+        finally:
+            driver.close()
+            driver.switch_to.window(original)
+        if incremental:
+            for addr, chains in fresh.items():
+                self.entries.setdefault(addr, set()).update(chains)
+            self.synced.update(fresh)
+        else:
+            self.entries = fresh
+            self.synced = set(fresh)
+        self.synced_at = time.time()
+        self.save()
+        return len(fresh), added, pages
+
+def current_account(base_path="."):
+    """上次使用的账户名"""
+    try:
+        with open(os.path.join(base_path, INDEX_DIR, ".current"), "r", encoding="utf-8") as f:
+            return f.read().strip() or DEFAULT_ACCOUNT
+    except OSError:
+        return DEFAULT_ACCOUNT
+
+def set_current_account(account, base_path="."):
+    os.makedirs(os.path.join(base_path, INDEX_DIR), exist_ok=True)
+    with open(os.path.join(base_path, INDEX_DIR, ".current"), "w", encoding="utf-8") as f:
+        f.write(account)
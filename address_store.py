@@ -0,0 +1,317 @@
+"""
+地址库：把 txt / csv / jsonl 地址列表编译成定长记录的二进制文件，运行时用 mmap 直接读取
+
+文件结构:
+    文件头   32 字节  HEADER
+    来源     u16 长度 + utf-8 源文件绝对路径，u16 长度 + utf-8 默认链（只有 ADDRSTR2）
+    链名表   每项 u16 长度 + utf-8
+    记录区   每条 RECORD 40 字节: 链序号, 编码方式, 长度, 备用, 标签偏移, 32 字节地址数据
+    字符串池 每项 u16 长度 + utf-8，标签后紧跟备注；超长地址也存放在这里
+"""
+
+import os
+import sys
+import csv
+import json
+import mmap
+import time
+import struct
+
+MAGIC = b"ADDRSTR2"
+MAGIC_V1 = b"ADDRSTR1"  # 没有来源记录的旧版本，仍然可以读取
+HEADER = struct.Struct("<8sIHHIIII")  # magic, 数量, 记录长度, 链数量, 链名表偏移, 记录区偏移, 字符串池偏移, 字符串池长度
+RECORD = struct.Struct("<BBBxI32s")
+NO_LABEL = 0xFFFFFFFF
+
+# 地址编码方式
+ENC_ASCII = 0   # 原样存放（不超过32字节）
+ENC_BASE58 = 1  # base58 解码后的原始字节（SOL 等）
+ENC_HEX = 2     # 0x 地址的20字节 + 5字节大小写掩码（EVM 链）
+ENC_POOL = 3    # 存放在字符串池中，数据区前4字节为偏移
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_INDEX = {c: i for i, c in enumerate(BASE58_ALPHABET)}
+HEX_DIGITS = set("0123456789abcdefABCDEF")
+
+def b58decode(text):
+    """base58 解码，保留前导零"""
+    num = 0
+    for c in text:
+        num = num * 58 + BASE58_INDEX[c]
+    pad = len(text) - len(text.lstrip("1"))
+    body = num.to_bytes((num.bit_length() + 7) // 8, "big") if num else b""
+    return b"\0" * pad + body
+
+def b58encode(data):
+    """base58 编码"""
+    num = int.from_bytes(data, "big")
+    chars = []
+    while num:
+        num, rem = divmod(num, 58)
+        chars.append(BASE58_ALPHABET[rem])
+    pad = len(data) - len(data.lstrip(b"\0"))
+    return "1" * pad + "".join(reversed(chars))
+
+def _encode_address(address):
+    """选出最紧凑的编码，返回 (编码方式, 长度, 数据)；放不进32字节返回 None"""
+    if address.startswith("0x") and len(address) == 42 and all(c in HEX_DIGITS for c in address[2:]):
+        mask = 0
+        for i, c in enumerate(address[2:]):
+            if c.isupper():
+                mask |= 1 << i
+        return ENC_HEX, 20, bytes.fromhex(address[2:]) + mask.to_bytes(5, "little")
+    if address and all(c in BASE58_INDEX for c in address):
+        raw = b58decode(address)
+        if len(raw) <= 32 and b58encode(raw) == address:
+            return ENC_BASE58, len(raw), raw
+    data = address.encode("utf-8")
+    if len(data) <= 32:
+        return ENC_ASCII, len(data), data
+    return None
+
+def _decode_address(enc, length, payload, pool_reader):
+    if enc == ENC_BASE58:
+        return b58encode(bytes(payload[:length]))
+    if enc == ENC_HEX:
+        hex_text = bytes(payload[:20]).hex()
+        mask = int.from_bytes(payload[20:25], "little")
+        return "0x" + "".join(c.upper() if mask >> i & 1 else c for i, c in enumerate(hex_text))
+    if enc == ENC_POOL:
+        return pool_reader(struct.unpack_from("<I", payload)[0])
+    return bytes(payload[:length]).decode("utf-8")
+
+# 使用 0x 地址的链
+EVM_CHAINS = {"ETH", "BSC", "BEP20", "ERC20", "ARB", "ARBITRUM", "OP", "OPTIMISM", "BASE", "POLYGON", "MATIC", "AVAX", "AVAXC"}
+
+def is_valid_address(address, chain):
+    """按链检查地址格式，未知的链只检查非空且不含空白"""
+    chain = chain.upper()
+    if not address or any(c.isspace() for c in address):
+        return False
+    if chain == "SOL":
+        return 32 <= len(address) <= 44 and all(c in BASE58_INDEX for c in address) and len(b58decode(address)) == 32
+    if chain in EVM_CHAINS:
+        return address.startswith("0x") and len(address) == 42 and all(c in HEX_DIGITS for c in address[2:])
+    if chain in ("TRX", "TRC20"):
+        return address.startswith("T") and len(address) == 34 and all(c in BASE58_INDEX for c in address)
+    return True
+
+def read_source(path, default_chain="SOL"):
+    """读取 txt / csv / jsonl 地址列表，逐条返回 {address, chain, label, memo}"""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if ext == ".csv":
+            rows = csv.reader(f)
+            header = None
+            for row in rows:
+                if not row or not row[0].strip() or row[0].startswith("#"):
+                    continue
+                if header is None and "address" in [c.strip().lower() for c in row]:
+                    header = [c.strip().lower() for c in row]
+                    continue
+                if header:
+                    item = dict(zip(header, (c.strip() for c in row)))
+                else:
+                    item = dict(zip(("address", "chain", "label", "memo"), (c.strip() for c in row)))
+                yield _normalize(item, default_chain)
+        elif ext in (".jsonl", ".ndjson"):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                if isinstance(item, str):
+                    item = {"address": item}
+                yield _normalize(item, default_chain)
+        else:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield _normalize({"address": line}, default_chain)
+
+def _normalize(item, default_chain):
+    return {
+        "address": str(item.get("address", "")).strip(),
+        "chain": (str(item.get("chain") or default_chain)).strip().upper(),
+        "label": str(item.get("label") or ""),
+        "memo": str(item.get("memo") or ""),
+    }
+
+def _pool_entry(text):
+    data = text.encode("utf-8")[:0xFFFF]
+    return struct.pack("<H", len(data)) + data
+
+def compile_store(src_path, dst_path, default_chain="SOL"):
+    """把地址列表编译成地址库文件，返回写入的地址数量"""
+    chains = []
+    chain_index = {}
+    records = bytearray()
+    pool = bytearray()
+    count = 0
+    for item in read_source(src_path, default_chain):
+        if not item["address"]:
+            continue
+        chain = item["chain"]
+        if chain not in chain_index:
+            if len(chains) == 256:
+                raise ValueError("链的种类不能超过256个")
+            chain_index[chain] = len(chains)
+            chains.append(chain)
+
+        label_off = NO_LABEL
+        if item["label"] or item["memo"]:
+            label_off = len(pool)
+            pool += _pool_entry(item["label"]) + _pool_entry(item["memo"])
+
+        encoded = _encode_address(item["address"])
+        if encoded is None:
+            encoded = (ENC_POOL, 0, struct.pack("<I", len(pool)))
+            pool += _pool_entry(item["address"])
+        enc, length, payload = encoded
+        records += RECORD.pack(chain_index[chain], enc, length, label_off, payload)
+        count += 1
+
+    # 记录来源，open_store 只从这个文件重新编译（import 的地址库不会被旧的 addr.txt 覆盖）
+    source = _pool_entry(os.path.abspath(src_path)) + _pool_entry(default_chain)
+    chain_table = b"".join(_pool_entry(c) for c in chains)
+    chains_off = HEADER.size + len(source)
+    records_off = chains_off + len(chain_table)
+    pool_off = records_off + len(records)
+    header = HEADER.pack(MAGIC, count, RECORD.size, len(chains), chains_off, records_off, pool_off, len(pool))
+
+    # 先写临时文件再替换，避免读到写了一半的文件
+    temp_path = dst_path + ".temp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        f.write(source)
+        f.write(chain_table)
+        f.write(records)
+        f.write(pool)
+    os.replace(temp_path, dst_path)
+    return count
+
+class AddressStore:
+    """只读地址库，通过 mmap 按需解码，不把整个列表读进内存"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        (magic, self._count, record_size, nchains, chains_off,
+         self._records_off, self._pool_off, self._pool_len) = HEADER.unpack_from(self._view)
+        if magic not in (MAGIC, MAGIC_V1) or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"不是有效的地址库文件: {path}")
+        self.source = self.source_chain = None  # 编译时的源文件和默认链，旧版本为 None
+        if magic == MAGIC:
+            self.source = self._read_string(HEADER.size)
+            self.source_chain = self._read_string(HEADER.size + 2 + len(self.source.encode("utf-8")))
+        self.chains = []
+        offset = chains_off
+        for _ in range(nchains):
+            text = self._read_string(offset)
+            self.chains.append(text)
+            offset += 2 + len(text.encode("utf-8"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def _read_string(self, offset):
+        (length,) = struct.unpack_from("<H", self._view, offset)
+        return bytes(self._view[offset + 2:offset + 2 + length]).decode("utf-8")
+
+    def _pool_string(self, offset):
+        return self._read_string(self._pool_off + offset)
+
+    def _record(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self._view, self._records_off + index * RECORD.size)
+
+    def address(self, index):
+        """第 index 个地址（从0开始）"""
+        _, enc, length, _, payload = self._record(index)
+        return _decode_address(enc, length, payload, self._pool_string)
+
+    def chain(self, index):
+        return self.chains[self._record(index)[0]]
+
+    def record(self, index):
+        """第 index 条完整记录: {address, chain, label, memo}"""
+        chain_idx, enc, length, label_off, payload = self._record(index)
+        label = memo = ""
+        if label_off != NO_LABEL:
+            label = self._pool_string(label_off)
+            memo = self._pool_string(label_off + 2 + len(label.encode("utf-8")))
+        return {
+            "address": _decode_address(enc, length, payload, self._pool_string),
+            "chain": self.chains[chain_idx],
+            "label": label,
+            "memo": memo,
+        }
+
+    def addresses(self, start, count):
+        """从 start 开始（从0开始）读取最多 count 个地址"""
+        end = min(self._count, start + count)
+        return [self.address(i) for i in range(max(start, 0), end)]
+
+    def __getitem__(self, index):
+        return self.address(index)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self.address(i)
+
+def open_store(src_path, store_path=None, default_chain="SOL"):
+    """打开地址库；记录的源文件比地址库新（或地址库不存在）时先重新编译
+
+    地址库是从其他文件导入的（例如 import 指令）时只跟随那个文件，不会被 src_path 覆盖
+    """
+    if store_path is None:
+        store_path = os.path.splitext(src_path)[0] + ".bin"
+    if os.path.exists(store_path):
+        with AddressStore(store_path) as store:
+            if store.source and os.path.abspath(store.source) != os.path.abspath(src_path):
+                src_path, default_chain = store.source, store.source_chain
+    if os.path.exists(src_path) and (
+        not os.path.exists(store_path) or os.path.getmtime(src_path) > os.path.getmtime(store_path)
+    ):
+        count = compile_store(src_path, store_path, default_chain)
+        print(f"已编译地址库 {store_path}: {count} 个地址（来源 {src_path}）")
+    return AddressStore(store_path)
+
+def main(argv):
+    if len(argv) >= 3 and argv[0] == "import":
+        chain = argv[3] if len(argv) > 3 else "SOL"
+        start = time.perf_counter()
+        count = compile_store(argv[1], argv[2], chain)
+        print(f"已导入 {count} 个地址到 {argv[2]}，耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+    elif len(argv) == 2 and argv[0] == "info":
+        start = time.perf_counter()
+        with AddressStore(argv[1]) as store:
+            load_ms = (time.perf_counter() - start) * 1000
+            size = os.path.getsize(argv[1])
+            print(f"地址数量: {len(store)}")
+            print(f"链: {', '.join(store.chains)}")
+            print(f"来源: {store.source or '未记录'}")
+            print(f"文件大小: {size} 字节（每条 {size / max(len(store), 1):.1f} 字节）")
+            print(f"加载耗时: {load_ms:.2f} ms")
+    else:
+        print("用法:")
+        print("  python address_store.py import [源文件 txt/csv/jsonl] [地址库.bin] [默认链]")
+        print("  python address_store.py info [地址库.bin]")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,217 @@
+"""
+交互模式中的后台任务
+
+耗时的指令（restore、clone、new 等）在后台线程中执行，提示符立即返回，可以继续输入其他指令。
+- 任务输出的每一行前面加上 [任务ID]。所属任务记录在 contextvars 中，任务中提交到线程池的函数用 submit_with_job 提交，
+  带上当前任务（前缀和取消）；没有带上的线程（调度器、分析器等）不算作任务
+- 有任务在运行时 sys.stdout 才换成按任务加前缀的输出，所有任务结束后恢复
+- cancel 只是发出取消请求：启动会话等位置会调用 cancelled() 检查，不再开始新的步骤，已经开始的步骤会执行完
+- 同一类操作（例如都要分配新的会话ID）用相同的 key，同一时间只允许一个；
+  操作单个会话的用 session_key(会话ID)，涉及所有会话的（restore、gc）用 ALL_SESSIONS，两者互相冲突；
+  同时操作几个会话的（macro run）用这些会话的 key 组成的元组，和其中任何一个冲突的任务都不能同时运行
+"""
+
+import sys
+import time
+import itertools
+import threading
+import contextvars
+
+ALL_SESSIONS = "session:*"
+
+_current = contextvars.ContextVar("background_job", default=None)
+_output_lock = threading.Lock()
+_output_users = 0
+_output = None
+
+def current_job():
+    """当前代码所属的后台任务，不在后台任务中返回 None"""
+    job = _current.get()
+    # 任务结束后仍在执行的函数（例如超时没有等到的线程）不再算作该任务
+    return job if job and not job.done.is_set() else None
+
+def session_key(session_id):
+    return f"session:{session_id}"
+
+def keys_conflict(a, b):
+    """两个 key 的任务能否同时运行：相同的 key 冲突，ALL_SESSIONS 和任何会话的 key 冲突"""
+    if a == b:
+        return True
+    sessions = ALL_SESSIONS[:-1]
+    return (a == ALL_SESSIONS and b.startswith(sessions)) or (b == ALL_SESSIONS and a.startswith(sessions))
+
+def _key_list(key):
+    """key 可以是单个 key 或多个 key 组成的元组"""
+    return key if isinstance(key, tuple) else (key,)
+
+def jobs_conflict(a, b):
+    """两个任务的 key（单个或元组）中有任意一对冲突"""
+    return any(keys_conflict(x, y) for x in _key_list(a) for y in _key_list(b))
+
+def submit_with_job(executor, func, *args, **kwargs):
+    """把 func 提交到线程池，并在当前后台任务中执行（线程池的线程不会继承 contextvars）"""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+def cancelled():
+    """当前后台任务是否已被要求取消"""
+    job = current_job()
+    return bool(job and job.cancel_event.is_set())
+
+class BackgroundJob:
+    """一个后台执行的指令"""
+
+    def __init__(self, job_id, command, key=None):
+        self.id = job_id
+        self.command = command
+        self.key = key
+        self.status = "running"  # running / done / failed / cancelled
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+class _PrefixedOutput:
+    """按线程给后台任务的输出加上 [任务ID] 前缀"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._line_start = threading.local()
+
+    def write(self, text):
+        job = current_job()
+        if job is None or not text:
+            return self._stream.write(text)
+        prefix = f"[{job.id}] "
+        at_start = getattr(self._line_start, "value", True)
+        lines = text.split("\n")
+        out = []
+        for index, line in enumerate(lines):
+            if line and (index > 0 or at_start):
+                line = prefix + line
+            out.append(line)
+        self._line_start.value = text.endswith("\n")
+        self._stream.write("\n".join(out))
+        return len(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def _acquire_output():
+    """有任务运行时换成加前缀的输出"""
+    global _output_users, _output
+    with _output_lock:
+        _output_users += 1
+        if _output is None:
+            _output = _PrefixedOutput(sys.stdout)
+            sys.stdout = _output
+
+def _release_output():
+    """最后一个任务结束后恢复原来的 sys.stdout（期间被别人替换过则不动）"""
+    global _output_users, _output
+    with _output_lock:
+        _output_users -= 1
+        if _output_users == 0 and _output is not None:
+            if sys.stdout is _output:
+                sys.stdout = _output._stream
+            _output = None
+
+class JobTable:
+    """后台任务列表"""
+
+    def __init__(self):
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def running(self, key=None):
+        """运行中的任务，指定 key（单个或元组）时只返回和它冲突的"""
+        with self._lock:
+            return [job for job in self.jobs.values() if job.status == "running" and
+                    (key is None or (job.key is not None and jobs_conflict(job.key, key)))]
+
+    def busy(self, key):
+        """冲突的 key 已有任务在运行时提示并返回 True"""
+        running = self.running(key)
+        if running:
+            print(f"任务 [{running[0].id}] {running[0].command} 还在运行，请等它完成（wait {running[0].id}）")
+        return bool(running)
+
+    def start(self, command, func, *args, key=None):
+        """在后台执行 func(*args)，冲突的 key 已有任务在运行时不启动并返回 None"""
+        if key is not None and self.busy(key):
+            return None
+        with self._lock:
+            job = BackgroundJob(next(self._ids), command, key)
+            self.jobs[job.id] = job
+        _acquire_output()
+        context = contextvars.copy_context()
+        context.run(_current.set, job)
+        thread = threading.Thread(target=context.run, args=(self._run, job, func, args), daemon=True)
+        print(f"[{job.id}] 已在后台开始: {command}")
+        thread.start()
+        return job
+
+    def _run(self, job, func, args):
+        try:
+            func(*args)
+            job.status = "cancelled" if job.cancel_event.is_set() else "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        job.finished_at = time.time()
+        if job.status == "failed":
+            print(f"失败（{job.elapsed:.1f}s）: {job.error}")
+        else:
+            print(f"{'已取消' if job.status == 'cancelled' else '完成'}（{job.elapsed:.1f}s）: {job.command}")
+        job.done.set()
+        _release_output()
+
+    def get(self, job_id):
+        try:
+            return self.jobs.get(int(job_id))
+        except ValueError:
+            return None
+
+    def wait(self, job_id):
+        """等待任务结束，Ctrl+C 停止等待（任务继续在后台运行）"""
+        job = self.get(job_id)
+        if not job:
+            print(f"任务 {job_id} 不存在")
+            return None
+        try:
+            while not job.done.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            print(f"\n停止等待，任务 [{job.id}] 继续在后台运行")
+        return job
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if not job:
+            print(f"任务 {job_id} 不存在")
+        elif job.status != "running":
+            print(f"任务 [{job.id}] 已经结束")
+        else:
+            job.cancel_event.set()
+            print(f"已请求取消任务 [{job.id}]，正在进行的步骤完成后停止")
+        return job
+
+    def print_jobs(self):
+        with self._lock:
+            jobs = list(self.jobs.values())
+        if not jobs:
+            print("没有后台任务")
+            return
+        for job in jobs:
+            status = {"running": "运行中", "done": "完成", "failed": "失败", "cancelled": "已取消"}[job.status]
+            if job.status == "running" and job.cancel_event.is_set():
+                status = "正在取消"
+            print(f"[{job.id}] {status:<5} {job.elapsed:7.1f}s  {job.command}" + (f"  ({job.error})" if job.error else ""))
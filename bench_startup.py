@@ -0,0 +1,104 @@
+"""
+启动时间测试：比较源码运行、PyInstaller onefile 和 onedir 打包后，各入口到第一个提示符/窗口出现的时间
+
+用法:
+    python bench_startup.py                      # 只测源码运行
+    python bench_startup.py --build              # 先用 PyInstaller 打包 onefile 和 onedir 再一起比较
+    python bench_startup.py --runs 10 main.py    # 指定次数和入口
+
+程序在 STARTUP_EXIT=1 时会在第一个提示符/窗口出现后立即退出（见 startup_profile.py），
+测得的是从启动进程到可以使用的总时间，onefile 的解包时间也包含在内
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ENTRY_POINTS = ["main.py", "chrome_session_manager.py", "pump_auto_buy.py"]
+BUILD_DIR = "build_bench"
+# 按需导入的模块 PyInstaller 分析不到，需要显式加入
+HIDDEN_IMPORTS = [
+    "selenium.webdriver",
+    "selenium.webdriver.chrome.service",
+    "selenium.webdriver.common.by",
+    "selenium.webdriver.support.ui",
+    "selenium.webdriver.support.expected_conditions",
+    "webdriver_manager.chrome",
+]
+
+def build(script, mode):
+    """用 PyInstaller 打包，返回可执行文件路径（失败返回 None）"""
+    name = os.path.splitext(os.path.basename(script))[0]
+    dist = os.path.abspath(os.path.join(BUILD_DIR, mode))
+    cmd = [
+        sys.executable, "-m", "PyInstaller", "--noconfirm", "--log-level", "WARN",
+        f"--{mode}", "--name", name,
+        *[arg for module in HIDDEN_IMPORTS for arg in ("--hidden-import", module)],
+        "--distpath", dist,
+        "--workpath", os.path.abspath(os.path.join(BUILD_DIR, "work", mode)),
+        "--specpath", os.path.abspath(os.path.join(BUILD_DIR, "spec", mode)),
+        os.path.abspath(script),
+    ]
+    print(f"打包 {script} ({mode})...")
+    if subprocess.run(cmd).returncode != 0:
+        print(f"打包失败: {script} ({mode})")
+        return None
+    exe = name + (".exe" if sys.platform == "win32" else "")
+    return os.path.join(dist, exe) if mode == "onefile" else os.path.join(dist, name, exe)
+
+def measure(cmd, runs):
+    """运行 runs 次，返回每次从启动到退出的秒数"""
+    env = dict(os.environ, STARTUP_EXIT="1")
+    env.pop("STARTUP_PROFILE", None)
+    times = []
+    # 在临时目录中运行，避免读写真实的会话和地址文件
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run(cmd, cwd=workdir, env=env, stdin=subprocess.DEVNULL,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=120)
+            elapsed = time.perf_counter() - start
+            if result.returncode != 0:
+                print(f"  运行失败: {result.stderr.decode(errors='replace').strip()[-300:]}")
+                return []
+            times.append(elapsed)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description="启动时间测试")
+    parser.add_argument("scripts", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--build", action="store_true", help="用 PyInstaller 打包 onefile 和 onedir 后一起比较")
+    args = parser.parse_args()
+
+    if args.build and not shutil.which("pyinstaller") and subprocess.run(
+        [sys.executable, "-m", "PyInstaller", "--version"], capture_output=True
+    ).returncode != 0:
+        print("未安装 PyInstaller，请先 pip install pyinstaller，或去掉 --build 只测源码运行")
+        return
+
+    rows = []
+    for script in args.scripts:
+        variants = [("source", [sys.executable, os.path.abspath(script)])]
+        if args.build:
+            for mode in ("onefile", "onedir"):
+                exe = build(script, mode)
+                if exe:
+                    variants.append((mode, [exe]))
+        for mode, cmd in variants:
+            print(f"测试 {script} ({mode})...")
+            times = measure(cmd, args.runs)
+            if times:
+                rows.append((script, mode, min(times), statistics.median(times)))
+
+    print(f"\n{'入口':<28}{'方式':<10}{'最快':>10}{'中位数':>10}")
+    for script, mode, fastest, median in rows:
+        print(f"{script:<28}{mode:<10}{fastest * 1000:>8.0f}ms{median * 1000:>8.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -3,22 +3,70 @@ import sys
 import json
 import time
 import socket
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 import shutil  # 添加到文件顶部的导入部分
+import argparse
+import contextlib
+from session_scheduler import SessionScheduler, TASKS
+from control_server import ControlServer, DEFAULT_PORT
+# selenium 等重量级模块在第一次启动浏览器时才导入，命令行可以立即使用
+import startup_profile
+import sampling_profiler
+from startup_profile import timed_import
+from process_stats import process_table, tree_usage, driver_root_pid, listening_pid
+from memory_monitor import MemoryMonitor, DEFAULT_BUDGET_MB, DEFAULT_INTERVAL
+import profile_gc
+import profile_archive
+import token_resolver
+import task_macros
+from tab_pool import TabPool, DEFAULT_MAX_TABS
+from launch_ramp import LaunchRamp
+from background_jobs import JobTable, ALL_SESSIONS, cancelled, session_key, submit_with_job
+from launch_retry import DEFAULT_POLICY, PortInUseError
+from launch_profiles import PROFILES, apply_profile, default_profile
+import metrics
+
+# 窗口显示方式: visible 正常显示 / offscreen 窗口移到屏幕外 / headless 无界面（保留用户数据和插件）
+DISPLAY_MODES = ("visible", "offscreen", "headless")
+OFFSCREEN_POSITION = (-32000, -32000)
+# 会话专用的启动参数（启动参数组合之外），创建和重新启动时一致
+SESSION_ARGS = ['--no-sandbox', '--disable-dev-shm-usage', '--disable-web-security', '--disable-site-isolation-trials']
+# 会话N的调试端口为 端口基数+N；同一台机器上运行多个 agent 时各自使用不同的基数
+DEBUG_PORT_BASE = 9222
+
+LAUNCH_SECONDS = metrics.histogram("chrome_session_launch_seconds", "启动或附加一个会话的耗时", ["action"])
+RESTORE_SECONDS = metrics.histogram("chrome_restore_seconds", "恢复全部会话的总耗时", ["strategy"])
+LAUNCH_FAILURES = metrics.counter("chrome_session_launch_failures_total", "启动会话失败次数", ["action"])
+
+# 默认搜索的代币合约地址
+DEFAULT_CONTRACT = "CRAMvzDsSpXYsFpcoDr6vFLJMBeftez1E7277xwPpump"
+
+def _load_selenium():
+    """按需导入启动浏览器所需的模块"""
+    webdriver = timed_import("selenium.webdriver")
+    Service = timed_import("selenium.webdriver.chrome.service").Service
+    ChromeDriverManager = timed_import("webdriver_manager.chrome").ChromeDriverManager
+    return webdriver, Service, ChromeDriverManager
 
 class ChromeSessionManager:
-    def __init__(self):
+    def __init__(self, port_base=DEBUG_PORT_BASE, launch_profile=None):
+        self.port_base = port_base
+        self.launch_profile = launch_profile or default_profile()  # 启动参数组合，会话可以用 "launch_profile" 单独设置
         self.sessions_file = "chrome_sessions.json"
         self.sessions = self._load_sessions()
+        self.drivers = {}  # 当前活动的 driver，session_id -> driver
+        self.drivers_lock = threading.Lock()
+        self._save_lock = threading.RLock()  # 保护 self.sessions 和会话文件，修改会话信息都要通过 set_session / update_session / remove_session
+        self.live_display = {}  # 正在运行的浏览器实际使用的显示方式
+        self.memory_usage = {}  # 最近一次采样的内存占用（字节），session_id -> rss
+        self.retry_policy = DEFAULT_POLICY  # 启动浏览器的重试策略
+        self.attached = set()  # 附加到已在运行的 Chrome 上的会话（Chrome 不是 chromedriver 的子进程）
+        self.tab_pools = {}  # 每个活动会话的标签页池，session_id -> TabPool
         self._cleanup_dead_sessions()
+        # 上次退出时没删完的目录在后台继续删除
+        if os.path.isdir(profile_gc.TRASH_DIR):
+            profile_gc.empty_trash_async()
         
     def _load_sessions(self):
         """加载已保存的会话信息"""
@@ -29,8 +77,89 @@ class ChromeSessionManager:
 
     def _save_sessions(self):
         """保存会话信息到文件"""
-        with open(self.sessions_file, 'w') as f:
-            json.dump(self.sessions, f, indent=4)
+        with self._save_lock:
+            # 在锁内序列化，其他线程（并行 clone、配置文件启动、import）不会在写入时改动会话信息
+            text = json.dumps(self.sessions, indent=4)
+            with open(self.sessions_file, 'w') as f:
+                f.write(text)
+
+    def set_session(self, session_id, info, save=True):
+        """登记（或替换）会话信息"""
+        with self._save_lock:
+            self.sessions[session_id] = info
+            if save:
+                self._save_sessions()
+
+    def update_session(self, session_id, **fields):
+        """修改会话信息的部分字段并保存"""
+        with self._save_lock:
+            self.sessions[session_id].update(fields)
+            self._save_sessions()
+
+    def remove_session(self, session_id):
+        """移除会话信息并保存，会话不存在返回 False"""
+        with self._save_lock:
+            if self.sessions.pop(session_id, None) is None:
+                return False
+            self._save_sessions()
+            return True
+
+    def session_items(self):
+        """会话信息的快照 [(session_id, info)]，遍历时其他线程可以继续修改"""
+        with self._save_lock:
+            return [(session_id, dict(info)) for session_id, info in self.sessions.items()]
+
+    def track_drivers(self, pairs):
+        """登记活动的 (session_id, driver)"""
+        with self.drivers_lock:
+            for session_id, driver in pairs:
+                self.drivers[session_id] = driver
+
+    def untrack_driver(self, session_id):
+        """移除并返回会话的活动 driver（不存在返回 None）"""
+        with self.drivers_lock:
+            self.tab_pools.pop(session_id, None)
+            return self.drivers.pop(session_id, None)
+
+    def tab_pool(self, session_id, driver=None):
+        """会话的标签页池（driver 换了以后重新建立），会话不在运行时返回 None"""
+        driver = driver or self.drivers.get(session_id)
+        if not driver:
+            return None
+        with self.drivers_lock:
+            pool = self.tab_pools.get(session_id)
+            if pool is None or pool.driver is not driver:
+                max_tabs = self.sessions.get(session_id, {}).get('max_tabs', DEFAULT_MAX_TABS)
+                pool = self.tab_pools[session_id] = TabPool(driver, max_tabs)
+            return pool
+
+    def open_token_tab(self, session_id, contract_address, driver=None):
+        """在会话中切换到合约的代币页面标签页，没有打开过则新开一个，返回 (是否成功, 是否新加载)"""
+        pool = self.tab_pool(session_id, driver)
+        if not pool:
+            print(f"未找到会话 {session_id} 的活动窗口")
+            return False, False
+        start = time.perf_counter()
+        handle, fresh = pool.open(
+            contract_address,
+            loader=lambda drv: token_resolver.open_token_page(
+                drv, contract_address,
+                search=lambda: self._search_contract(session_id, drv, contract_address),
+                label=f"会话 {session_id} ",
+            ),
+        )
+        if handle and not fresh:
+            print(f"会话 {session_id} 已切换到 {contract_address} 的标签页 ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return bool(handle), fresh
+
+    def print_tabs(self, session_id):
+        pool = self.tab_pools.get(session_id)
+        if not pool or not pool.tabs:
+            print(f"会话 {session_id} 没有打开的代币标签页")
+            return
+        print(f"会话 {session_id} 的标签页（{len(pool.tabs)}/{pool.max_tabs}，从最近使用开始）:")
+        for key, age, hits in pool.describe():
+            print(f"  {key}  已打开 {age:.0f}s，切换 {hits} 次")
 
     def _is_port_in_use(self, port):
         """检查端口是否被使用"""
@@ -53,103 +182,114 @@ class ChromeSessionManager:
         
         for session_id in dead_sessions:
             print(f"清理无效会话: {session_id}")
-            del self.sessions[session_id]
-        
-        if dead_sessions:
-            self._save_sessions()
+            self.remove_session(session_id)
 
-    def create_new_session(self, session_id=None, note=None):
+    def _add_display_options(self, chrome_options, display, width=1200, height=800):
+        """按显示方式添加启动参数"""
+        if display == "headless":
+            chrome_options.add_argument("--headless=new")  # 新版无界面模式，支持插件和用户数据目录
+            chrome_options.add_argument(f"--window-size={width},{height}")
+        elif display == "offscreen":
+            chrome_options.add_argument(f"--window-position={OFFSCREEN_POSITION[0]},{OFFSCREEN_POSITION[1]}")
+            chrome_options.add_argument(f"--window-size={width},{height}")
+
+    def _chrome_options(self, webdriver, user_data_dir, debug_port, display, profile=None, width=1200, height=800):
+        """会话的启动参数：用户数据目录、调试端口、启动参数组合（见 launch_profiles.py）和显示方式"""
+        chrome_options = webdriver.ChromeOptions()
+        chrome_options.add_argument(f"user-data-dir={user_data_dir}")
+        chrome_options.add_argument(f"--remote-debugging-port={debug_port}")
+        apply_profile(chrome_options, profile or self.launch_profile)
+        for arg in SESSION_ARGS:
+            chrome_options.add_argument(arg)
+        self._add_display_options(chrome_options, display, width, height)
+        return chrome_options
+
+    def create_new_session(self, session_id=None, note=None, display="visible"):
         """创建新的Chrome会话"""
         if session_id is None:
             session_id = str(len(self.sessions) + 1)
             
-        chrome_options = webdriver.ChromeOptions()
-        
+        webdriver, Service, ChromeDriverManager = _load_selenium()
         # 创建用户数据目录
         user_data_dir = os.path.abspath(f"chrome_data/user_{session_id}")
-        chrome_options.add_argument(f"user-data-dir={user_data_dir}")
-        
         # 设置调试端口
-        debug_port = 9222 + int(session_id)
-        chrome_options.add_argument(f"--remote-debugging-port={debug_port}")
-        
-        # 添加性能优化选项
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--enable-extensions')
-        chrome_options.add_argument('--disable-web-security')
-        chrome_options.add_argument('--disable-site-isolation-trials')
+        debug_port = self.port_base + int(session_id)
+        chrome_options = self._chrome_options(webdriver, user_data_dir, debug_port, display)
         chrome_options.page_load_strategy = 'none'
         
-        # 最多重试3次
-        for attempt in range(3):
+        def launch():
+            if self._is_port_in_use(debug_port):
+                raise PortInUseError(f"调试端口 {debug_port} 已被占用")
+            service = Service(ChromeDriverManager().install())
+            service.start()  # 显式启动服务
             try:
-                service = Service(ChromeDriverManager().install())
-                service.start()  # 显式启动服务
-                
-                driver = webdriver.Chrome(
-                    service=service,
-                    options=chrome_options
-                )
-                
-                # 设置窗口大小和位置
-                window_width = 1200
-                window_height = 800
-                screen_padding = 50
-                
-                # 计算窗口位置
-                session_num = int(session_id)
-                x_offset = screen_padding + ((session_num - 1) % 3) * (window_width + screen_padding)
-                y_offset = screen_padding + ((session_num - 1) // 3) * (window_height + screen_padding)
-                
-                # 设置窗口大小和位置
+                return webdriver.Chrome(service=service, options=chrome_options)
+            except Exception:
+                service.stop()
+                raise
+        
+        # 按错误类型重试：不可恢复的错误立即失败，临时错误指数退避
+        launch_start = time.perf_counter()
+        try:
+            driver = self.retry_policy.run(launch, f"创建会话 {session_id} ")
+        except Exception as e:
+            print(f"创建新会话失败: {e}")
+            LAUNCH_FAILURES.inc(action="create")
+            return None, None
+        LAUNCH_SECONDS.observe(time.perf_counter() - launch_start, action="create")
+        
+        try:
+            # 设置窗口大小和位置
+            window_width = 1200
+            window_height = 800
+            screen_padding = 50
+            
+            # 计算窗口位置
+            session_num = int(session_id)
+            x_offset = screen_padding + ((session_num - 1) % 3) * (window_width + screen_padding)
+            y_offset = screen_padding + ((session_num - 1) // 3) * (window_height + screen_padding)
+            
+            # 设置窗口大小和位置（不显示窗口时只记录位置，供 show 使用）
+            if display == "visible":
                 driver.set_window_size(window_width, window_height)
                 driver.set_window_position(x_offset, y_offset)
-                
-                # 设置窗口标题
-                title = f"Chrome_{session_id}"
-                if note:
-                    title += f" ({note})"
-                driver.execute_script(f"document.title = '{title}'")
-                
-                # 保存会话信息
-                self.sessions[session_id] = {
-                    "debug_port": debug_port,
-                    "user_data_dir": user_data_dir,
-                    "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "last_used": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "note": note,
-                    "position": {
-                        "x": x_offset,
-                        "y": y_offset,
-                        "width": window_width,
-                        "height": window_height
-                    }
+            
+            # 设置窗口标题
+            title = f"Chrome_{session_id}"
+            if note:
+                title += f" ({note})"
+            driver.execute_script(f"document.title = '{title}'")
+            
+            # 保存会话信息
+            self.set_session(session_id, {
+                "debug_port": debug_port,
+                "user_data_dir": user_data_dir,
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "last_used": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "note": note,
+                "display": display,
+                "position": {
+                    "x": x_offset,
+                    "y": y_offset,
+                    "width": window_width,
+                    "height": window_height
                 }
-                self._save_sessions()
-                
-                return session_id, driver
-                
-            except Exception as e:
-                print(f"创建会话尝试 {attempt + 1}/3 失败: {e}")
-                try:
-                    if 'driver' in locals():
-                        driver.quit()
-                    if 'service' in locals():
-                        service.stop()
-                except:
-                    pass
-                
-                if attempt < 2:  # 如果不是最后一次尝试
-                    print("等待5秒后重试...")
-                    time.sleep(5)
-                else:
-                    print("创建新会话失败，已达到最大重试次数")
-                    return None, None
+            })
+            self.live_display[session_id] = display
+            
+            return session_id, driver
+        except Exception as e:
+            print(f"初始化会话 {session_id} 窗口失败: {e}")
+            try:
+                driver.quit()
+            except:
+                pass
+            return None, None
 
     def _create_single_session_thread(self, session_id, note=None):
         """在线程中创建单个会话"""
+        if cancelled():
+            return None
         session_id, driver = self.create_new_session(session_id, note)
         if driver:
             try:
@@ -164,15 +304,27 @@ class ChromeSessionManager:
                     pass
         return None
 
-    def batch_create_sessions(self, count):
-        """并行批量创建多个Chrome会话"""
+    def _ask_notes(self, session_ids):
+        """启动前一次性询问所有备注，避免输入过程拖慢并行启动"""
+        return [
+            input(f"请为第 {session_id} 个Chrome输入备注（直接回车跳过）: ").strip()
+            for session_id in session_ids
+        ]
+
+    def batch_session_ids(self, count):
+        """批量创建时使用的会话ID"""
+        return [str(len(self.sessions) + i + 1) for i in range(count)]
+
+    def batch_create_sessions(self, count, notes=None):
+        """并行批量创建多个Chrome会话，notes 为空时逐个询问备注"""
         drivers = []
+        session_ids = self.batch_session_ids(count)
+        if notes is None:
+            notes = self._ask_notes(session_ids)
         with ThreadPoolExecutor(max_workers=count) as executor:
             futures = []
-            for i in range(count):
-                session_id = str(len(self.sessions) + i + 1)
-                note = input(f"请为第 {session_id} 个Chrome输入备注（直接回车跳过）: ").strip()
-                futures.append(executor.submit(self._create_single_session_thread, session_id, note))
+            for session_id, note in zip(session_ids, notes):
+                futures.append(submit_with_job(executor, self._create_single_session_thread, session_id, note))
             
             for future in as_completed(futures):
                 result = future.result()
@@ -181,8 +333,85 @@ class ChromeSessionManager:
         
         return drivers
 
-    def connect_to_session(self, session_id):
-        """连接到现有的Chrome会话"""
+    def _debugger_alive(self, port, timeout=0.5):
+        """调试端口上是否有正在运行的 Chrome"""
+        import http.client
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        try:
+            conn.request("GET", "/json/version")
+            return "Browser" in json.loads(conn.getresponse().read())
+        except (OSError, ValueError, http.client.HTTPException):
+            return False
+        finally:
+            conn.close()
+
+    def _attach_to_session(self, session_id):
+        """通过 debuggerAddress 附加到调试端口上正在运行的 Chrome，保留已打开的网页和钱包状态"""
+        webdriver, Service, ChromeDriverManager = _load_selenium()
+        chrome_options = webdriver.ChromeOptions()
+        chrome_options.add_experimental_option("debuggerAddress", f"127.0.0.1:{self.sessions[session_id]['debug_port']}")
+        try:
+            with LAUNCH_SECONDS.time(action="attach"):
+                driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        except Exception as e:
+            print(f"附加到会话 {session_id} 失败，将重新启动: {e}")
+            LAUNCH_FAILURES.inc(action="attach")
+            return None
+        self.attached.add(session_id)
+        self.live_display.setdefault(session_id, self.sessions[session_id].get('display', 'visible'))
+        print(f"已附加到正在运行的会话 {session_id}")
+        return driver
+
+    def _close_running_browser(self, session_id):
+        """关闭调试端口上正在运行的 Chrome，等待端口释放"""
+        port = self.sessions[session_id]['debug_port']
+        driver = self._attach_to_session(session_id)
+        if driver:
+            try:
+                driver.execute_cdp_cmd("Browser.close", {})
+            except Exception:
+                pass
+            try:
+                driver.service.stop()
+            except Exception:
+                pass
+        self.attached.discard(session_id)
+        for _ in range(50):
+            if not self._debugger_alive(port, timeout=0.2):
+                return True
+            time.sleep(0.1)
+        return False
+
+    def quit_session(self, session_id):
+        """关闭会话的浏览器，没有活动的 driver 返回 False"""
+        driver = self.untrack_driver(session_id)
+        if not driver:
+            return False
+        if session_id in self.attached:
+            # 附加的浏览器不是 chromedriver 启动的，quit 不会关闭它
+            try:
+                driver.execute_cdp_cmd("Browser.close", {})
+            except Exception:
+                pass
+            self.attached.discard(session_id)
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"退出会话 {session_id} 时出错: {e}")
+        return True
+
+    def session_root_pid(self, session_id, driver):
+        """会话进程树的根进程：附加的会话是监听调试端口的 Chrome，其余是 chromedriver"""
+        if session_id in self.attached:
+            return listening_pid(self.sessions[session_id]['debug_port'])
+        return driver_root_pid(driver)
+
+    def connect_to_session(self, session_id, display=None, attach=True):
+        """连接到现有的Chrome会话
+
+        调试端口上已有 Chrome 在运行时直接附加（attach=False 时先关闭再重新启动），
+        display 为空时使用会话保存的显示方式
+        """
         if session_id not in self.sessions:
             print(f"会话 {session_id} 不存在")
             return None
@@ -191,6 +420,15 @@ class ChromeSessionManager:
         debug_port = session_info['debug_port']
         user_data_dir = session_info['user_data_dir']
         
+        if self._debugger_alive(debug_port):
+            if attach and display in (None, self.live_display.get(session_id, session_info.get('display', 'visible'))):
+                driver = self._attach_to_session(session_id)
+                if driver:
+                    self.update_session(session_id, last_used=time.strftime("%Y-%m-%d %H:%M:%S"))
+                    return driver
+            self._close_running_browser(session_id)
+        self.attached.discard(session_id)
+        
         # 只关闭我们之前创建的进程
         if 'pid' in session_info:
             try:
@@ -200,20 +438,28 @@ class ChromeSessionManager:
             except:
                 pass
         
-        chrome_options = webdriver.ChromeOptions()
-        chrome_options.add_argument(f"user-data-dir={user_data_dir}")
-        chrome_options.add_argument(f"--remote-debugging-port={debug_port}")
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
+        webdriver, Service, ChromeDriverManager = _load_selenium()
+        display = display or session_info.get('display', 'visible')
+        pos = session_info.get('position', {})
+        chrome_options = self._chrome_options(
+            webdriver, user_data_dir, debug_port, display, session_info.get('launch_profile'),
+            pos.get('width', 1200), pos.get('height', 800),
+        )
         
         try:
-            driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=chrome_options
-            )
+            with LAUNCH_SECONDS.time(action="connect"):
+                driver = self.retry_policy.run(
+                    lambda: webdriver.Chrome(
+                        service=Service(ChromeDriverManager().install()),
+                        options=chrome_options
+                    ),
+                    f"连接会话 {session_id} "
+                )
             
-            # 恢复窗口位置和大小
-            if 'position' in session_info:
+            # 恢复窗口位置和大小（不显示窗口时跳过）
+            if display != "visible":
+                pass
+            elif 'position' in session_info:
                 pos = session_info['position']
                 driver.set_window_size(pos.get('width', 1200), pos.get('height', 800))
                 driver.set_window_position(pos['x'], pos['y'])
@@ -242,13 +488,12 @@ class ChromeSessionManager:
                 driver.set_window_size(window_width, window_height)
                 driver.set_window_position(x_offset, y_offset)
                 
-                session_info['position'] = {
+                self.update_session(session_id, position={
                     "x": x_offset,
                     "y": y_offset,
                     "width": window_width,
                     "height": window_height
-                }
-                self._save_sessions()
+                })
             
             # 恢复窗口标题
             title = f"Chrome_{session_id}"
@@ -260,12 +505,13 @@ class ChromeSessionManager:
             if sys.platform == 'darwin':
                 cmd = f"lsof -i :{debug_port} | grep Chrome | awk '{{print $2}}'"
                 pid = os.popen(cmd).read().strip().split('\n')[0]
-                session_info["pid"] = pid
-                self._save_sessions()
+                self.update_session(session_id, pid=pid)
             
+            self.live_display[session_id] = display
             return driver
         except Exception as e:
             print(f"连接到会话 {session_id} 失败: {e}")
+            LAUNCH_FAILURES.inc(action="connect")
             return None
 
     def _kill_chrome_process(self, port):
@@ -295,6 +541,133 @@ class ChromeSessionManager:
         
         time.sleep(1)  # 等待进程关闭
 
+    def set_display_mode(self, session_id, mode):
+        """修改并保存会话的显示方式，正在运行的浏览器立即切换，返回当前的 driver"""
+        if mode not in DISPLAY_MODES:
+            print(f"显示方式应为: {' / '.join(DISPLAY_MODES)}")
+            return None
+        if session_id not in self.sessions:
+            print(f"会话 {session_id} 不存在")
+            return None
+        self.update_session(session_id, display=mode)
+        return self._switch_display(session_id, mode)
+
+    def show_session(self, session_id):
+        """临时显示会话窗口（例如手动操作钱包），不修改保存的显示方式"""
+        return self._switch_display(session_id, "visible")
+
+    def hide_session(self, session_id):
+        """恢复会话保存的显示方式"""
+        if session_id not in self.sessions:
+            print(f"会话 {session_id} 不存在")
+            return None
+        return self._switch_display(session_id, self.sessions[session_id].get('display', 'visible'))
+
+    def _switch_display(self, session_id, target):
+        """把正在运行的浏览器切换到 target 显示方式，返回切换后的 driver"""
+        driver = self.drivers.get(session_id)
+        if not driver:
+            print(f"会话 {session_id} 没有在运行，下次启动时生效")
+            return None
+        current = self.live_display.get(session_id, 'visible')
+        if current == target:
+            return driver
+        if "headless" not in (current, target):
+            # 有界面的两种方式之间只需要移动窗口
+            if target == "offscreen":
+                driver.set_window_position(*OFFSCREEN_POSITION)
+            else:
+                pos = self.sessions[session_id].get('position', {})
+                driver.set_window_size(pos.get('width', 1200), pos.get('height', 800))
+                driver.set_window_position(pos.get('x', 0), pos.get('y', 0))
+            self.live_display[session_id] = target
+            return driver
+        # 有界面和无界面之间切换需要重新启动浏览器，用户数据目录和插件不变
+        print(f"正在以 {target} 方式重新打开会话 {session_id}...")
+        self.untrack_driver(session_id)
+        try:
+            url = driver.current_url
+        except Exception:
+            url = None
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        new_driver = self.connect_to_session(session_id, display=target, attach=False)
+        if new_driver:
+            self.track_drivers([(session_id, new_driver)])
+            if url and url.startswith("http"):
+                try:
+                    new_driver.get(url)
+                except Exception as e:
+                    print(f"会话 {session_id} 重新打开网页时出错: {e}")
+        return new_driver
+
+    def measure_usage(self, interval=5.0):
+        """采样每个活动会话整个进程树的 CPU 和内存占用"""
+        with self.drivers_lock:
+            roots = {sid: self.session_root_pid(sid, drv) for sid, drv in self.drivers.items()}
+        roots = {sid: pid for sid, pid in roots.items() if pid}
+        before = process_table()
+        time.sleep(interval)
+        after = process_table()
+        usage = {}
+        for session_id, pid in roots.items():
+            rss, cpu_after, count = tree_usage(pid, after)
+            _, cpu_before, _ = tree_usage(pid, before)
+            usage[session_id] = {
+                "display": self.live_display.get(session_id, 'visible'),
+                "rss": rss,
+                "cpu_percent": max(0.0, cpu_after - cpu_before) / interval * 100,
+                "processes": count,
+            }
+        return usage
+
+    def print_usage(self, interval=5.0):
+        """按显示方式汇总 CPU 和内存占用，并与 visible 比较"""
+        print(f"正在采样 {interval:g} 秒...")
+        usage = self.measure_usage(interval)
+        if not usage:
+            print("没有可统计的活动会话")
+            return
+        by_mode = {}
+        for session_id, item in sorted(usage.items()):
+            print(f"会话 {session_id} [{item['display']}]: CPU {item['cpu_percent']:.1f}%  内存 {item['rss'] / 1024 / 1024:.0f} MB  进程 {item['processes']} 个")
+            by_mode.setdefault(item['display'], []).append(item)
+        print("-" * 30)
+        averages = {}
+        for mode, items in by_mode.items():
+            cpu = sum(i['cpu_percent'] for i in items) / len(items)
+            rss = sum(i['rss'] for i in items) / len(items)
+            averages[mode] = (cpu, rss)
+            print(f"{mode}: {len(items)} 个会话, 平均 CPU {cpu:.1f}%  平均内存 {rss / 1024 / 1024:.0f} MB")
+        if 'visible' in averages:
+            base_cpu, base_rss = averages['visible']
+            for mode, (cpu, rss) in averages.items():
+                if mode == 'visible':
+                    continue
+                cpu_saving = (1 - cpu / base_cpu) * 100 if base_cpu else 0.0
+                rss_saving = (1 - rss / base_rss) * 100 if base_rss else 0.0
+                print(f"{mode} 相比 visible: CPU 节省 {cpu_saving:.0f}%  内存节省 {rss_saving:.0f}%")
+        else:
+            print("没有 visible 会话可供比较")
+
+    def gc_caches(self, max_age_days=None, max_size_mb=None, dry_run=False):
+        """清理未运行会话的缓存目录，返回 (清理的字节数, 缓存总字节数)
+
+        除了本程序登记的会话，调试端口上还有 Chrome 在响应的会话（例如其他进程打开的）也跳过；
+        锁文件和 DevToolsActivePort 由 profile_gc 检查
+        """
+        with self.drivers_lock:
+            running = set(self.drivers)
+        sessions = dict(self.session_items())
+        running |= {sid for sid, info in sessions.items()
+                    if sid not in running and self._debugger_alive(info['debug_port'])}
+        live = [sessions[sid]['user_data_dir'] for sid in running if sid in sessions]
+        if live:
+            print(f"跳过正在运行的会话: {', '.join(sorted(running))}")
+        return profile_gc.collect(max_age_days, max_size_mb, skip=live, dry_run=dry_run)
+
     def list_sessions(self):
         """列出所有保存的会话"""
         if not self.sessions:
@@ -309,65 +682,91 @@ class ChromeSessionManager:
             print(f"创建时间: {info['created_at']}")
             print(f"最后使用: {info.get('last_used', '未知')}")
             print(f"窗口位置: X={info.get('position', {}).get('x', '未知')} Y={info.get('position', {}).get('y', '未知')}")
+            print(f"显示方式: {info.get('display', 'visible')}")
+            if session_id in self.memory_usage:
+                budget = info.get('memory_budget_mb', DEFAULT_BUDGET_MB)
+                print(f"内存: {self.memory_usage[session_id] / 1024 / 1024:.0f} MB（预算 {budget} MB）")
             print("-" * 30)
 
-    def _do_task(self, session_id, driver):
-        """执行任务"""
+    def _do_task(self, session_id, driver, contract_address=DEFAULT_CONTRACT):
+        """执行任务：打开指定合约的代币页面（直接打开失败时在首页搜索），成功返回 True"""
         try:
             # 增加页面加载超时时间
             driver.set_page_load_timeout(30)
             driver.set_script_timeout(30)
             
-            try:
-                driver.get("https://pump.fun")
-            except TimeoutException:
-                print(f"会话 {session_id} 页面加载超时，继续执行...")
-            except Exception as e:
-                print(f"会话 {session_id} 页面加载出错: {e}")
-            
+            # 单页面任务总在主标签页中执行，不改动标签页池中的页面
+            pool = self.tab_pools.get(session_id)
+            if pool and pool.driver is driver:
+                pool.home()
             note = self.sessions[session_id].get('note', '')
             print(f"会话 {session_id} {f'({note})' if note else ''} 开始执行任务")
-
-            # 等待页面加载完成
-            time.sleep(3)  # 添加固定等待时间
-
-            # 最多尝试20次，每次间隔0.5秒
-            for i in range(20):
-                try:
-                    # 尝试找到搜索框
-                    search_box = driver.find_element(By.CSS_SELECTOR, '#search-token')
-                    if search_box:
-                        search_box.clear()
-                        search_box.send_keys("CRAMvzDsSpXYsFpcoDr6vFLJMBeftez1E7277xwPpump")
-                        print(f"会话 {session_id} 输入完成")
-                        
-                        time.sleep(0.5)  # 添加短暂延迟
-                        
-                        # 尝试找到并点击按钮
-                        button = driver.find_element(By.CSS_SELECTOR, 'form button:nth-child(2)')
-                        if button:
-                            button.click()
-                            print(f"会话 {session_id} 点击完成")
-                            return session_id, driver
-                        
-                except:
-                    time.sleep(0.5)  # 增加等待时间
-                    continue
-            
-            print(f"会话 {session_id} 未找到元素")
-            return session_id, driver
+            method = token_resolver.open_token_page(
+                driver, contract_address,
+                search=lambda: self._search_contract(session_id, driver, contract_address),
+                label=f"会话 {session_id} ",
+            )
+            return method is not None
             
         except Exception as e:
             print(f"会话 {session_id} 执行任务时出错: {e}")
-            return session_id, driver  # 返回driver而不是抛出异常
+            return False  # 返回失败而不是抛出异常
+
+    def _search_contract(self, session_id, driver, contract_address):
+        """在首页搜索合约，等到页面上出现代币内容才返回 True（搜索耗时和标签页池都以此为准）"""
+        from selenium.webdriver.common.by import By
+        from selenium.common.exceptions import TimeoutException
+        try:
+            driver.get("https://pump.fun")
+        except TimeoutException:
+            print(f"会话 {session_id} 页面加载超时，继续执行...")
+        except Exception as e:
+            print(f"会话 {session_id} 页面加载出错: {e}")
+
+        # 等待页面加载完成
+        time.sleep(3)  # 添加固定等待时间
+
+        # 最多尝试20次，每次间隔0.5秒
+        for i in range(20):
+            try:
+                # 尝试找到搜索框
+                search_box = driver.find_element(By.CSS_SELECTOR, '#search-token')
+                if search_box:
+                    search_box.clear()
+                    search_box.send_keys(contract_address)
+                    print(f"会话 {session_id} 输入完成")
+                    
+                    time.sleep(0.5)  # 添加短暂延迟
+                    
+                    # 尝试找到并点击按钮
+                    button = driver.find_element(By.CSS_SELECTOR, 'form button:nth-child(2)')
+                    if button:
+                        button.click()
+                        print(f"会话 {session_id} 点击完成")
+                        # 点击后停在搜索结果页时不算成功，否则结果页会被当作代币页面计时和放进标签页池
+                        if token_resolver.wait_for_token_page(driver, contract_address):
+                            return True
+                        print(f"会话 {session_id} 搜索后没有打开代币页面")
+                        return False
+                    
+            except:
+                time.sleep(0.5)  # 增加等待时间
+                continue
+        
+        print(f"会话 {session_id} 未找到元素")
+        return False
 
     def _restore_single_session_thread(self, session_id):
         """在线程中恢复单个会话"""
+        if cancelled():
+            return None
         print(f"正在恢复会话 {session_id}...")
         driver = self.connect_to_session(session_id)
         if driver:
             try:
-                self._do_task(session_id, driver)
+                # 附加到正在运行的浏览器时保留当前网页
+                if session_id not in self.attached:
+                    self._do_task(session_id, driver)
                 return session_id, driver
             except Exception as e:
                 print(f"会话 {session_id} 恢复时出错: {e}")
@@ -377,24 +776,26 @@ class ChromeSessionManager:
                     pass
         return None
 
-    def restore_all_sessions(self):
-        """并行恢复所有保存的会话"""
-        session_ids = list(self.sessions.keys())
-        restored_drivers = []
-        
-        with ThreadPoolExecutor(max_workers=len(session_ids)) as executor:
-            # 创建Future对象列表
-            future_to_session = {
-                executor.submit(self._restore_single_session_thread, session_id): session_id 
-                for session_id in session_ids
-            }
-            
-            # 获取结果
-            for future in as_completed(future_to_session):
-                result = future.result()
-                if result:
-                    restored_drivers.append(result)
-        
+    def restore_all_sessions(self, strategy="ramp"):
+        """恢复所有保存的会话
+
+        strategy: ramp 按主机负载逐步加大并发（默认）/ all 全部同时启动 / seq 逐个启动
+        """
+        session_ids = [session_id for session_id, _ in self.session_items()]
+        if not session_ids:
+            print("没有可以恢复的会话")
+            return []
+        start = time.perf_counter()
+        if strategy == "all":
+            ramp = LaunchRamp(start_parallel=len(session_ids), max_parallel=len(session_ids), adaptive=False)
+        elif strategy == "seq":
+            ramp = LaunchRamp(start_parallel=1, max_parallel=1, adaptive=False)
+        else:
+            ramp = LaunchRamp()
+        results = ramp.run(session_ids, self._restore_single_session_thread)
+        restored_drivers = [result for result in results if result]
+        RESTORE_SECONDS.observe(time.perf_counter() - start, strategy=strategy)
+        print(f"恢复完成 ({strategy}): {len(restored_drivers)}/{len(session_ids)} 个会话，总耗时 {time.perf_counter() - start:.1f}s，{ramp.summary()}")
         return restored_drivers
 
     def restart_session(self, session_id):
@@ -412,8 +813,8 @@ class ChromeSessionManager:
                 except:
                     pass
         
-        # 重新连接会话
-        driver = self.connect_to_session(session_id)
+        # 重新启动会话（不附加到正在运行的浏览器）
+        driver = self.connect_to_session(session_id, attach=False)
         if driver:
             try:
                 driver.set_page_load_timeout(30)
@@ -528,8 +929,27 @@ class ChromeSessionManager:
             print(f"复制插件时出错: {e}")
             return False
 
-    def batch_clone_sessions(self, from_session_id, count):
-        """批量创建新会话并复制插件"""
+    def _create_cloned_session(self, from_session_id, new_session_id, note=None, display="visible"):
+        """创建新会话、复制插件并重新打开，返回 driver（失败返回 None）"""
+        print(f"正在创建会话 {new_session_id}...")
+        # 创建新会话
+        session_id, driver = self.create_new_session(new_session_id, note, display)
+        if not driver:
+            return None
+        # 先关闭driver以便复制插件
+        driver.quit()
+        
+        print(f"正在复制插件到会话 {new_session_id}...")
+        # 复制插件
+        if not self.clone_extensions(from_session_id, new_session_id):
+            print(f"会话 {new_session_id} 复制插件失败")
+            return None
+        print(f"正在重启会话 {new_session_id}...")
+        # 重新启动会话以加载插件
+        return self.connect_to_session(new_session_id, attach=False)
+
+    def batch_clone_sessions(self, from_session_id, count, notes=None):
+        """并行批量创建新会话并复制插件，notes 为空时逐个询问备注"""
         if from_session_id not in self.sessions:
             print(f"源会话 {from_session_id} 不存在")
             return []
@@ -540,37 +960,139 @@ class ChromeSessionManager:
             print(f"警告: 源会话 {from_session_id} 没有安装插件")
             return []
         
+        session_ids = self.batch_session_ids(count)
+        if notes is None:
+            notes = self._ask_notes(session_ids)
+        
+        def clone_one(new_session_id, note):
+            if cancelled():
+                return None
+            driver = self._create_cloned_session(from_session_id, new_session_id, note)
+            if driver:
+                try:
+                    self._do_task(new_session_id, driver)
+                    print(f"会话 {new_session_id} 创建完成")
+                    return new_session_id, driver
+                except Exception as e:
+                    print(f"执行任务时出错: {e}")
+            return None
+        
         new_drivers = []
-        start_id = len(self.sessions) + 1
+        with ThreadPoolExecutor(max_workers=max(1, count)) as executor:
+            futures = [submit_with_job(executor, clone_one, sid, note) for sid, note in zip(session_ids, notes)]
+            for future in as_completed(futures):
+                result = future.result()
+                if result:
+                    new_drivers.append(result)
         
-        for i in range(count):
-            new_session_id = str(start_id + i)
-            note = input(f"请为第 {new_session_id} 个Chrome输入备注（直接回车跳过）: ").strip()
+        return new_drivers
+
+    def _next_session_ids(self, count, reserved=()):
+        """分配 count 个未被使用的会话ID"""
+        with self._save_lock:
+            used = set(self.sessions) | set(reserved)
+        ids = []
+        candidate = 1
+        while len(ids) < count:
+            if str(candidate) not in used:
+                ids.append(str(candidate))
+            candidate += 1
+        return ids
+
+    def _apply_spec_session(self, entry, task):
+        """按配置启动一个会话并执行任务，返回结果记录"""
+        session_id = entry["id"]
+        note = entry.get("note")
+        template = entry.get("template")
+        display = entry.get("display")
+        if display is not None and display not in DISPLAY_MODES:
+            return {"id": session_id, "ok": False, "timings": {}, "error": f"未知的显示方式: {display}"}, None
+        timings = {}
+        result = {"id": session_id, "ok": False, "timings": timings, "error": None}
+        start = time.perf_counter()
+        try:
+            if template:
+                action = "clone"
+                driver = self._create_cloned_session(template, session_id, note, display or "visible")
+            elif session_id in self.sessions:
+                action = "connect"
+                if display:
+                    self.update_session(session_id, display=display)
+                driver = self.connect_to_session(session_id, display=display)
+            else:
+                action = "create"
+                session_id, driver = self.create_new_session(session_id, note, display or "visible")
+            timings["launch"] = round(time.perf_counter() - start, 3)
+            result["action"] = action
+            if not driver:
+                result["error"] = f"{action} 失败"
+                return result, None
             
-            print(f"正在创建会话 {new_session_id}...")
-            # 创建新会话
-            session_id, driver = self.create_new_session(new_session_id, note)
-            if driver:
-                # 先关闭driver以便复制插件
-                driver.quit()
-                
-                print(f"正在复制插件到会话 {new_session_id}...")
-                # 复制插件
-                if self.clone_extensions(from_session_id, new_session_id):
-                    print(f"正在重启会话 {new_session_id}...")
-                    # 重新连接会话以加载插件
-                    driver = self.connect_to_session(new_session_id)
+            if task:
+                task_start = time.perf_counter()
+                ok = TASKS[task["name"]](self, session_id, driver, **task.get("params", {}))
+                timings["task"] = round(time.perf_counter() - task_start, 3)
+                if not ok:
+                    result["error"] = "任务返回失败"
+                    return result, driver
+            result["ok"] = True
+            return result, driver
+        except Exception as e:
+            result["error"] = str(e)
+            return result, None
+        finally:
+            timings["total"] = round(time.perf_counter() - start, 3)
+
+    def apply_spec(self, spec):
+        """按配置文件无交互地启动会话并执行任务，返回汇总结果
+
+        配置格式:
+        {
+            "restore": false,                       # 是否先恢复所有已保存的会话
+            "concurrency": 8,                       # 最大并行数，默认全部同时启动
+            "sessions": [                           # 要启动的会话，id 省略时自动分配
+                {"id": "5", "note": "备注", "template": "1", "display": "headless"}
+                # template: 从该会话克隆插件; display: visible / offscreen / headless
+            ],
+            "task": {"name": "search", "params": {"contract_address": "..."}}
+        }
+        """
+        started = time.perf_counter()
+        summary = {"sessions": [], "restored": [], "failures": 0}
+        task = spec.get("task")
+        if task and task.get("name") not in TASKS:
+            raise ValueError(f"未知任务: {task.get('name')}")
+        
+        if spec.get("restore") and self.sessions:
+            restore_start = time.perf_counter()
+            restored = self.restore_all_sessions()
+            self.track_drivers(restored)
+            summary["restored"] = sorted(sid for sid, _ in restored)
+            summary["restore_seconds"] = round(time.perf_counter() - restore_start, 3)
+        
+        entries = [dict(entry) for entry in spec.get("sessions", [])]
+        missing = [entry for entry in entries if not entry.get("id")]
+        new_ids = self._next_session_ids(len(missing), reserved=[str(e["id"]) for e in entries if e.get("id")])
+        for entry, session_id in zip(missing, new_ids):
+            entry["id"] = session_id
+        for entry in entries:
+            entry["id"] = str(entry["id"])
+        
+        if entries:
+            workers = spec.get("concurrency") or len(entries)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [submit_with_job(executor, self._apply_spec_session, entry, task) for entry in entries]
+                for future in as_completed(futures):
+                    result, driver = future.result()
                     if driver:
-                        try:
-                            self._do_task(new_session_id, driver)
-                            new_drivers.append((new_session_id, driver))
-                            print(f"会话 {new_session_id} 创建完成")
-                        except Exception as e:
-                            print(f"执行任务时出错: {e}")
-                else:
-                    print(f"会话 {new_session_id} 复制插件失败")
+                        self.track_drivers([(result["id"], driver)])
+                    if not result["ok"]:
+                        summary["failures"] += 1
+                    summary["sessions"].append(result)
         
-        return new_drivers
+        summary["sessions"].sort(key=lambda r: int(r["id"]) if r["id"].isdigit() else 0)
+        summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return summary
 
     def clear_session(self, session_id):
         """清除指定会话的进程和本地数据"""
@@ -589,20 +1111,18 @@ class ChromeSessionManager:
                     pass
         
         try:
-            # 2. 删除用户数据目录（无论会话是否存在）
+            # 2. 删除用户数据目录（无论会话是否存在）：先移入回收区，后台删除
             user_data_dir = os.path.abspath(f"chrome_data/user_{session_id}")
             if os.path.exists(user_data_dir):
                 try:
-                    shutil.rmtree(user_data_dir)
-                    print(f"已删除用户数据目录: {user_data_dir}")
+                    profile_gc.move_to_trash(user_data_dir)
+                    print(f"已移除用户数据目录: {user_data_dir}（后台删除中）")
                 except Exception as e:
                     print(f"删除用户数据目录时出错: {e}")
                     success = False
             
             # 3. 从sessions中移除（如果存在）
-            if session_id in self.sessions:
-                del self.sessions[session_id]
-                self._save_sessions()
+            if self.remove_session(session_id):
                 print(f"已从会话列表中移除会话 {session_id}")
             else:
                 print(f"会话 {session_id} 不存在于会话列表中，仅清理数据")
@@ -617,85 +1137,422 @@ def show_help():
     可用指令：
     1. new                 - 创建新的Chrome会话
     2. new [数量]          - 批量创建指定数量的Chrome会话
-    3. connect [id]        - 连接到指定ID的Chrome会话
-    4. restart [id]        - 重启指定ID的Chrome会话
+    3. connect [id]        - 连接到指定ID的Chrome会话（浏览器还在运行时直接附加，保留当前网页）
+    4. restart [id]        - 关闭并重新启动指定ID的Chrome会话
     5. run [id]           - 重新执行指定ID的任务
-    6. restore            - 恢复所有保存的会话
+    6. restore [ramp|all|seq] - 恢复所有保存的会话（默认 ramp: 按负载逐步加大并发；all: 同时启动；seq: 逐个启动）
     7. copy [from_id] [to_id] - 复制from_id的插件到已存在的to_id会话
     8. clone [from_id] [count] - 从from_id克隆count个新会话
     9. quit [id]          - 退出指定ID的会话
     10. clear [id]        - 清除指定ID的会话数据和进程
     11. list              - 显示所有已保存的会话
-    12. help              - 显示帮助信息
-    13. exit              - 退出所有会话并退出程序
-    """)
+    12. submit [task] [key=value ...] - 提交任务到调度队列
+                            可选: session=[id] priority=[数字] retries=[次数] timeout=[秒] wait_for_session=1（指定的会话没运行时等它启动）
+                            task: search(contract_address=) / token(contract_address=) / tab(key=, url=) / open(url=) / script(js=) / macro(name=, 槽位=)
+    13. submit [jobs.jsonl] - 从文件批量提交任务，每行一个JSON
+    14. queue             - 显示调度队列状态和耗时统计
+    15. drain             - 等待队列中的任务全部完成
+    16. serve [port]      - 启动本地 JSON-RPC 控制接口（默认 %d）
+    17. metrics [port]    - 启动 Prometheus 指标接口（默认 %d，GET /metrics）
+    18. mode [id] [visible|offscreen|headless] - 设置会话的显示方式（headless 不显示窗口，最省资源）
+    19. show [id]         - 临时显示会话窗口（例如手动操作钱包）
+    20. hide [id]         - 恢复会话设置的显示方式
+    21. usage [秒]        - 统计各会话的 CPU 和内存，并比较不同显示方式的节省
+    22. memory [check]    - 查看各会话内存；加 check 在后台检查一次，超出预算时释放内存或重启
+    23. memory on [MB] [秒] - 启动后台内存监控（默认 %d MB/会话，每 %d 秒）
+    24. memory off        - 停止内存监控
+    25. gc [age=天] [size=MB] [dry] - 清理未运行会话的缓存目录（Cache/Code Cache/GPUCache 等）
+                            age: 只清理超过这么多天没更新的; size: 每个会话最多保留的缓存; dry: 只统计
+    26. export [文件] [id ...] [compare] - 导出会话配置目录（默认全部，插件等相同文件只存一份，不含缓存）
+                            compare: 同时打一个 tar.gz 比较大小和用时
+    27. import [文件]     - 导入导出的会话（ID 冲突时自动分配新ID，路径改为本机）
+    28. tab [id] [合约]    - 在会话的新标签页中打开代币页面，已打开过的直接切换（每个会话最多 %d 个，超出时关闭最久没用的）
+    29. tabs [id]         - 显示会话打开的代币标签页
+    30. macro record [id] [名称] [槽位=值 ...] - 在会话中录制操作（点击、输入、等待），录制时的值会成为可替换的槽位
+    31. macro stop        - 结束录制，整理成回放计划保存到 macros/名称.json
+    32. macro list / macro show [名称] - 查看已保存的宏和回放计划
+    33. macro run [名称] [id,id,...|all] [槽位=值 ...] - 在多个会话中并行回放，输出每一步的耗时
+    34. jobs              - 显示后台任务（new/connect/restart/run/restore/copy/clone/drain/usage/export/import/gc 都在后台执行，输出前带 [任务ID]）
+    35. wait [任务ID]     - 等待后台任务完成（Ctrl+C 停止等待）
+    36. cancel [任务ID]   - 取消后台任务（还没启动的会话不再启动，正在进行的步骤会完成）
+    37. profile start [每秒次数] - 开始采样分析所有线程（默认每秒 %d 次），不需要重启
+    38. profile stop [文件] [top=数量] - 结束采样，写出折叠调用栈文件（火焰图）并显示耗时分布和最热的函数
+    39. startup           - 显示启动耗时
+    40. help              - 显示帮助信息
+    41. exit              - 退出所有会话并退出程序
+    """ % (DEFAULT_PORT, metrics.DEFAULT_PORT, DEFAULT_BUDGET_MB, DEFAULT_INTERVAL, DEFAULT_MAX_TABS, sampling_profiler.DEFAULT_HZ))
+
+def parse_job_options(args):
+    """解析 submit 指令的 key=value 参数"""
+    options = {"params": {}}
+    for arg in args:
+        if "=" not in arg:
+            raise ValueError(f"参数格式应为 key=value: {arg}")
+        key, value = arg.split("=", 1)
+        if key == "session":
+            options["session_id"] = value
+        elif key in ("priority", "retries"):
+            options[key] = int(value)
+        elif key == "timeout":
+            options[key] = float(value)
+        elif key == "wait_for_session":
+            options[key] = value.lower() in ("1", "true", "yes")
+        else:
+            options["params"][key] = value
+    return options
+
+def run_spec(manager, spec_path, summary_path=None):
+    """无交互模式：执行配置文件，输出 JSON 汇总，有失败时返回非0"""
+    try:
+        with open(spec_path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        # 过程日志输出到 stderr，stdout 只输出 JSON 汇总
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = manager.apply_spec(spec)
+    except (OSError, ValueError) as e:
+        summary = {"error": str(e), "failures": 1, "sessions": []}
+    
+    output = json.dumps(summary, ensure_ascii=False, indent=2)
+    if summary_path:
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return 1 if summary["failures"] else 0
+
+def start_control_server(manager, scheduler, port, host="127.0.0.1", **agent_info):
+    """启动控制接口，端口被占用时返回 None"""
+    try:
+        server = ControlServer(manager, scheduler, host=host, port=port, **agent_info)
+    except (OSError, ValueError) as e:
+        print(f"控制接口启动失败: {e}")
+        return None
+    server.start()
+    return server
+
+def fleet_metrics(manager, scheduler):
+    """返回一个抓取时统计会话状态、调度队列和各会话内存的函数"""
+    def collect():
+        with manager.drivers_lock:
+            drivers = dict(manager.drivers)
+        unhealthy = sum(1 for driver in drivers.values() if driver in scheduler._unhealthy)
+        stats = scheduler.stats()
+        table = process_table()
+        rss = []
+        for session_id, driver in drivers.items():
+            pid = manager.session_root_pid(session_id, driver)
+            if pid:
+                rss.append(({"session": session_id, "display": manager.live_display.get(session_id, "visible")},
+                            tree_usage(pid, table)[0]))
+        return [
+            ("chrome_sessions_saved", "gauge", "已保存的会话数", [({}, len(manager.sessions))]),
+            ("chrome_sessions_live", "gauge", "活动的会话数", [({}, len(drivers))]),
+            ("chrome_sessions_unhealthy", "gauge", "健康检查失败的会话数", [({}, unhealthy)]),
+            ("chrome_sessions_attached", "gauge", "附加到已运行浏览器的会话数", [({}, len(manager.attached))]),
+            ("chrome_scheduler_queue_depth", "gauge", "等待执行的任务数", [({}, stats["queue_depth"])]),
+            ("chrome_scheduler_running", "gauge", "正在执行的任务数", [({}, stats["running"])]),
+            ("chrome_session_rss_bytes", "gauge", "会话进程树的内存占用", rss),
+        ]
+    return collect
+
+def start_metrics_server(port):
+    """启动指标接口，端口被占用时返回 None"""
+    try:
+        server = metrics.MetricsServer(port=port)
+    except OSError as e:
+        print(f"指标接口启动失败: {e}")
+        return None
+    server.start()
+    return server
+
+# ---- 交互模式中在后台执行的指令 ----
+
+def _open_start_page(manager, session_id, driver):
+    try:
+        driver.set_page_load_timeout(30)
+        manager._do_task(session_id, driver)
+    except Exception as e:
+        print(f"打开网页时出错: {e}")
+        print("请手动在浏览器中输入网址: https://pump.fun")
+
+def _new_session_job(manager):
+    session_id, driver = manager.create_new_session()
+    if driver:
+        manager.track_drivers([(session_id, driver)])
+        _open_start_page(manager, session_id, driver)
+
+def _batch_create_job(manager, count, notes):
+    print(f"正在并行创建 {count} 个Chrome会话...")
+    manager.track_drivers(manager.batch_create_sessions(count, notes))
+
+def _with_session(scheduler, session_id, func, *args):
+    """占用会话后执行 func（先等这个会话上正在执行的调度任务结束），期间调度器和内存监控都不会使用它"""
+    waiting = False
+    while not scheduler.reserve(session_id):
+        if cancelled():
+            return None
+        if not waiting:
+            print(f"等待会话 {session_id} 正在执行的调度任务结束...")
+            waiting = True
+        time.sleep(0.2)
+    try:
+        return func(*args)
+    finally:
+        scheduler.release(session_id)
+
+def _start_session_job(jobs, scheduler, command, session_id, func, *args):
+    """在后台执行操作单个会话的指令：同时使用 session_key（和其他后台任务互斥）和调度器的占用（和调度任务、内存监控互斥）"""
+    return jobs.start(command, _with_session, scheduler, session_id, func, *args, key=session_key(session_id))
+
+def _connect_job(manager, session_id):
+    driver = manager.connect_to_session(session_id)
+    if driver:
+        manager.track_drivers([(session_id, driver)])
+        # 附加到正在运行的浏览器时保留当前网页
+        if session_id not in manager.attached:
+            _open_start_page(manager, session_id, driver)
+
+def _restart_job(manager, session_id):
+    # 移除旧的driver
+    manager.untrack_driver(session_id)
+    result = manager.restart_session(session_id)
+    if result:
+        manager.track_drivers([result])
+        print(f"会话 {session_id} 已重启")
+
+def _run_job(manager, session_id):
+    driver = manager.drivers.get(session_id)
+    if not driver:
+        print(f"未找到会话 {session_id} 的活动窗口，请先使用 connect 或 restart 命令")
+        return
+    try:
+        manager._do_task(session_id, driver)
+        print(f"会话 {session_id} 任务执行完成")
+    except Exception as e:
+        print(f"执行任务时出错: {e}")
+
+def _tab_job(manager, scheduler, session_id, contract_address):
+    """在提示符线程中切换到已打开的代币标签页（几毫秒），会话正忙时不等待，直接提示"""
+    if not scheduler.reserve(session_id):
+        print(f"会话 {session_id} 正在执行调度任务，请稍后再试")
+        return
+    try:
+        manager.open_token_tab(session_id, contract_address)
+    finally:
+        scheduler.release(session_id)
+
+def _memory_check_job(memory_monitor):
+    actions = memory_monitor.check()
+    if not actions:
+        print("所有会话都在预算内")
+
+def _restore_job(manager, strategy):
+    manager.track_drivers(manager.restore_all_sessions(strategy))
+
+def _copy_job(manager, from_id, to_id):
+    # 复制到现有会话
+    if manager.clone_extensions(from_id, to_id):
+        # 移除目标会话的driver
+        manager.untrack_driver(to_id)
+        # 重新启动会话以加载插件
+        driver = manager.connect_to_session(to_id, attach=False)
+        if driver:
+            manager.track_drivers([(to_id, driver)])
+            try:
+                manager._do_task(to_id, driver)
+            except Exception as e:
+                print(f"执行任务时出错: {e}")
+
+def _clone_job(manager, from_id, count, notes):
+    manager.track_drivers(manager.batch_clone_sessions(from_id, count, notes))
+
+def _export_job(manager, session_ids, archive_path, compare):
+    sessions = dict(manager.session_items())
+    stats = profile_archive.export_profiles(sessions, session_ids, archive_path)
+    baseline = profile_archive.tarball_baseline(sessions, session_ids) if compare else None
+    profile_archive.print_export_stats(stats, baseline)
+
+def _import_job(manager, archive_path):
+    profile_archive.import_profiles(manager, archive_path)
+
+def _gc_job(manager, options):
+    freed, total = manager.gc_caches(**options)
+    print(f"缓存共 {total / 1024 / 1024:.1f} MB，{'可' if options['dry_run'] else '已'}清理 {freed / 1024 / 1024:.1f} MB")
+
+def _record_job(manager, session_id, name, slots):
+    driver = manager.drivers.get(session_id)
+    if not driver:
+        print(f"未找到会话 {session_id} 的活动窗口，请先使用 connect 或 restart 命令")
+        return
+    task_macros.record(driver, name, slots, session_id)
+
+def _macro_command(manager, scheduler, jobs, raw_command):
+    """macro record / stop / list / show / run"""
+    parts = raw_command.split()[1:]
+    action = parts[0].lower() if parts else ""
+    slots = {}
+    for arg in parts[3:] if action in ("record", "run") else ():
+        if "=" not in arg:
+            print(f"槽位格式应为 名称=值: {arg}")
+            return
+        key, value = arg.split("=", 1)
+        slots[key] = value
+    if action == "record" and len(parts) >= 3:
+        session_id, name = parts[1], parts[2]
+        if not task_macros.valid_name(name):
+            print("宏名称只能包含字母、数字、下划线和 -")
+        elif session_id not in manager.drivers:
+            print(f"未找到会话 {session_id} 的活动窗口，请先使用 connect 或 restart 命令")
+        else:
+            _start_session_job(jobs, scheduler, raw_command, session_id, _record_job, manager, session_id, name, slots)
+    elif action == "stop" and len(parts) == 1:
+        if not task_macros.stop_recording():
+            print("没有正在录制的宏")
+    elif action == "list" and len(parts) == 1:
+        names = task_macros.list_macros()
+        print("已保存的宏: " + (", ".join(names) if names else "无"))
+    elif action == "show" and len(parts) == 2:
+        try:
+            task_macros.print_plan(task_macros.load_macro(parts[1]))
+        except ValueError as e:
+            print(e)
+    elif action == "run" and len(parts) >= 3:
+        try:
+            plan = task_macros.load_macro(parts[1])
+            task_macros.fill_slots(plan, slots)
+        except ValueError as e:
+            print(e)
+            return
+        # 回放期间一直占用这些会话的 key（all 占用全部会话），其他操作会话的指令不能同时运行
+        if parts[2].lower() == "all":
+            session_ids = sorted(manager.drivers, key=lambda sid: int(sid) if sid.isdigit() else 0)
+            key = ALL_SESSIONS
+        else:
+            session_ids = [sid for sid in parts[2].split(",") if sid]
+            busy = [sid for sid in session_ids if jobs.running(session_key(sid))]
+            if busy:
+                print(f"会话 {', '.join(busy)} 有后台任务在运行，跳过")
+            session_ids = [sid for sid in session_ids if sid not in busy]
+            key = tuple(session_key(sid) for sid in session_ids)
+        if not session_ids:
+            print("没有可以回放的会话")
+            return
+        # 密码槽位的值不显示在后台任务列表和输出中
+        secret = set(task_macros.secret_slots(plan["steps"]))
+        label = " ".join(arg.split("=", 1)[0] + "=***" if arg.split("=", 1)[0] in secret else arg for arg in raw_command.split())
+        jobs.start(label, task_macros.replay_parallel, manager, plan, session_ids, slots, scheduler, key=key)
+    else:
+        print("请使用正确的格式: macro record [id] [名称] [槽位=值 ...] / macro stop / macro list / macro show [名称] / macro run [名称] [id,id,...|all] [槽位=值 ...]")
+
+def _drain_job(scheduler):
+    print("等待队列中的任务全部完成...")
+    scheduler.drain()
+    scheduler.print_stats()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chrome 多会话管理")
+    parser.add_argument("--spec", help="无交互模式：按配置文件启动会话并执行任务后退出")
+    parser.add_argument("--summary", help="无交互模式下把 JSON 汇总另存到该文件")
+    parser.add_argument("--serve", type=int, nargs="?", const=DEFAULT_PORT, help="启动本地 JSON-RPC 控制接口（默认端口 %d）" % DEFAULT_PORT)
+    parser.add_argument("--metrics", type=int, nargs="?", const=metrics.DEFAULT_PORT, help="启动 Prometheus 指标接口（默认端口 %d）" % metrics.DEFAULT_PORT)
+    # 多主机: 每台机器（或同一台机器上的每个目录）运行一个 agent，由 fleet.py 统一管理
+    parser.add_argument("--agent", action="store_true", help="agent 模式：不进入交互，只通过控制接口接受指令，Ctrl+C 退出")
+    parser.add_argument("--name", help="agent 名称（默认为主机名）")
+    parser.add_argument("--listen", default="127.0.0.1", help="控制接口监听地址，跨主机使用时改为本机的内网地址（必须先设置环境变量 CONTROL_TOKEN）")
+    parser.add_argument("--base-dir", help="会话文件和 chrome_data 所在的目录（默认当前目录）")
+    parser.add_argument("--port-base", type=int, default=DEBUG_PORT_BASE, help="调试端口基数，会话N使用 基数+N（默认 %d）" % DEBUG_PORT_BASE)
+    parser.add_argument("--capacity", type=int, help="agent 最多运行的会话数，控制器据此分配新会话（默认 CPU 核数）")
+    parser.add_argument("--restore", action="store_true", help="agent 模式下启动时恢复所有已保存的会话")
+    parser.add_argument("--launch-profile", choices=list(PROFILES), help="Chrome 启动参数组合（默认 fast，见 launch_profiles.py）")
+    return parser.parse_args()
+
+def run_agent(manager, scheduler, args):
+    """agent 模式：启动控制接口后等待，直到 Ctrl+C"""
+    server = start_control_server(manager, scheduler, args.serve or DEFAULT_PORT, host=args.listen,
+                                  name=args.name or socket.gethostname(), capacity=args.capacity)
+    if not server:
+        return 1
+    if args.restore and manager.sessions:
+        manager.track_drivers(manager.restore_all_sessions())
+    print(f"agent {server.name} 已就绪: {len(manager.sessions)} 个会话，调试端口基数 {manager.port_base}，按 Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+    scheduler.shutdown()
+    for session_id in list(manager.drivers):
+        manager.quit_session(session_id)
+    print("agent 已退出")
+    return 0
 
 def main():
-    manager = ChromeSessionManager()
-    current_drivers = []
+    args = parse_args()
+    if args.spec:
+        args.spec = os.path.abspath(args.spec)
+    if args.summary:
+        args.summary = os.path.abspath(args.summary)
+    if args.base_dir:
+        # 会话文件、chrome_data、回收站等都使用相对路径，切换工作目录即可让多个 agent 互不干扰
+        os.makedirs(args.base_dir, exist_ok=True)
+        os.chdir(args.base_dir)
+    manager = ChromeSessionManager(port_base=args.port_base, launch_profile=args.launch_profile)
+    if args.spec:
+        sys.exit(run_spec(manager, args.spec, args.summary))
+    scheduler = SessionScheduler(manager)
+    memory_monitor = MemoryMonitor(manager, scheduler)
+    metrics.add_collector(fleet_metrics(manager, scheduler))
+    metrics_server = None
+    if args.metrics:
+        metrics_server = start_metrics_server(args.metrics)
+    if args.agent:
+        code = run_agent(manager, scheduler, args)
+        if metrics_server:
+            metrics_server.stop()
+        sys.exit(code)
+    control_server = None
+    if args.serve:
+        control_server = start_control_server(manager, scheduler, args.serve, host=args.listen)
+    jobs = JobTable()  # 耗时的指令在后台执行
+    memory_monitor.jobs = jobs
     
     # 启动时询问是否恢复会话
+    startup_profile.ready("first prompt")
     if manager.sessions:
         print(f"\n发现 {len(manager.sessions)} 个已保存的会话")
         restore = input("是否要恢复这些会话？(y/n): ").strip().lower()
         if restore == 'y':
-            current_drivers = manager.restore_all_sessions()
+            manager.track_drivers(manager.restore_all_sessions())
     
     while True:
-        command = input("\n请输入指令 (输入 'help' 获取指令列表): ").strip().lower()
+        raw_command = input("\n请输入指令 (输入 'help' 获取指令列表): ").strip()
+        command = raw_command.lower()
         
         if command.startswith("new"):
             parts = command.split()
             if len(parts) == 2 and parts[1].isdigit():
-                # 并行批量创建
+                # 并行批量创建，备注先在前台问完
                 count = int(parts[1])
-                print(f"正在并行创建 {count} 个Chrome会话...")
-                new_drivers = manager.batch_create_sessions(count)
-                current_drivers.extend(new_drivers)
+                if jobs.busy("create"):
+                    continue
+                notes = manager._ask_notes(manager.batch_session_ids(count))
+                jobs.start(raw_command, _batch_create_job, manager, count, notes, key="create")
             else:
-                # 创建单个
-                session_id, driver = manager.create_new_session()
-                if driver:
-                    current_drivers.append((session_id, driver))
-                    try:
-                        driver.set_page_load_timeout(30)
-                        manager._do_task(session_id, driver)
-                    except Exception as e:
-                        print(f"打开网页时出错: {e}")
-                        print("请手动在浏览器中输入网址: https://pump.fun")
+                jobs.start(raw_command, _new_session_job, manager, key="create")
             
         elif command.startswith("connect"):
             parts = command.split()
             if len(parts) != 2:
                 print("请指定会话ID，例如: connect 1")
                 continue
-                
-            session_id = parts[1]
-            driver = manager.connect_to_session(session_id)
-            if driver:
-                current_drivers.append((session_id, driver))
-                try:
-                    driver.set_page_load_timeout(30)
-                    manager._do_task(session_id, driver)
-                except Exception as e:
-                    print(f"打开网页时出错: {e}")
-                    print("请手动在浏览器中输入网址: https://pump.fun")
+            _start_session_job(jobs, scheduler, raw_command, parts[1], _connect_job, manager, parts[1])
         
         elif command.startswith("restart"):
             parts = command.split()
             if len(parts) != 2:
                 print("请指定会话ID，例如: restart 1")
                 continue
-            
-            session_id = parts[1]
-            # 从current_drivers中移除旧的driver
-            current_drivers = [(sid, drv) for sid, drv in current_drivers if sid != session_id]
-            
-            # 重启会话
-            result = manager.restart_session(session_id)
-            if result:
-                current_drivers.append(result)
-                print(f"会话 {session_id} 已重启")
+            _start_session_job(jobs, scheduler, raw_command, parts[1], _restart_job, manager, parts[1])
         
         elif command.startswith("run"):
             parts = command.split()
@@ -704,29 +1561,203 @@ def main():
                 continue
             
             session_id = parts[1]
-            # 查找对应的driver
-            driver = None
-            for sid, drv in current_drivers:
-                if sid == session_id:
-                    driver = drv
-                    break
-            
-            if driver:
+            if session_id not in manager.drivers:
+                print(f"未找到会话 {session_id} 的活动窗口，请先使用 connect 或 restart 命令")
+                continue
+            _start_session_job(jobs, scheduler, raw_command, session_id, _run_job, manager, session_id)
+        
+        elif command.startswith("tabs"):
+            parts = command.split()
+            if len(parts) != 2:
+                print("请指定会话ID，例如: tabs 1")
+                continue
+            manager.print_tabs(parts[1])
+        
+        elif command.startswith("tab"):
+            parts = raw_command.split()
+            if len(parts) != 3:
+                print("请使用正确的格式: tab [id] [合约地址]")
+                continue
+            session_id = parts[1]
+            if session_id not in manager.drivers:
+                print(f"未找到会话 {session_id} 的活动窗口，请先使用 connect 或 restart 命令")
+                continue
+            pool = manager.tab_pools.get(session_id)
+            if pool and parts[2] in pool.tabs:
+                # 已打开的标签页只需要切换，直接执行；和后台任务一样不能和会话上的其他操作同时进行
+                if not jobs.busy(session_key(session_id)):
+                    _tab_job(manager, scheduler, session_id, parts[2])
+            else:
+                _start_session_job(jobs, scheduler, raw_command, session_id, manager.open_token_tab, session_id, parts[2])
+        
+        elif command.startswith("macro"):
+            _macro_command(manager, scheduler, jobs, raw_command)
+        
+        elif command == "jobs":
+            jobs.print_jobs()
+        
+        elif command.startswith("wait"):
+            parts = command.split()
+            if len(parts) != 2:
+                print("请指定任务ID，例如: wait 1")
+                continue
+            jobs.wait(parts[1])
+        
+        elif command.startswith("cancel"):
+            parts = command.split()
+            if len(parts) != 2:
+                print("请指定任务ID，例如: cancel 1")
+                continue
+            jobs.cancel(parts[1])
+        
+        elif command.startswith("submit"):
+            parts = raw_command.split()[1:]
+            if not parts:
+                print("请使用正确的格式: submit [task] [key=value ...] 或 submit [jobs.jsonl]")
+                continue
+            try:
+                if len(parts) == 1 and os.path.isfile(parts[0]):
+                    submitted = scheduler.submit_file(parts[0])
+                    print(f"已提交 {len(submitted)} 个任务")
+                else:
+                    job = scheduler.submit(parts[0], **parse_job_options(parts[1:]))
+                    print(f"已提交任务 #{job.id} ({job.task})")
+            except (ValueError, OSError) as e:
+                print(f"提交任务失败: {e}")
+        
+        elif command == "queue":
+            scheduler.print_stats()
+        
+        elif command == "drain":
+            jobs.start(raw_command, _drain_job, scheduler)
+        
+        elif command.startswith("serve"):
+            parts = command.split()
+            if control_server:
+                print(f"控制接口已在运行: http://{control_server.address[0]}:{control_server.address[1]}")
+            elif len(parts) == 1 or (len(parts) == 2 and parts[1].isdigit()):
+                control_server = start_control_server(manager, scheduler, int(parts[1]) if len(parts) == 2 else DEFAULT_PORT)
+            else:
+                print("请使用正确的格式: serve [port]")
+        
+        elif command.startswith("metrics"):
+            parts = command.split()
+            if metrics_server:
+                print(f"指标接口已在运行: http://{metrics_server.address[0]}:{metrics_server.address[1]}/metrics")
+            elif len(parts) == 1 or (len(parts) == 2 and parts[1].isdigit()):
+                metrics_server = start_metrics_server(int(parts[1]) if len(parts) == 2 else metrics.DEFAULT_PORT)
+            else:
+                print("请使用正确的格式: metrics [port]")
+        
+        elif command.startswith("mode"):
+            parts = command.split()
+            if len(parts) != 3:
+                print("请使用正确的格式: mode [id] [visible|offscreen|headless]")
+                continue
+            # 切换到或离开 headless 要重新启动浏览器，和其他会话操作一样在后台执行
+            _start_session_job(jobs, scheduler, raw_command, parts[1], manager.set_display_mode, parts[1], parts[2])
+        
+        elif command.startswith("show") or command.startswith("hide"):
+            parts = command.split()
+            if len(parts) != 2:
+                print(f"请指定会话ID，例如: {parts[0]} 1")
+                continue
+            action = manager.show_session if parts[0] == "show" else manager.hide_session
+            _start_session_job(jobs, scheduler, raw_command, parts[1], action, parts[1])
+        
+        elif command.startswith("usage"):
+            parts = command.split()
+            try:
+                interval = float(parts[1]) if len(parts) == 2 else 5.0
+            except ValueError:
+                print("请使用正确的格式: usage [采样秒数]")
+                continue
+            jobs.start(raw_command, manager.print_usage, interval)
+        
+        elif command.startswith("memory"):
+            parts = command.split()
+            if len(parts) == 1:
+                # 只报告；释放内存和重启可能要几十秒，用 memory check 在后台执行
+                over = 0
+                for session_id, rss in sorted(memory_monitor.sample().items()):
+                    budget = memory_monitor.budget(session_id)
+                    over += rss > budget
+                    print(f"会话 {session_id}: {rss / 1024 / 1024:.0f} MB / 预算 {budget / 1024 / 1024:.0f} MB" + ("  超出" if rss > budget else ""))
+                print(f"{over} 个会话超出预算，输入 memory check 处理" if over else "所有会话都在预算内")
+            elif parts[1] == "check" and len(parts) == 2:
+                jobs.start(raw_command, _memory_check_job, memory_monitor, key=ALL_SESSIONS)
+            elif parts[1] == "on":
                 try:
-                    manager._do_task(session_id, driver)
-                    print(f"会话 {session_id} 任务执行完成")
-                except Exception as e:
-                    print(f"执行任务时出错: {e}")
+                    if len(parts) > 2:
+                        memory_monitor.budget_mb = int(parts[2])
+                    if len(parts) > 3:
+                        memory_monitor.interval = float(parts[3])
+                except ValueError:
+                    print("请使用正确的格式: memory on [MB] [秒]")
+                    continue
+                memory_monitor.start()
+            elif parts[1] == "off":
+                memory_monitor.stop()
+                print("内存监控已停止")
             else:
-                print(f"未找到会话 {session_id} 的活动窗口，请先使用 connect 或 restart 命令")
+                print("请使用正确的格式: memory / memory check / memory on [MB] [秒] / memory off")
+        
+        elif command.startswith("export"):
+            parts = raw_command.split()[1:]
+            if not parts:
+                print("请使用正确的格式: export [文件] [id ...] [compare]")
+                continue
+            compare = "compare" in parts[1:]
+            session_ids = [sid for sid in parts[1:] if sid != "compare"] or sorted(manager.sessions)
+            missing = [sid for sid in session_ids if sid not in manager.sessions]
+            if missing:
+                print(f"会话不存在: {', '.join(missing)}")
+                continue
+            if any(sid in manager.drivers for sid in session_ids):
+                print("提示: 正在运行的会话导出时可能有文件正在写入，最好先 quit")
+            jobs.start(raw_command, _export_job, manager, session_ids, parts[0], compare)
         
-        elif command == "restore":
-            new_drivers = manager.restore_all_sessions()
-            current_drivers.extend(new_drivers)
+        elif command.startswith("import"):
+            parts = raw_command.split()[1:]
+            if len(parts) != 1:
+                print("请使用正确的格式: import [文件]")
+                continue
+            jobs.start(raw_command, _import_job, manager, parts[0], key="create")
+        
+        elif command.startswith("gc"):
+            options = {"max_age_days": None, "max_size_mb": None, "dry_run": False}
+            try:
+                for arg in command.split()[1:]:
+                    if arg == "dry":
+                        options["dry_run"] = True
+                    elif arg.startswith("age="):
+                        options["max_age_days"] = float(arg[4:])
+                    elif arg.startswith("size="):
+                        options["max_size_mb"] = float(arg[5:])
+                    else:
+                        raise ValueError(arg)
+            except ValueError:
+                print("请使用正确的格式: gc [age=天] [size=MB] [dry]")
+                continue
+            jobs.start(raw_command, _gc_job, manager, options, key=ALL_SESSIONS)
+        
+        elif command.startswith("restore"):
+            parts = command.split()
+            strategy = parts[1] if len(parts) == 2 else "ramp"
+            if strategy not in ("ramp", "all", "seq"):
+                print("请使用正确的格式: restore [ramp|all|seq]")
+                continue
+            jobs.start(raw_command, _restore_job, manager, strategy, key=ALL_SESSIONS)
             
         elif command == "list":
             manager.list_sessions()
             
+        elif command.startswith("profile"):
+            sampling_profiler.command(raw_command.split()[1:])
+            
+        elif command == "startup":
+            startup_profile.report()
+            
         elif command == "help":
             show_help()
             
@@ -736,21 +1767,7 @@ def main():
                 print("请使用正确的格式: copy [from_id] [to_id]")
                 continue
             
-            from_id = parts[1]
-            to_id = parts[2]
-            
-            # 复制到现有会话
-            if manager.clone_extensions(from_id, to_id):
-                # 从current_drivers中移除目标会话的driver
-                current_drivers = [(sid, drv) for sid, drv in current_drivers if sid != to_id]
-                # 重新连接会话以加载插件
-                driver = manager.connect_to_session(to_id)
-                if driver:
-                    current_drivers.append((to_id, driver))
-                    try:
-                        manager._do_task(to_id, driver)
-                    except Exception as e:
-                        print(f"执行任务时出错: {e}")
+            _start_session_job(jobs, scheduler, raw_command, parts[2], _copy_job, manager, parts[1], parts[2])
         
         elif command.startswith("clone"):
             parts = command.split()
@@ -764,8 +1781,10 @@ def main():
                 continue
                 
             count = int(parts[2])
-            new_drivers = manager.batch_clone_sessions(from_id, count)
-            current_drivers.extend(new_drivers)
+            if jobs.busy("create"):
+                continue
+            notes = manager._ask_notes(manager.batch_session_ids(count))
+            jobs.start(raw_command, _clone_job, manager, from_id, count, notes, key="create")
         
         elif command.startswith("quit"):
             parts = command.split()
@@ -775,15 +1794,8 @@ def main():
             
             session_id = parts[1]
             # 查找并关闭指定的driver
-            for sid, drv in current_drivers[:]:  # 使用切片创建副本进行迭代
-                if sid == session_id:
-                    try:
-                        drv.quit()
-                        print(f"已退出会话 {session_id}")
-                    except Exception as e:
-                        print(f"退出会话 {session_id} 时出错: {e}")
-                    current_drivers.remove((sid, drv))
-                    break
+            if manager.quit_session(session_id):
+                print(f"已退出会话 {session_id}")
             else:
                 print(f"未找到活动的会话 {session_id}")
         
@@ -794,15 +1806,13 @@ def main():
                 continue
             
             session_id = parts[1]
-            # 先从current_drivers中移除并关闭driver
-            for sid, drv in current_drivers[:]:
-                if sid == session_id:
-                    try:
-                        drv.quit()
-                    except:
-                        pass
-                    current_drivers.remove((sid, drv))
-                    break
+            # 先移除并关闭driver
+            drv = manager.untrack_driver(session_id)
+            if drv:
+                try:
+                    drv.quit()
+                except:
+                    pass
             
             # 清除会话数据
             if manager.clear_session(session_id):
@@ -811,11 +1821,21 @@ def main():
                 print(f"清除会话 {session_id} 时出现错误")
         
         elif command == "exit":
-            for _, driver in current_drivers:
-                try:
-                    driver.quit()
-                except:
-                    pass
+            running = jobs.running()
+            if running:
+                print(f"还有 {len(running)} 个后台任务在运行，退出时会一起结束: " + ", ".join(f"[{job.id}] {job.command}" for job in running))
+                if input("确定退出？(y/n): ").strip().lower() != "y":
+                    continue
+                for job in running:
+                    job.cancel_event.set()
+            memory_monitor.stop()
+            if control_server:
+                control_server.stop()
+            if metrics_server:
+                metrics_server.stop()
+            scheduler.shutdown()
+            for session_id in list(manager.drivers):
+                manager.quit_session(session_id)
             print("退出程序...")
             break
             
@@ -0,0 +1,380 @@
+"""
+会话管理的 JSON-RPC 控制接口（HTTP，默认只监听 127.0.0.1）
+
+服务端随 chrome_session_manager 启动（serve 指令、--serve 参数或 --agent 模式），
+多主机时由 fleet.py 的控制器连接各个 agent，
+每个请求都要带 Authorization: Bearer <口令>，口令按顺序取自: 环境变量 CONTROL_TOKEN、环境变量 CONTROL_TOKEN_FILE 指向的文件、
+当前目录的 control_token 文件；只监听本机时没有口令会自动生成 control_token，监听其他地址时必须事先设置
+客户端: python control_server.py call [方法] [key=value ...]
+延迟测试: python control_server.py bench [次数] [会话ID]
+"""
+
+import os
+import sys
+import hmac
+import json
+import socket
+import select
+import time
+import secrets
+import ipaddress
+import threading
+
+from process_stats import load_per_cpu, available_memory
+
+DEFAULT_PORT = 8765
+LOOPBACK_NAMES = ("127.0.0.1", "localhost", "::1")
+TOKEN_ENV = "CONTROL_TOKEN"
+TOKEN_FILE_ENV = "CONTROL_TOKEN_FILE"
+TOKEN_FILE = "control_token"
+
+def load_token():
+    """读取控制接口的口令，没有设置返回 None"""
+    token = os.environ.get(TOKEN_ENV)
+    if token:
+        return token.strip()
+    path = os.environ.get(TOKEN_FILE_ENV) or TOKEN_FILE
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    return None
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def server_token(host):
+    """服务端使用的口令：已设置的口令；只监听本机时自动生成并写入 control_token；监听其他地址时没有口令抛出 ValueError"""
+    token = load_token()
+    if token:
+        return token
+    if not is_loopback(host):
+        raise ValueError(f"监听 {host} 时必须先设置口令（环境变量 {TOKEN_ENV} 或 {TOKEN_FILE_ENV}），否则局域网中任何人都能控制浏览器")
+    token = secrets.token_urlsafe(32)
+    fd = os.open(TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    print(f"已生成控制接口口令: {os.path.abspath(TOKEN_FILE)}（本机客户端会自动读取）")
+    return token
+
+class ControlServer:
+    """把 create / restore / run_task / broadcast / status / load / quit 暴露为 JSON-RPC 方法"""
+
+    def __init__(self, manager, scheduler, host="127.0.0.1", port=DEFAULT_PORT, name=None, capacity=None, token=None):
+        # 启动服务时才导入 http.server，不拖慢程序启动
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.token = token or server_token(host)
+        # 请求的 Host 必须是这些名字之一，防止 DNS 重绑定；监听所有地址时不检查
+        self.hosts = None if host in ("", "0.0.0.0", "::") else {*LOOPBACK_NAMES, host, socket.gethostname()}
+        self.manager = manager
+        self.scheduler = scheduler
+        self.name = name or socket.gethostname()
+        self.capacity = capacity or os.cpu_count() or 1  # 控制器按 活动会话数/capacity 分配新会话
+        self._id_lock = threading.Lock()
+        self._creating = set()  # 并发创建时已分配但还没写入会话文件的ID
+        self.methods = {
+            "ping": self.ping,
+            "create": self.create,
+            "restore": self.restore,
+            "run_task": self.run_task,
+            "broadcast": self.broadcast,
+            "job": self.job,
+            "status": self.status,
+            "load": self.load,
+            "quit": self.quit,
+        }
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 保持连接，减少每次调用的握手
+
+            def setup(self):
+                super().setup()
+                # 关闭 Nagle，避免小包等待确认带来的几十毫秒延迟
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                # 浏览器中的网页发来的请求一定带 Origin，非 JSON 的 Content-Type 是表单等不需要预检的跨站请求
+                if self.headers.get("Origin") is not None:
+                    self.reject(403, "不接受浏览器网页发起的请求")
+                    return
+                if self.headers.get_content_type() != "application/json":
+                    self.reject(415, "Content-Type 必须是 application/json")
+                    return
+                if not server.host_allowed(self.headers.get("Host", "")):
+                    self.reject(403, "Host 不正确")
+                    return
+                if not server.authorized(self.headers.get("Authorization", "")):
+                    self.reject(401, "口令不正确")
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                body = server.handle_raw(self.rfile.read(length))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def reject(self, code, message):
+                """拒绝请求并关闭连接（不读取请求内容）"""
+                body = json.dumps(_error(None, -32001, message), ensure_ascii=False).encode("utf-8")
+                self.close_connection = True
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+
+    def start(self):
+        """在后台线程中启动服务"""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        print(f"控制接口已启动: http://{self.address[0]}:{self.address[1]}")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def host_allowed(self, header):
+        if self.hosts is None:
+            return True
+        name = header.rsplit("]", 1)[0].lstrip("[") if header.startswith("[") else header.split(":", 1)[0]
+        return name.lower() in self.hosts
+
+    def authorized(self, header):
+        scheme, _, token = header.partition(" ")
+        return scheme == "Bearer" and hmac.compare_digest(token.strip().encode("utf-8"), self.token.encode("utf-8"))
+
+    def handle_raw(self, data):
+        """处理一个 JSON-RPC 请求（支持批量），返回响应字节"""
+        try:
+            request = json.loads(data)
+        except ValueError:
+            return json.dumps(_error(None, -32700, "请求不是有效的 JSON")).encode("utf-8")
+        if isinstance(request, list):
+            response = [self.handle(item) for item in request]
+        else:
+            response = self.handle(request)
+        return json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+    def handle(self, request):
+        received = time.time()
+        request_id = request.get("id") if isinstance(request, dict) else None
+        if not isinstance(request, dict) or "method" not in request:
+            return _error(request_id, -32600, "无效的请求")
+        method = self.methods.get(request["method"])
+        if not method:
+            return _error(request_id, -32601, f"未知方法: {request['method']}")
+        params = request.get("params") or {}
+        try:
+            if isinstance(params, list):
+                result = method(*params, received=received)
+            else:
+                result = method(**params, received=received)
+        except TypeError as e:
+            return _error(request_id, -32602, f"参数错误: {e}")
+        except Exception as e:
+            return _error(request_id, -32000, str(e))
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    # ---- RPC 方法 ----
+
+    def ping(self, received=None):
+        return {"time": time.time()}
+
+    def create(self, session_id=None, note=None, template=None, task=None, display=None, received=None):
+        """创建（或从 template 克隆）一个会话，可附带任务 {"name": ..., "params": {...}}"""
+        with self._id_lock:
+            if session_id is None:
+                session_id = self.manager._next_session_ids(1, reserved=self._creating)[0]
+            session_id = str(session_id)
+            if session_id in self._creating:
+                raise ValueError(f"会话 {session_id} 正在创建")
+            self._creating.add(session_id)
+        try:
+            entry = {"id": session_id, "note": note, "template": template, "display": display}
+            result, driver = self.manager._apply_spec_session(entry, task)
+        finally:
+            with self._id_lock:
+                self._creating.discard(session_id)
+        if driver:
+            self.manager.track_drivers([(result["id"], driver)])
+        return result
+
+    def restore(self, received=None):
+        restored = self.manager.restore_all_sessions()
+        self.manager.track_drivers(restored)
+        return {"restored": sorted(sid for sid, _ in restored)}
+
+    def run_task(self, session_id=None, task="search", params=None, priority=10, wait=True, timeout=None,
+                 wait_for_session=False, received=None):
+        """提交任务；wait 为真时等待完成，并返回收到请求到任务开始执行的延迟"""
+        if session_id is not None:
+            session_id = str(session_id)
+        job = self.scheduler.submit(task, params=params, session_id=session_id, priority=priority, timeout=timeout,
+                                    wait_for_session=wait_for_session)
+        if not wait:
+            return job.to_dict()
+        job.done.wait(timeout)
+        return _job_result(job, received)
+
+    def broadcast(self, task="search", params=None, session_ids=None, priority=10, timeout=None, received=None):
+        """在多个（默认全部活动的）会话上同时执行同一个任务"""
+        if session_ids is None:
+            with self.manager.drivers_lock:
+                session_ids = sorted(self.manager.drivers)
+        jobs = [
+            self.scheduler.submit(task, params=params, session_id=str(sid), priority=priority, timeout=timeout)
+            for sid in session_ids
+        ]
+        for job in jobs:
+            job.done.wait(timeout)
+        return [_job_result(job, received) for job in jobs]
+
+    def job(self, job_id, received=None):
+        job = self.scheduler.jobs.get(int(job_id))
+        if not job:
+            raise ValueError(f"任务 {job_id} 不存在")
+        return _job_result(job, None)
+
+    def status(self, received=None):
+        with self.manager.drivers_lock:
+            live = set(self.manager.drivers)
+        sessions = {
+            sid: {"note": info.get("note"), "live": sid in live, "attached": sid in self.manager.attached,
+                  "debug_port": info.get("debug_port")}
+            for sid, info in self.manager.session_items()
+        }
+        return {"name": self.name, "sessions": sessions, "scheduler": self.scheduler.stats()}
+
+    def load(self, received=None):
+        """本机负载，供控制器选择在哪个 agent 上创建会话"""
+        with self.manager.drivers_lock:
+            live = len(self.manager.drivers)
+        free = available_memory()
+        return {
+            "name": self.name,
+            "live": live,
+            "sessions": len(self.manager.sessions),
+            "capacity": self.capacity,
+            "load_per_cpu": load_per_cpu(),
+            "available_mb": round(free / 1024 / 1024) if free is not None else None,
+            "queued": self.scheduler.stats()["queue_depth"],
+        }
+
+    def quit(self, session_id, received=None):
+        return {"quit": self.manager.quit_session(str(session_id))}
+
+def _job_result(job, received):
+    result = job.to_dict()
+    if received and job.started_at:
+        result["start_latency_ms"] = round((job.started_at - received) * 1000, 3)
+    return result
+
+def _error(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+class ControlClient:
+    """JSON-RPC 客户端，复用同一个 HTTP 连接；token 不指定时按服务端相同的顺序读取"""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, timeout=None, token=None):
+        import http.client
+        self.token = token or load_token()
+        if not self.token:
+            raise ValueError(f"没有控制接口口令，请设置环境变量 {TOKEN_ENV} 或 {TOKEN_FILE_ENV}")
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self.conn.connect()
+        self.conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._ids = 0
+        self.request_sent = False  # 最近一次调用的请求是否已经发出（之后出错时 agent 可能已经执行）
+
+    def call(self, method, **params):
+        self._ids += 1
+        body = json.dumps({"jsonrpc": "2.0", "id": self._ids, "method": method, "params": params})
+        self.request_sent = False
+        self.conn.request("POST", "/", body, {"Content-Type": "application/json", "Authorization": f"Bearer {self.token}"})
+        self.request_sent = True
+        reply = self.conn.getresponse()
+        response = json.loads(reply.read())
+        if reply.status != 200:
+            raise PermissionError(f"控制接口拒绝了请求（{reply.status}）: {response['error']['message']}")
+        if "error" in response:
+            raise RuntimeError(f"{response['error']['code']}: {response['error']['message']}")
+        return response["result"]
+
+    def stale(self):
+        """空闲的连接是否已被对方关闭（可读说明收到了 FIN 或多余的数据，不能再用）"""
+        sock = self.conn.sock
+        if sock is None:
+            return True
+        try:
+            return bool(select.select([sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def close(self):
+        self.conn.close()
+
+def _parse_value(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def _percentiles(values):
+    values = sorted(values)
+    pick = lambda pct: values[min(len(values) - 1, int(len(values) * pct))]
+    return f"P50 {pick(0.5):.2f} ms  P95 {pick(0.95):.2f} ms  最大 {values[-1]:.2f} ms"
+
+def bench(client, count=200, session_id=None):
+    """测量调用往返延迟，以及（指定会话时）从触发到任务开始执行的延迟"""
+    round_trips = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.call("ping")
+        round_trips.append((time.perf_counter() - start) * 1000)
+    print(f"ping 往返 ({count} 次): {_percentiles(round_trips)}")
+
+    if session_id:
+        start_latency = []
+        round_trips = []
+        for _ in range(count):
+            start = time.perf_counter()
+            result = client.call("run_task", session_id=session_id, task="ping")
+            round_trips.append((time.perf_counter() - start) * 1000)
+            if result.get("start_latency_ms") is not None:
+                start_latency.append(result["start_latency_ms"])
+        print(f"run_task 往返 ({count} 次): {_percentiles(round_trips)}")
+        if start_latency:
+            print(f"触发到任务开始: {_percentiles(start_latency)}")
+
+def main(argv):
+    if argv and argv[0] == "call" and len(argv) >= 2:
+        params = {}
+        for arg in argv[2:]:
+            key, _, value = arg.partition("=")
+            params[key] = _parse_value(value)
+        client = ControlClient()
+        print(json.dumps(client.call(argv[1], **params), ensure_ascii=False, indent=2))
+    elif argv and argv[0] == "bench":
+        count = int(argv[1]) if len(argv) > 1 else 200
+        session_id = argv[2] if len(argv) > 2 else None
+        bench(ControlClient(), count, session_id)
+    else:
+        print("用法:")
+        print("  python control_server.py call [方法] [key=value ...]   例如: call run_task session_id=1 task=search")
+        print("  python control_server.py bench [次数] [会话ID]")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
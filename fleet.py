@@ -0,0 +1,387 @@
+"""
+多主机会话管理：每台机器运行一个 agent（chrome_session_manager.py --agent），控制器通过 JSON-RPC 管理所有 agent
+
+- 会话用 "agent名/会话ID" 表示，例如 a/3；只有一个 agent 有该ID时也可以只写 3
+- 新会话分配给负载最低的 agent：先排除负载过高或内存不足的，再按 活动会话数/capacity 选择
+- run_task / quit 转发给会话所在的 agent，broadcast 同时发给所有 agent
+
+agent 配置文件（agents.json）:
+    [{"name": "a", "host": "192.168.1.10", "port": 8765}, {"name": "b", "host": "192.168.1.11", "port": 8765, "token": "..."}]
+    没有写 token 的 agent 使用控制器的口令（环境变量 CONTROL_TOKEN 或 CONTROL_TOKEN_FILE）
+每台机器上设置口令后启动 agent，监听本机的内网地址（不要监听所有地址）:
+    CONTROL_TOKEN=... python chrome_session_manager.py --agent --listen 192.168.1.10 --name a
+
+命令行:
+    python fleet.py controller agents.json   连接配置文件中的 agent 并进入控制台
+    python fleet.py local 3                  在本机启动 3 个 agent（fleet/agent_N 目录，端口互不冲突）并进入控制台
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import secrets
+import http.client
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from control_server import ControlClient, DEFAULT_PORT, TOKEN_ENV, load_token
+
+MAX_LOAD = 1.5  # 每个 CPU 核的平均负载超过这个值的 agent 不再分配新会话（除非所有 agent 都超过）
+MIN_FREE_MB = 800
+PER_AGENT_PARALLEL = 4  # 每个 agent 同时创建的会话数上限
+# 只读的方法，连接出错时可以换新连接重试；create / run_task / broadcast / quit 等重试可能重复执行，直接返回错误
+IDEMPOTENT_METHODS = ("ping", "status", "load", "job")
+LOCAL_DIR = "fleet"
+LOCAL_RPC_PORT = 8801  # 本机第N个 agent 的控制端口为 8801+N
+LOCAL_PORT_BASE = 10222  # 本机第N个 agent 的调试端口基数为 10222+1000*N
+
+class AgentLink:
+    """到一个 agent 的连接池：每个请求从池中取一个空闲连接（没有就新建），并发请求互不等待
+
+    连接出错时只在不会重复执行的情况下换新连接重试一次：只读的方法，或者复用的空闲连接在请求发出之前就失败了
+    """
+
+    def __init__(self, name, host="127.0.0.1", port=DEFAULT_PORT, token=None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.token = token or load_token()
+        self.idle = []  # 空闲的 ControlClient
+        self.lock = threading.Lock()  # 只保护 idle 列表
+        self.create_slots = threading.Semaphore(PER_AGENT_PARALLEL)
+
+    def _acquire(self):
+        """返回 (连接, 是否是复用的空闲连接)，已被 agent 关闭的空闲连接直接丢掉"""
+        while True:
+            with self.lock:
+                client = self.idle.pop() if self.idle else None
+            if client is None:
+                return ControlClient(self.host, self.port, token=self.token), False
+            if not client.stale():
+                return client, True
+            client.close()
+
+    def call(self, method, **params):
+        for attempt in range(2):
+            client = None
+            reused = False
+            try:
+                client, reused = self._acquire()
+                return client.call(method, **params)
+            except (OSError, http.client.HTTPException):
+                sent = bool(client and client.request_sent)
+                if client:
+                    client.close()
+                client = None
+                if attempt or not (method in IDEMPOTENT_METHODS or (reused and not sent)):
+                    raise
+            finally:
+                if client:  # 成功或 agent 返回错误时连接仍然可用
+                    with self.lock:
+                        self.idle.append(client)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for client in idle:
+            client.close()
+
+def split_session(session):
+    """"a/3" -> ("a", "3")，"3" -> (None, "3")"""
+    name, _, session_id = str(session).rpartition("/")
+    return name or None, session_id
+
+class FleetController:
+    """汇总所有 agent 的会话，把指令转发到对应的 agent"""
+
+    def __init__(self, agents, max_load=MAX_LOAD, min_free_mb=MIN_FREE_MB):
+        self.links = {agent["name"]: AgentLink(agent["name"], agent.get("host", "127.0.0.1"), agent.get("port", DEFAULT_PORT),
+                                               agent.get("token"))
+                      for agent in agents}
+        self.max_load = max_load
+        self.min_free_mb = min_free_mb
+        self.executor = ThreadPoolExecutor(max_workers=max(8, len(self.links) * PER_AGENT_PARALLEL))
+
+    def _each(self, method, **params):
+        """在所有 agent 上并行调用，返回 {名称: 结果}，连接失败或出错的结果为 Exception"""
+        futures = {name: self.executor.submit(link.call, method, **params) for name, link in self.links.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+        return results
+
+    def loads(self):
+        """各 agent 的负载，离线的 agent 为 Exception"""
+        return self._each("load")
+
+    def _overloaded(self, load):
+        if load.get("load_per_cpu") is not None and load["load_per_cpu"] > self.max_load:
+            return True
+        return load.get("available_mb") is not None and load["available_mb"] < self.min_free_mb
+
+    def pick(self, loads, pending=None):
+        """选择负载最低的 agent：不过载的优先，再按 (活动会话数+正在分配的数量)/capacity，最后按 CPU 负载"""
+        pending = pending or {}
+        candidates = [(name, load) for name, load in loads.items() if not isinstance(load, Exception)]
+        if not candidates:
+            raise RuntimeError("没有在线的 agent")
+
+        def score(item):
+            name, load = item
+            used = (load["live"] + pending.get(name, 0)) / max(1, load.get("capacity") or 1)
+            return (self._overloaded(load), used, load.get("load_per_cpu") or 0.0)
+
+        return min(candidates, key=score)[0]
+
+    def _create_on(self, name, **params):
+        link = self.links[name]
+        with link.create_slots:
+            try:
+                result = link.call("create", **params)
+            except Exception as e:
+                return {"agent": name, "ok": False, "error": str(e)}
+        result["agent"] = name
+        result["session"] = f"{name}/{result['id']}"
+        return result
+
+    def create(self, count=1, note=None, template=None, display=None, task=None, agent=None):
+        """创建 count 个会话，未指定 agent 时按负载分配，返回每个会话的结果"""
+        loads = self.loads() if agent is None else {}
+        pending = {}
+        placement = []
+        for _ in range(count):
+            name = agent or self.pick(loads, pending)
+            if name not in self.links:
+                raise ValueError(f"agent {name} 不存在")
+            pending[name] = pending.get(name, 0) + 1
+            placement.append(name)
+        futures = [
+            self.executor.submit(self._create_on, name, note=note, template=template, display=display, task=task)
+            for name in placement
+        ]
+        return [future.result() for future in futures]
+
+    def status(self):
+        """所有 agent 的会话 {"a/3": {...}}，以及离线的 agent"""
+        sessions = {}
+        offline = {}
+        for name, result in self._each("status").items():
+            if isinstance(result, Exception):
+                offline[name] = str(result)
+                continue
+            for session_id, info in result["sessions"].items():
+                sessions[f"{name}/{session_id}"] = dict(info, agent=name, id=session_id)
+        return {"sessions": sessions, "offline": offline}
+
+    def resolve(self, session):
+        """返回 (AgentLink, 会话ID)"""
+        name, session_id = split_session(session)
+        if name:
+            if name not in self.links:
+                raise ValueError(f"agent {name} 不存在")
+            return self.links[name], session_id
+        owners = [key.split("/")[0] for key in self.status()["sessions"] if split_session(key)[1] == session_id]
+        if not owners:
+            raise ValueError(f"会话 {session_id} 不存在")
+        if len(owners) > 1:
+            raise ValueError(f"多个 agent 都有会话 {session_id}，请写成 {owners[0]}/{session_id}")
+        return self.links[owners[0]], session_id
+
+    def run_task(self, session, task="search", params=None, wait=True, timeout=None):
+        link, session_id = self.resolve(session)
+        result = link.call("run_task", session_id=session_id, task=task, params=params, wait=wait, timeout=timeout)
+        result["agent"] = link.name
+        return result
+
+    def broadcast(self, task="search", params=None, timeout=None):
+        """在所有 agent 的所有活动会话上执行同一个任务"""
+        results = []
+        for name, result in self._each("broadcast", task=task, params=params, timeout=timeout).items():
+            if isinstance(result, Exception):
+                results.append({"agent": name, "status": "failed", "error": str(result)})
+                continue
+            results.extend(dict(item, agent=name) for item in result)
+        return results
+
+    def quit(self, session):
+        link, session_id = self.resolve(session)
+        return link.call("quit", session_id=session_id)
+
+    def close(self):
+        for link in self.links.values():
+            link.close()
+        self.executor.shutdown(wait=False)
+
+def start_local_agents(count, base=LOCAL_DIR):
+    """在本机启动 count 个 agent 进程，输出写入各自目录下的 agent.log，返回 (agent 配置, 进程列表)"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chrome_session_manager.py")
+    token = load_token() or secrets.token_urlsafe(32)
+    env = dict(os.environ, **{TOKEN_ENV: token})
+    agents, processes = [], []
+    for index in range(count):
+        name = f"agent_{index}"
+        base_dir = os.path.abspath(os.path.join(base, name))
+        os.makedirs(base_dir, exist_ok=True)
+        port = LOCAL_RPC_PORT + index
+        log = open(os.path.join(base_dir, "agent.log"), "a")
+        command = [
+            sys.executable, "-u", script, "--agent", "--name", name, "--base-dir", base_dir,
+            "--serve", str(port), "--port-base", str(LOCAL_PORT_BASE + 1000 * index),
+        ]
+        processes.append(subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, env=env))
+        log.close()
+        agents.append({"name": name, "host": "127.0.0.1", "port": port, "token": token})
+    # 等待控制接口可以连接
+    deadline = time.time() + 30
+    for agent, process in zip(agents, processes):
+        while True:
+            client = ControlClient(agent["host"], agent["port"], timeout=1, token=token)
+            try:
+                client.call("ping")
+                break
+            except (OSError, http.client.HTTPException):
+                if process.poll() is not None or time.time() > deadline:
+                    raise RuntimeError(f"{agent['name']} 启动失败，详见 {base}/{agent['name']}/agent.log")
+                time.sleep(0.2)
+            finally:
+                client.close()
+    print(f"已在本机启动 {count} 个 agent: " + ", ".join(f"{a['name']}(:{a['port']})" for a in agents))
+    return agents, processes
+
+def stop_local_agents(processes, timeout=30):
+    """让 agent 关闭各自的浏览器后退出"""
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT if os.name == "posix" else signal.SIGTERM)
+    for process in processes:
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def print_sessions(status):
+    sessions = status["sessions"]
+    if not sessions:
+        print("没有会话")
+    for key in sorted(sessions, key=lambda k: (split_session(k)[0], int(split_session(k)[1]) if split_session(k)[1].isdigit() else 0)):
+        info = sessions[key]
+        state = "已附加" if info.get("attached") else ("运行中" if info.get("live") else "未运行")
+        print(f"{key:<16} {state:<6} 端口 {info.get('debug_port')}  {info.get('note') or ''}")
+    for name, error in status["offline"].items():
+        print(f"agent {name} 离线: {error}")
+
+def print_loads(loads):
+    for name, load in loads.items():
+        if isinstance(load, Exception):
+            print(f"{name:<12} 离线: {load}")
+            continue
+        cpu = f"{load['load_per_cpu']:.2f}" if load.get("load_per_cpu") is not None else "-"
+        free = f"{load['available_mb']} MB" if load.get("available_mb") is not None else "-"
+        print(f"{name:<12} 活动 {load['live']}/{load['capacity']}  已保存 {load['sessions']}  "
+              f"每核负载 {cpu}  可用内存 {free}  排队 {load['queued']}")
+
+FLEET_HELP = """
+控制台指令:
+    agents                          - 各 agent 的负载
+    list                            - 所有 agent 的会话
+    new [数量] [显示方式] [@agent]  - 创建会话（默认按负载分配），显示方式: visible / offscreen / headless
+    task [会话] [任务] [JSON参数]   - 在会话上执行任务，例如: task a/1 search {"contract_address": "..."}
+    broadcast [任务] [JSON参数]     - 在所有活动会话上执行任务
+    quit [会话]                     - 关闭会话的浏览器
+    exit                            - 退出控制台（local 模式下同时关闭启动的 agent）
+"""
+
+def _parse_params(text):
+    return json.loads(text) if text else None
+
+def console(controller):
+    print(FLEET_HELP)
+    while True:
+        try:
+            raw_command = input("\nfleet> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            break
+        parts = raw_command.split(maxsplit=1)
+        if not parts:
+            continue
+        command, rest = parts[0].lower(), parts[1] if len(parts) > 1 else ""
+        try:
+            if command == "agents":
+                print_loads(controller.loads())
+            elif command == "list":
+                print_sessions(controller.status())
+            elif command == "new":
+                args = rest.split()
+                agent = next((arg[1:] for arg in args if arg.startswith("@")), None)
+                count = next((int(arg) for arg in args if arg.isdigit()), 1)
+                display = next((arg for arg in args if arg in ("visible", "offscreen", "headless")), None)
+                start = time.perf_counter()
+                for result in controller.create(count, display=display, agent=agent):
+                    if result.get("ok"):
+                        print(f"已创建 {result['session']}（{result['timings'].get('launch', 0):.1f}s）")
+                    else:
+                        print(f"在 {result['agent']} 上创建失败: {result.get('error')}")
+                print(f"用时 {time.perf_counter() - start:.1f}s")
+            elif command == "task":
+                args = rest.split(maxsplit=2)
+                if len(args) < 2:
+                    print("请使用正确的格式: task [会话] [任务] [JSON参数]")
+                    continue
+                result = controller.run_task(args[0], args[1], _parse_params(args[2] if len(args) > 2 else None))
+                print(f"{result['agent']}/{result.get('session_id')}: {result['status']} {result.get('error') or ''}")
+            elif command == "broadcast":
+                args = rest.split(maxsplit=1)
+                if not args:
+                    print("请使用正确的格式: broadcast [任务] [JSON参数]")
+                    continue
+                results = controller.broadcast(args[0], _parse_params(args[1] if len(args) > 1 else None))
+                for result in results:
+                    print(f"{result['agent']}/{result.get('session_id')}: {result['status']} {result.get('error') or ''}")
+                print(f"共 {len(results)} 个，成功 {sum(1 for r in results if r['status'] == 'done')} 个")
+            elif command == "quit":
+                if not rest:
+                    print("请指定会话，例如: quit a/1")
+                    continue
+                print(controller.quit(rest.strip()))
+            elif command == "exit":
+                break
+            elif command == "help":
+                print(FLEET_HELP)
+            else:
+                print("无效指令，输入 help 查看指令列表")
+        except ValueError as e:
+            print(e)
+        except Exception as e:
+            print(f"执行出错: {e}")
+
+def main(argv):
+    if len(argv) == 2 and argv[0] == "controller":
+        with open(argv[1], "r", encoding="utf-8") as f:
+            agents = json.load(f)
+        controller = FleetController(agents)
+        try:
+            console(controller)
+        finally:
+            controller.close()
+        return 0
+    if len(argv) == 2 and argv[0] == "local" and argv[1].isdigit():
+        agents, processes = start_local_agents(int(argv[1]))
+        controller = FleetController(agents)
+        try:
+            console(controller)
+        finally:
+            controller.close()
+            print("正在关闭 agent...")
+            stop_local_agents(processes)
+        return 0
+    print(__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,171 @@
+"""
+Chrome 启动参数组合（所有入口共用）
+
+- compatible: 只关闭首次运行向导和默认浏览器检查，其余保持 Chrome 默认行为，遇到网页或插件异常时使用
+- fast: 在 compatible 基础上关闭后台联网、组件更新、同步、崩溃上报、翻译等启动和后台工作（默认）
+- headless: fast + 无界面模式
+
+不使用 --use-mock-keychain / --password-store=basic：它们会改变 Cookie 的加密方式，已有用户数据目录中的登录状态会丢失；
+--no-sandbox 等会在窗口顶部显示警告栏的参数也不放在这里，由需要的入口自己添加。
+默认组合可以用环境变量 CHROME_LAUNCH_PROFILE 修改。
+
+启动耗时测试（本地测试页，不受网络影响）:
+    python launch_profiles.py bench [--runs 5] [组合 ...]
+冷启动每次使用新的用户数据目录，热启动重复使用同一个目录，测的是从启动 chromedriver 到第一个网页加载完成的时间
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import threading
+
+DEFAULT_PROFILE = "fast"
+
+COMPATIBLE_ARGS = [
+    "--no-first-run",
+    "--no-default-browser-check",
+]
+
+FAST_ARGS = COMPATIBLE_ARGS + [
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-breakpad",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--disable-hang-monitor",
+    "--disable-prompt-on-repost",
+    "--disable-search-engine-choice-screen",
+    "--no-service-autorun",
+    "--metrics-recording-only",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,InterestFeedContentSuggestions",
+]
+
+HEADLESS_ARGS = FAST_ARGS + [
+    "--headless=new",  # 新版无界面模式，支持插件和用户数据目录
+    "--disable-gpu",
+]
+
+PROFILES = {
+    "compatible": COMPATIBLE_ARGS,
+    "fast": FAST_ARGS,
+    "headless": HEADLESS_ARGS,
+}
+
+def default_profile():
+    profile = os.environ.get("CHROME_LAUNCH_PROFILE", DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        print(f"未知的启动参数组合 {profile}，使用 {DEFAULT_PROFILE}")
+        return DEFAULT_PROFILE
+    return profile
+
+def apply_profile(chrome_options, profile=None):
+    """把组合中的参数加到 ChromeOptions，返回实际使用的组合名"""
+    profile = profile or default_profile()
+    if profile not in PROFILES:
+        raise ValueError(f"未知的启动参数组合: {profile}（可选: {', '.join(PROFILES)}）")
+    for arg in PROFILES[profile]:
+        chrome_options.add_argument(arg)
+    return profile
+
+# ---- 启动耗时测试 ----
+
+TEST_PAGE = b"""<!doctype html>
+<html><head><meta charset="utf-8"><title>launch bench</title></head>
+<body><h1 id="ready">ready</h1><input id="amount" value="0.1"></body></html>
+"""
+
+def _serve_test_page():
+    """在本机随机端口提供测试页，返回 (地址, server)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(TEST_PAGE)))
+            self.end_headers()
+            self.wfile.write(TEST_PAGE)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/", server
+
+def _launch_once(webdriver, Service, driver_path, profile, user_data_dir, url):
+    """启动、打开测试页并关闭，返回从启动到网页加载完成的秒数"""
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_argument(f"user-data-dir={user_data_dir}")
+    apply_profile(chrome_options, profile)
+    if sys.platform.startswith("linux") and os.geteuid() == 0:
+        chrome_options.add_argument("--no-sandbox")  # root 用户下 Chrome 必须关闭沙箱才能启动
+    start = time.perf_counter()
+    driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+    try:
+        driver.get(url)
+        return time.perf_counter() - start
+    finally:
+        driver.quit()
+
+def bench(profiles, runs=5):
+    """每个组合分别测冷启动和热启动，返回 {组合: {"cold": [...], "warm": [...]}}"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+    driver_path = ChromeDriverManager().install()  # 下载/查找 chromedriver 不计入启动时间
+    url, server = _serve_test_page()
+    results = {}
+    temp_root = tempfile.mkdtemp(prefix="launch_bench_")
+    try:
+        for profile in profiles:
+            cold, warm = [], []
+            warm_dir = os.path.join(temp_root, f"{profile}_warm")
+            _launch_once(webdriver, Service, driver_path, profile, warm_dir, url)  # 预热目录
+            for index in range(runs):
+                cold_dir = os.path.join(temp_root, f"{profile}_cold_{index}")
+                cold.append(_launch_once(webdriver, Service, driver_path, profile, cold_dir, url))
+                shutil.rmtree(cold_dir, ignore_errors=True)
+                warm.append(_launch_once(webdriver, Service, driver_path, profile, warm_dir, url))
+            results[profile] = {"cold": cold, "warm": warm}
+            print(f"{profile:<11} 冷启动 中位数 {statistics.median(cold):.2f}s 最快 {min(cold):.2f}s   "
+                  f"热启动 中位数 {statistics.median(warm):.2f}s 最快 {min(warm):.2f}s")
+    finally:
+        server.shutdown()
+        shutil.rmtree(temp_root, ignore_errors=True)
+    if "compatible" in results:
+        base = results["compatible"]
+        for profile, values in results.items():
+            if profile == "compatible":
+                continue
+            for kind in ("cold", "warm"):
+                saved = statistics.median(base[kind]) - statistics.median(values[kind])
+                print(f"{profile} 比 compatible {'冷' if kind == 'cold' else '热'}启动快 {saved:.2f}s")
+    return results
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Chrome 启动参数组合")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="测量各组合的冷/热启动耗时")
+    bench_parser.add_argument("profiles", nargs="*", help="默认全部: %s" % ", ".join(PROFILES))
+    bench_parser.add_argument("--runs", type=int, default=5)
+    sub.add_parser("show", help="显示各组合的参数")
+    args = parser.parse_args(argv)
+    if args.command == "show":
+        for name, launch_args in PROFILES.items():
+            print(f"{name}:\n  " + "\n  ".join(launch_args))
+        return 0
+    unknown = [profile for profile in args.profiles if profile not in PROFILES]
+    if unknown:
+        parser.error(f"未知的启动参数组合: {', '.join(unknown)}")
+    bench(args.profiles or list(PROFILES), args.runs)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
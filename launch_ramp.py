@@ -0,0 +1,81 @@
+"""
+按主机负载逐步加大并发的会话启动控制
+
+所有会话同时启动时 CPU 和磁盘被占满，很多会话的网页加载超时；一个一个启动又太慢。
+LaunchRamp 从少量并发开始，每个会话启动完成后根据耗时调整并发：
+- 耗时接近最快的一次（基准）且负载、内存充足时，并发加 1
+- 耗时明显变长，或负载过高、内存不足时，并发减半
+负载过高或内存不足时暂停启动新的会话，直到有会话完成或资源恢复
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from process_stats import load_per_cpu, available_memory
+from background_jobs import cancelled, submit_with_job
+
+class LaunchRamp:
+    """按启动耗时和主机资源自适应调整并发，依次启动一组会话"""
+
+    def __init__(self, start_parallel=2, max_parallel=None, max_load=1.5, min_free_mb=800,
+                 fast_factor=1.5, slow_factor=2.5, adaptive=True):
+        self.max_parallel = max_parallel or max(2, os.cpu_count() or 2)
+        self.parallel = min(start_parallel, self.max_parallel)
+        self.max_load = max_load  # 每个 CPU 核的平均负载上限
+        self.min_free_mb = min_free_mb
+        self.fast_factor = fast_factor  # 耗时不超过基准的这个倍数时加大并发
+        self.slow_factor = slow_factor  # 耗时超过基准的这个倍数时并发减半
+        self.adaptive = adaptive  # False 时固定并发、不检查负载（用于和同时启动/逐个启动比较）
+        self.baseline = None
+        self.latencies = []
+        self.peak = 0
+
+    def resources_ok(self):
+        """负载和可用内存是否允许再启动一个会话"""
+        if not self.adaptive:
+            return True
+        load = load_per_cpu()
+        if load is not None and load > self.max_load:
+            return False
+        free = available_memory()
+        if free is not None and free < self.min_free_mb * 1024 * 1024:
+            return False
+        return True
+
+    def _adjust(self, latency):
+        self.latencies.append(latency)
+        if not self.adaptive:
+            return
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        if latency > self.baseline * self.slow_factor or not self.resources_ok():
+            self.parallel = max(1, self.parallel // 2)
+        elif latency <= self.baseline * self.fast_factor:
+            self.parallel = min(self.max_parallel, self.parallel + 1)
+
+    def run(self, items, launch):
+        """对每个 item 调用 launch(item)，返回结果列表（顺序为完成顺序）；后台任务被取消时不再启动剩下的"""
+        pending = list(items)
+        running = {}  # future -> 开始时间
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            while pending or running:
+                if pending and cancelled():
+                    print(f"已取消，剩下 {len(pending)} 个不再启动")
+                    pending.clear()
+                # 没有正在启动的会话时至少启动一个，保证一定能推进
+                while pending and len(running) < self.parallel and (not running or self.resources_ok()):
+                    running[submit_with_job(executor, launch, pending.pop(0))] = time.perf_counter()
+                    self.peak = max(self.peak, len(running))
+                done, _ = wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._adjust(time.perf_counter() - running.pop(future))
+                    results.append(future.result())
+        return results
+
+    def summary(self):
+        if not self.latencies:
+            return "没有启动任何会话"
+        average = sum(self.latencies) / len(self.latencies)
+        return f"单个会话平均 {average:.1f}s，最快 {min(self.latencies):.1f}s，最慢 {max(self.latencies):.1f}s，最高并发 {self.peak}"
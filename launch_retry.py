@@ -0,0 +1,146 @@
+"""
+浏览器启动的重试策略
+
+- classify(e) 把启动错误分为 permanent（配置目录被占用、端口被占用、找不到 Chrome、版本不匹配等，
+  重试也不会成功，立即失败）和 transient（其余错误，指数退避加随机抖动后重试）
+- 本机所有启动共用一个熔断器 HOST_BREAKER：连续多次 transient 失败（通常是 chromedriver 整体出问题）
+  时暂停所有启动一段时间，之后只放行一个试探启动，成功后恢复
+"""
+
+import time
+import random
+import threading
+
+import metrics
+
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+
+LAUNCH_RETRIES = metrics.counter("chrome_launch_retries_total", "启动失败后重试的次数")
+LAUNCH_ERRORS = metrics.counter("chrome_launch_errors_total", "启动出错次数（包括之后重试成功的）", ["kind"])
+BREAKER_OPEN = metrics.gauge("chrome_launch_breaker_open", "熔断器是否处于暂停启动状态")
+
+# (错误信息中的片段, 原因)，按小写匹配
+PERMANENT_ERRORS = [
+    ("user data directory is already in use", "用户数据目录正被其他 Chrome 使用"),
+    ("profile appears to be in use", "用户数据目录正被其他 Chrome 使用"),
+    ("address already in use", "调试端口被占用"),
+    ("cannot find chrome binary", "找不到 Chrome"),
+    ("no chrome binary", "找不到 Chrome"),
+    ("only supports chrome version", "chromedriver 与 Chrome 版本不匹配"),
+    ("session not created: this version of chromedriver", "chromedriver 与 Chrome 版本不匹配"),
+    ("permission denied", "没有权限"),
+    ("invalid argument", "启动参数无效"),
+]
+
+class PortInUseError(Exception):
+    """调试端口已被其他进程占用"""
+
+def classify(error):
+    """返回 (PERMANENT 或 TRANSIENT, 原因)"""
+    if isinstance(error, PortInUseError):
+        return PERMANENT, str(error)
+    if isinstance(error, (FileNotFoundError, PermissionError)):
+        return PERMANENT, str(error)
+    message = str(error).lower()
+    for fragment, reason in PERMANENT_ERRORS:
+        if fragment in message:
+            return PERMANENT, reason
+    first_line = str(error).strip().splitlines()[0] if str(error).strip() else type(error).__name__
+    return TRANSIENT, first_line
+
+class CircuitBreaker:
+    """连续失败达到 threshold 次后暂停 cooldown 秒，之后放行一个试探"""
+
+    def __init__(self, threshold=5, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self._probing = False
+        self._cond = threading.Condition()
+
+    @property
+    def is_open(self):
+        return self.failures >= self.threshold
+
+    def acquire(self):
+        """等待到允许启动为止"""
+        with self._cond:
+            while self.is_open:
+                remaining = self.open_until - time.time()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                elif not self._probing:
+                    self._probing = True
+                    return
+                else:
+                    self._cond.wait(1.0)
+
+    def success(self):
+        with self._cond:
+            if self.is_open:
+                print("启动已恢复正常，熔断解除")
+                BREAKER_OPEN.set(0)
+            self.failures = 0
+            self._probing = False
+            self._cond.notify_all()
+
+    def failure(self):
+        with self._cond:
+            self.failures += 1
+            self._probing = False
+            if self.is_open:
+                self.open_until = time.time() + self.cooldown
+                BREAKER_OPEN.set(1)
+                print(f"连续 {self.failures} 次启动失败，暂停所有启动 {self.cooldown} 秒")
+            self._cond.notify_all()
+
+    def cancel(self):
+        """本次启动的失败与本机状态无关（permanent），不计入熔断"""
+        with self._cond:
+            self._probing = False
+            self._cond.notify_all()
+
+HOST_BREAKER = CircuitBreaker()
+
+class RetryPolicy:
+    """按错误类型决定是否重试，重试间隔指数增长并带随机抖动"""
+
+    def __init__(self, attempts=3, base_delay=1.0, max_delay=15.0, breaker=HOST_BREAKER):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+
+    def delay(self, attempt):
+        """第 attempt 次失败后的等待秒数：一半固定，一半随机，避免多个会话同时重试"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def run(self, func, label="启动"):
+        """执行 func()，返回其结果；不可重试或重试用完时抛出最后一次的错误"""
+        for attempt in range(1, self.attempts + 1):
+            self.breaker.acquire()
+            try:
+                result = func()
+            except Exception as e:
+                kind, reason = classify(e)
+                LAUNCH_ERRORS.inc(kind=kind)
+                if kind == PERMANENT:
+                    self.breaker.cancel()
+                    print(f"{label}失败（{reason}），不再重试")
+                    raise
+                self.breaker.failure()
+                if attempt == self.attempts:
+                    print(f"{label}失败，已重试 {self.attempts} 次: {reason}")
+                    raise
+                wait = self.delay(attempt)
+                LAUNCH_RETRIES.inc()
+                print(f"{label}第 {attempt}/{self.attempts} 次失败（{reason}），{wait:.1f} 秒后重试...")
+                time.sleep(wait)
+            else:
+                self.breaker.success()
+                return result
+
+DEFAULT_POLICY = RetryPolicy()
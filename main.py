@@ -1,19 +1,56 @@
 import os
 import sys
 import time
-from os import device_encoding
+import threading
 
-from selenium.webdriver.support import expected_conditions as EC
+# selenium 等重量级模块在第一次用到时才导入，命令行可以立即使用
+import startup_profile
+import sampling_profiler
+from startup_profile import timed_import
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
+from address_store import open_store, compile_store, is_valid_address
+from submission_ledger import SubmissionLedger, QUEUED, FILLED, FAILED
+from address_book import AddressBook, current_account, set_current_account
+from launch_profiles import apply_profile
+from submit_pacing import AdaptivePacer, DEFAULT_DELAY, check_page, parse_delay
+import metrics
+
+ADDRESSES = metrics.counter("bitget_addresses_total", "处理的地址数", ["status"])
+ADDRESSES_PER_MINUTE = metrics.gauge("bitget_addresses_per_minute", "连续模式下持续的提交速度")
+BATCH_FILL_SECONDS = metrics.histogram("bitget_batch_fill_seconds", "填写一批地址的耗时")
+
+# 表单行数上限未知时，每批最多读取的地址数量；实际上限在填写时探测
+MAX_BATCH_ROWS = 200
+# 探测到的表单行数上限
+form_capacity = None
+# 点"添加"后等待新行出现的最长秒数
+ROW_WAIT = 3
+# 同一行数加不出新行的次数达到这个值才认为是表单上限，一次没等到新行可能只是页面慢
+CAPACITY_CONFIRMATIONS = 2
+capacity_misses = {}  # 行数 -> 加不出新行的次数
+# 表单里的每一行和"添加"按钮
+FORM_ROWS_XPATH = '//*[@id="pane-addAddress"]/div/div[2]/div'
+ADD_BUTTON_XPATH = '//*[@id="pane-addAddress"]/div/div[3]/div[1]/div'
+FIRST_ADDR_INPUT_XPATH = '//*[@id="pane-addAddress"]/div/div[2]/div/div[6]/div/input'
+
+# 自适应填写速度，在同一次运行的各批之间保留（见 submit_pacing.py）
+pacer = AdaptivePacer()
+# 一行出现限流信号后最多重试的次数
+THROTTLE_RETRIES = 3
+# 填写失败但页面上没有任何提示时最多重试的次数（可能是填得太快页面没跟上，也可能界面真的不对）
+UI_RETRIES = 1
+
+# 浏览器在后台启动，driver 就绪前需要浏览器的指令会等待
+driver = None
+driver_ready = threading.Event()
 
 def openChrome(url):
-    # 设置 Chrome 的选项（例如，无头模式、禁用 GPU 等）
+    webdriver = timed_import("selenium.webdriver")
+    Service = timed_import("selenium.webdriver.chrome.service").Service
+    ChromeDriverManager = timed_import("webdriver_manager.chrome").ChromeDriverManager
+    # 设置 Chrome 的选项（启动参数组合见 launch_profiles.py，可用环境变量 CHROME_LAUNCH_PROFILE 修改）
     chrome_options = webdriver.ChromeOptions()
+    apply_profile(chrome_options)
     # chrome_options.add_argument("--headless")  # 无头模式（可选）开启时浏览器没有打开
     # chrome_options.add_argument("--disable-gpu")  # 禁用 GPU 加速（可选）
     # chrome_driver_path = "/Users/chenk/Downloads/chromedriver-mac-x64/chromedriver"
@@ -28,68 +65,87 @@ def openChrome(url):
     driver.get(url)
     return driver
 
+def start_browser(url):
+    """在后台线程打开浏览器"""
+    def launch():
+        global driver
+        try:
+            driver = openChrome(url)
+        except Exception as e:
+            print(f"打开浏览器失败: {e}")
+        finally:
+            driver_ready.set()
+    threading.Thread(target=launch, daemon=True).start()
+
+def wait_for_driver():
+    """等待浏览器启动完成，失败返回 False"""
+    if not driver_ready.is_set():
+        print("等待浏览器启动...")
+        driver_ready.wait()
+    return driver is not None
+
 def show_help():
     print("""
     可用指令：
+    （第几个按地址计数，从1开始：addr.txt 中的空行和 # 开头的行不算，csv 的表头不算，与文件行号不一定相同；ledger 第几个 可以查看对应的地址）
     1. start index   - 启动程序 从第几个开始
-    2. help          - 显示帮助信息
-    3. exit          - 退出程序
-    """)
-
-
-def delete_lines_and_get_data(file_path, num_lines_to_delete):
-    # 用于存储删除的行数据
-    deleted_lines = []
+    2. start         - 从上次停止的位置继续（根据提交记录）
+    3. auto [index]  - 连续模式（从第几个开始）：网页提交后自动填写下一批，Ctrl+C 停止
+    4. done          - 确认上一批已在网页上提交
+    5. ledger [第几个|地址] - 查看提交记录
+    6. import file [chain] - 把 csv/jsonl/txt 地址列表导入地址库 addr.bin（chain 默认 SOL）
+    7. book          - 查看地址簿索引（批量添加时会跳过已在地址簿中的地址）
+    8. book sync [full] - 从地址簿页面同步（默认增量，full 为完整同步）
+    9. book account [名称] - 切换账户，每个账户单独保存地址簿索引
+    10. metrics [port] - 启动 Prometheus 指标接口（默认 %d，GET /metrics）
+    11. pace [reset|秒数] - 查看填写速度和退避记录；reset 恢复默认速度，秒数为每步间隔（之后仍会自动调整）
+    12. profile start [每秒次数] - 开始采样分析所有线程（默认每秒 %d 次），不需要重启
+    13. profile stop [文件] [top=数量] - 结束采样，写出折叠调用栈文件（火焰图）并显示耗时分布和最热的函数
+    14. startup      - 显示启动耗时
+    15. help         - 显示帮助信息
+    16. exit         - 退出程序
+    """ % (METRICS_PORT, sampling_profiler.DEFAULT_HZ))
 
-    # 创建一个临时文件路径
-    temp_file_path = file_path + ".temp"
 
-    # 打开原始文件和临时文件
-    with open(file_path, 'r') as file, open(temp_file_path, 'w') as temp_file:
-        line_count = 0  # 计数读取的行数
-
-        # 逐行读取文件
-        for line in file:
-            # 如果读取的行数小于需要删除的行数，则将这些行存入 deleted_lines
-            if line_count < num_lines_to_delete:
-                deleted_lines.append(line.strip())  # 删除的行数据存入数组
-                line_count += 1  # 增加已删除行的计数
-            else:
-                temp_file.write(line)  # 将未删除的行写入临时文件
-
-    # 删除原文件，并重命名临时文件为原文件
-    os.remove(file_path)  # 删除原文件
-    os.rename(temp_file_path, file_path)  # 用临时文件替换原文件
+def addr_input_xpath(index):
+    """第 index 行（从0开始）的地址输入框"""
+    if index == 0:
+        return FIRST_ADDR_INPUT_XPATH
+    return f'//*[@id="pane-addAddress"]/div/div[2]/div[{index + 1}]/div[6]/div/input'
 
-    return deleted_lines
+def select_sol_and_set_addr(driver, addr, index, chain="SOL", delay=DEFAULT_DELAY):
+    """填写第 index 行，delay 为每步操作后等待的秒数（由 pacer 调整）
 
-def select_sol_and_set_addr(driver, addr, index):
+    选择链的下拉框要等页面渲染，这几步不低于原来的固定间隔 DEFAULT_DELAY，pacer 加速时只缩短填写地址后的等待
+    """
+    from selenium.webdriver.common.by import By
     # 选择输入框
     select_input_xpath = f'//*[@id="pane-addAddress"]/div/div[2]/div[{index + 1}]/div[2]/div/div[1]/input'
     # 地址输入框
-    addr_input_str = f'//*[@id="pane-addAddress"]/div/div[2]/div[{index + 1}]/div[6]/div/input'
+    addr_input_str = addr_input_xpath(index)
     # 选择 SOL
     sol_position_xpath = f'/html/body/div[{index+7}]/div[1]/div[1]/ul/div/div[1]/div[1]/li/div/div/span'
 
     if index == 0:
         select_input_xpath = '''//*[@id="pane-addAddress"]/div/div[2]/div/div[2]/div/div[1]/input'''
-        addr_input_str = '//*[@id="pane-addAddress"]/div/div[2]/div/div[6]/div/input'
         sol_position_xpath = '/html/body/div[7]/div[1]/div[1]/ul/div/div[1]/div[1]/li/div/div/span'
 
     try:
         if index == 0:
+            render_delay = max(delay, DEFAULT_DELAY)
             select_input = driver.find_element(By.XPATH, select_input_xpath)
             select_input.click()
-            time.sleep(0.5)
-            select_input.send_keys("SOL")  # 使用 send_keys 来填充输入框的值
-            time.sleep(1)
+            time.sleep(render_delay)
+            select_input.send_keys(chain)  # 使用 send_keys 来填充输入框的值
+            time.sleep(render_delay * 2)
             sol = driver.find_element(By.XPATH, sol_position_xpath)
             sol.click()
-            time.sleep(0.5)
+            time.sleep(render_delay)
 
         addr_input = driver.find_element(By.XPATH, addr_input_str)
+        addr_input.clear()  # 退避后重试时输入框里可能还有上次的内容
         addr_input.send_keys(addr)
-        time.sleep(0.5)
+        time.sleep(delay)
 
     except Exception as e:
         print(f"界面不对: {e}")
@@ -97,72 +153,443 @@ def select_sol_and_set_addr(driver, addr, index):
 
     return True
 
-def read_lines_from_file(file_path, start_line, num_lines):
-    """
-    从文件中读取从 start_line 开始的 num_lines 行数据。
+def get_base_path():
+    # 获取打包后的可执行文件所在目录
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)  # 获取打包后的可执行文件目录
+    return os.path.abspath(".")  # 开发环境中的当前目录
 
-    :param file_path: 文本文件路径
-    :param start_line: 起始行号（从1开始）
-    :param num_lines: 要读取的行数
-    :return: 返回读取的行数据列表
+def import_addresses(src_path, chain="SOL"):
+    """把地址列表导入为地址库 addr.bin"""
+    store_path = os.path.join(get_base_path(), "addr.bin")
+    try:
+        count = compile_store(src_path, store_path, chain.upper())
+        print(f"已导入 {count} 个地址到 {store_path}")
+    except Exception as e:
+        print(f"导入失败: {e}")
+
+def resume_position(store):
+    """根据提交记录计算续跑的位置（从1开始）"""
+    unconfirmed = ledger.unconfirmed()
+    if unconfirmed:
+        print(f"有 {len(unconfirmed)} 个地址已填写但未确认提交（第 {unconfirmed[0]} 到 {unconfirmed[-1]} 个），将重新填写；如已提交请先输入 done")
+    last = ledger.last_submitted()
+    if not last:
+        return 1
+    pos, addr = last
+    if pos <= len(store) and store.address(pos - 1) == addr:
+        return pos + 1
+    # 地址列表变化过，按地址重新定位
+    for i, item in enumerate(store):
+        if item == addr:
+            return i + 2
+    print(f"地址列表中找不到最后提交的地址 {addr}，按位置继续")
+    return pos + 1
+
+def open_address_store():
+    """打开地址库，地址文件不存在返回 None"""
+    base_path = get_base_path()
+
+    # addr.txt 有更新时会自动重新编译成 addr.bin，之后直接从 addr.bin 读取；
+    # 用 import 指令导入过的 addr.bin 只跟随导入的文件，不会被 addr.txt 覆盖
+    addr_path = os.path.join(base_path, "addr.txt")
+    store_path = os.path.join(base_path, "addr.bin")
+    if not os.path.exists(addr_path) and not os.path.exists(store_path):
+        print(f"文件未找到: {addr_path}")
+        return None
+    return open_store(addr_path, store_path)
+
+def prepare_batch(store, start_index):
+    """从第 start_index 个开始准备一批地址并校验
+
+    返回 (链, [(第几个, 地址)], [(第几个, 地址)] 格式错误的地址, 已在地址簿中跳过的数量, 下一批从第几个开始)，
+    没有地址时链为 None
     """
-    lines = []
+    first = max(start_index, 1) - 1
+    end = min(len(store), first + (form_capacity or MAX_BATCH_ROWS))
+    if first >= end:
+        return None, [], [], 0, start_index
+    # 一批只能选择一个链，遇到不同的链时本批到此为止
+    chain = store.chain(first)
+    batch = []
+    invalid = []
+    known = 0
+    next_start = end + 1
+    for position in range(first, end):
+        if store.chain(position) != chain:
+            print(f"第 {position + 1} 个地址属于 {store.chain(position)}，与本批的 {chain} 不同，下一批再从这里开始")
+            next_start = position + 1
+            break
+        addr = store.address(position)
+        if ledger.is_submitted(addr):
+            print(f"第 {position + 1} 个地址已提交过，跳过: {addr}")
+            continue
+        if address_book.contains(addr, chain):
+            known += 1
+            continue
+        if not is_valid_address(addr, chain):
+            invalid.append((position + 1, addr))
+            continue
+        batch.append((position + 1, addr))
+    return chain, batch, invalid, known, next_start
+
+def count_form_rows(driver):
+    from selenium.webdriver.common.by import By
+    return len(driver.find_elements(By.XPATH, FORM_ROWS_XPATH))
+
+def wait_for_new_row(driver, rows_before, timeout=ROW_WAIT):
+    """等待表单行数超过 rows_before，超时返回 False"""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for current_line, content in enumerate(file, start=1):
-                if current_line >= start_line:
-                    lines.append(content.strip())
-                if len(lines) == num_lines:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(lambda d: count_form_rows(d) > rows_before)
+        return True
+    except TimeoutException:
+        return False
+
+def fill_address(chain, index, addr):
+    """按 pacer 的速度填写一行，页面上出现限流、验证码或地址被清掉时退避后重试，返回是否成功
+
+    填写失败且没有提示（界面不对）也算一次退避，减速后重试 UI_RETRIES 次，避免一直用太快的速度
+    """
+    ui_failures = 0
+    for attempt in range(THROTTLE_RETRIES + 1):
+        ok = select_sol_and_set_addr(driver, addr, index, chain, pacer.delay)
+        # 填写成功时还要确认输入框保留了地址；失败时只看页面上的提示，区分限流和界面错误
+        signal = check_page(driver, addr_input_xpath(index), addr) if ok else check_page(driver)
+        if ok and not signal:
+            pacer.success()
+            return True
+        if not signal:
+            ui_failures += 1
+            signal = ("ui", "页面没有提示")
+        pause = pacer.backoff(*signal)
+        if attempt == THROTTLE_RETRIES or ui_failures > UI_RETRIES or not pacer.wait_out(driver, signal[0], pause):
+            break
+        print(f"重试第 {index + 1} 行")
+    return False
+
+def fill_batch(chain, batch, invalid):
+    """把一批地址填入表单，返回已填写的 [(第几个, 地址)]
+
+    每次点"添加"后等待新行出现，同一行数多次加不出新行时即为表单的行数上限
+    """
+    global form_capacity
+    from selenium.webdriver.common.by import By
+    fill_start = time.perf_counter()
+    for pos, addr in invalid:
+        print(f"第 {pos} 个地址格式不正确（{chain}），跳过: {addr}")
+        ledger.record(pos, addr, FAILED)
+    if invalid:
+        ADDRESSES.inc(len(invalid), status="invalid")
+    for pos, addr in batch:
+        ledger.record(pos, addr, QUEUED)
+
+    filled = []
+    for index, (pos, addr) in enumerate(batch):
+        if index > 0:
+            try:
+                rows_before = count_form_rows(driver)
+                driver.find_element(By.XPATH, ADD_BUTTON_XPATH).click()
+                if not wait_for_new_row(driver, rows_before):
+                    signal = check_page(driver)
+                    if signal:
+                        # 被限流时没有加出新行，不是表单的行数上限
+                        pacer.wait_out(driver, signal[0], pacer.backoff(*signal))
+                        print("本批到此为止，剩余地址留到下一批")
+                        break
+                    capacity_misses[rows_before] = capacity_misses.get(rows_before, 0) + 1
+                    if capacity_misses[rows_before] >= CAPACITY_CONFIRMATIONS:
+                        form_capacity = rows_before
+                        print(f"表单最多 {form_capacity} 行，本批到此为止，剩余地址留到下一批")
+                    else:
+                        print(f"{ROW_WAIT}s 内没有加出第 {rows_before + 1} 行，本批到此为止，剩余地址留到下一批")
                     break
-    except FileNotFoundError:
-        print(f"文件未找到: {file_path}")
-    except Exception as e:
-        print(f"发生错误: {e}")
-    return lines
+            except Exception as e:
+                print("找不到添加按钮, 请确定界面是否正确")
+                break
 
-def run(start_index):
+        print(f"第 {pos} 个 addr => ", addr)
+        result = fill_address(chain, index, addr)
+        if not result:
+            ledger.record(pos, addr, FAILED)
+            ADDRESSES.inc(status="failed")
+            break
+        ledger.record(pos, addr, FILLED)
+        filled.append((pos, addr))
+    ledger.checkpoint()
+    if filled:
+        ADDRESSES.inc(len(filled), status="filled")
+        seconds = time.perf_counter() - fill_start
+        BATCH_FILL_SECONDS.observe(seconds)
+        print(f"本批填写 {len(filled)} 个，用时 {seconds:.1f}s，当前每步间隔 {pacer.delay:.2f}s")
+    return filled
+
+def run(start_index=None):
     print("running")
-    # 获取打包后的可执行文件所在目录
-    if getattr(sys, 'frozen', False):
-        base_path = os.path.dirname(sys.executable)  # 获取打包后的可执行文件目录
+    if not wait_for_driver():
+        return
+    store = open_address_store()
+    if not store:
+        return
+    with store:
+        if start_index is None:
+            start_index = resume_position(store)
+            print(f"从第 {start_index} 个继续")
+        chain, batch, invalid, known, _ = prepare_batch(store, start_index)
+        if chain is None:
+            print(f"没有第 {start_index} 个及之后的地址（共 {len(store)} 个）")
+            return
+    if known:
+        print(f"跳过 {known} 个已在地址簿中的地址")
+        ADDRESSES.inc(known, status="known")
+
+    pacer.begin()
+    fill_batch(chain, batch, invalid)
+    print(pacer.summary())
+    print("提交后请输入 done 确认，下次 start 会从之后继续")
+
+def form_is_reset(driver):
+    """提交成功后表单会恢复成只有一行空地址"""
+    from selenium.webdriver.common.by import By
+    try:
+        if count_form_rows(driver) != 1:
+            return False
+        return driver.find_element(By.XPATH, FIRST_ADDR_INPUT_XPATH).get_attribute("value") == ""
+    except Exception:
+        return False
+
+def wait_for_form_reset(poll_interval=0.5):
+    """等待操作员在网页上提交，表单恢复后返回"""
+    while not form_is_reset(driver):
+        time.sleep(poll_interval)
+
+def run_auto(start_index=None):
+    """连续模式：填写一批后，在等待提交的同时准备下一批，表单恢复后自动开始下一批"""
+    if not wait_for_driver():
+        return
+    store = open_address_store()
+    if not store:
+        return
+    started = time.time()
+    submitted_total = 0
+    known_total = 0
+    pacer.begin()
+    with store:
+        if start_index is None:
+            start_index = resume_position(store)
+        prepared = prepare_batch(store, start_index)
+        try:
+            while prepared[0] is not None:
+                chain, batch, invalid, known, next_start = prepared
+                if known:
+                    known_total += known
+                    ADDRESSES.inc(known, status="known")
+                    print(f"跳过 {known} 个已在地址簿中的地址（累计 {known_total} 个）")
+                if not batch:
+                    # 这一段全部跳过，继续往后找
+                    fill_batch(chain, [], invalid)
+                    prepared = prepare_batch(store, next_start)
+                    continue
+
+                filled = fill_batch(chain, batch, invalid)
+                if not filled:
+                    print("本批没有填写成功的地址，停止连续模式")
+                    break
+
+                # 等待提交的同时，在后台准备并校验下一批
+                start_index = filled[-1][0] + 1
+                next_batch = {}
+                preparer = threading.Thread(
+                    target=lambda: next_batch.update(result=prepare_batch(store, start_index)),
+                    daemon=True,
+                )
+                preparer.start()
+
+                print(f"已填写 {len(filled)} 个地址，请在网页上提交，提交后会自动开始下一批（Ctrl+C 停止）")
+                wait_for_form_reset()
+                submitted = ledger.mark_submitted([pos for pos, _ in filled])
+                submitted_total += submitted
+                ADDRESSES.inc(submitted, status="submitted")
+                address_book.add([addr for _, addr in filled], chain)
+                minutes = (time.time() - started) / 60
+                ADDRESSES_PER_MINUTE.set(round(submitted_total / minutes, 2))
+                print(f"本批已提交，累计 {submitted_total} 个，持续速度 {submitted_total / minutes:.1f} 个/分钟")
+
+                preparer.join()
+                prepared = next_batch["result"]
+            print("地址已全部处理完毕")
+        except KeyboardInterrupt:
+            print("\n连续模式已停止，已填写未确认的地址提交后请输入 done")
+        finally:
+            ledger.checkpoint()
+    minutes = (time.time() - started) / 60
+    if submitted_total and minutes:
+        print(f"共提交 {submitted_total} 个地址，用时 {minutes:.1f} 分钟，平均 {submitted_total / minutes:.1f} 个/分钟")
+    if known_total:
+        print(f"共跳过 {known_total} 个已在地址簿中的地址")
+    print(pacer.summary())
+
+def pace_command(args):
+    """pace / pace reset / pace 间隔秒数"""
+    if not args:
+        pacer.print_status()
+    elif args == ["reset"]:
+        pacer.reset()
+        print(f"已重置，每步间隔 {pacer.delay:.2f}s")
+    elif len(args) == 1 and parse_delay(args[0]) is not None:
+        pacer.reset(parse_delay(args[0]))
+        print(f"每步间隔已设为 {pacer.delay:.2f}s，之后仍会按页面信号自动调整")
     else:
-        base_path = os.path.abspath(".")  # 开发环境中的当前目录
+        print("无效的 pace 指令，请输入 'pace'、'pace reset' 或 'pace 间隔秒数'（0.15 到 4）")
 
-    # 构建 addr.txt 的完整路径
-    addr_path = os.path.join(base_path, "addr.txt")
-    addrs = read_lines_from_file(addr_path,  start_index, 50)
-    index = 0
-    for addr in addrs:
-        if index > 0:
-            add.click()
+def confirm_submitted():
+    """把已填写的地址标记为已提交，并加入地址簿索引"""
+    positions = ledger.unconfirmed()
+    count = ledger.mark_submitted(positions)
+    ADDRESSES.inc(count, status="submitted")
+    print(f"已确认提交 {count} 个地址")
+    if positions:
+        add_to_address_book(positions)
 
-        print(f"第 {start_index+index} 个 addr => ", addr)
+def add_to_address_book(positions):
+    """把已提交的位置加入地址簿索引，链从地址库中读取（地址列表变化过、对不上的位置跳过）"""
+    store = open_address_store()
+    if not store:
+        return
+    by_chain = {}
+    with store:
+        for pos in positions:
+            addr = ledger.positions[pos][1]
+            if pos <= len(store) and store.address(pos - 1) == addr:
+                by_chain.setdefault(store.chain(pos - 1), []).append(addr)
+    for chain, addrs in by_chain.items():
+        address_book.add(addrs, chain)
+
+def show_ledger(key=None):
+    """查看提交记录"""
+    if key is None:
+        counts = {}
+        for status, _ in ledger.positions.values():
+            counts[status] = counts.get(status, 0) + 1
+        print(f"提交记录: {counts or '空'}")
+        last = ledger.last_submitted()
+        if last:
+            print(f"最后提交: 第 {last[0]} 个 {last[1]}")
+        return
+    if key.isdigit():
+        found = ledger.status(int(key))
+        if found:
+            print(f"第 {key} 个: {found[0]} {found[1]}")
+            return
+        # 没有记录时显示地址库中的第几个，方便和 addr.txt 对照
+        store = open_address_store()
+        if store:
+            with store:
+                if 1 <= int(key) <= len(store):
+                    print(f"第 {key} 个没有记录: {store.address(int(key) - 1)}")
+                    return
+        print(f"第 {key} 个没有记录")
+    else:
+        found = ledger.lookup(key)
+        print(f"{key}: 第 {found[0]} 个, {found[1]}" if found else f"{key} 没有记录")
+
+def address_book_command(args):
+    """book / book sync [full] / book account [名称]"""
+    global address_book
+    if not args:
+        synced = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(address_book.synced_at)) if address_book.synced_at else "从未同步"
+        print(f"账户 {address_book.account}: 地址簿索引 {len(address_book)} 个地址，上次同步 {synced}")
+    elif args[0] == "sync":
+        if not wait_for_driver():
+            return
+        full = len(args) > 1 and args[1] == "full"
+        start = time.time()
         try:
-            result = select_sol_and_set_addr(driver, addr, index)
-            if not result:
-                break
-            add = driver.find_element(By.XPATH, '//*[@id="pane-addAddress"]/div/div[3]/div[1]/div')
+            count, added, pages = address_book.sync(driver, full=full)
         except Exception as e:
-            print("找不到元素, 请确定界面是否正确")
+            print(f"同步地址簿失败: {e}")
+            return
+        print(f"已读取 {pages} 页、{count} 个地址，新增 {added} 个，索引共 {len(address_book)} 个，用时 {time.time() - start:.1f}s")
+    elif args[0] == "account" and len(args) == 2:
+        set_current_account(args[1], get_base_path())
+        address_book = AddressBook(args[1], get_base_path())
+        print(f"已切换到账户 {args[1]}，地址簿索引 {len(address_book)} 个地址")
+    else:
+        print("无效的 book 指令，请输入 'book'、'book sync [full]' 或 'book account [名称]'")
+
+# 和会话管理的指标接口错开端口，两个程序可以同时运行
+METRICS_PORT = metrics.DEFAULT_PORT + 1
+metrics_server = None
 
-        index = index + 1
+def start_metrics_server(port):
+    """启动指标接口（已在运行时只显示地址）"""
+    global metrics_server
+    if metrics_server:
+        print(f"指标接口已在运行: http://{metrics_server.address[0]}:{metrics_server.address[1]}/metrics")
+        return
+    try:
+        metrics_server = metrics.MetricsServer(port=port)
+    except OSError as e:
+        print(f"指标接口启动失败: {e}")
+        return
+    metrics_server.start()
 
 def waitForCmd():
+    startup_profile.ready("first prompt")
     while True:
         # 提示用户输入指令
-        command = input("请输入指令 (输入 'help' 获取指令列表): ").strip().lower()
+        raw_command = input("请输入指令 (输入 'help' 获取指令列表): ").strip()
+        command = raw_command.lower()
         if command.startswith("start"):
             # 尝试提取数字
             parts = command.split()
-            if len(parts) == 2 and parts[1].isdigit():
+            if len(parts) == 1:
+                run()
+                print("此次操作完毕")
+            elif len(parts) == 2 and parts[1].isdigit():
                 index = int(parts[1])
                 run(index)
                 print("此次操作完毕")
             else:
                 print("无效的 start 指令，请输入 'start [数字]'")
+        elif command.startswith("auto"):
+            parts = command.split()
+            if len(parts) == 1:
+                run_auto()
+            elif len(parts) == 2 and parts[1].isdigit():
+                run_auto(int(parts[1]))
+            else:
+                print("无效的 auto 指令，请输入 'auto [数字]'")
+        elif command == "done":
+            confirm_submitted()
+        elif command.startswith("ledger"):
+            parts = raw_command.split()
+            show_ledger(parts[1] if len(parts) > 1 else None)
+        elif command.startswith("import"):
+            parts = raw_command.split()
+            if len(parts) in (2, 3):
+                import_addresses(*parts[1:])
+            else:
+                print("无效的 import 指令，请输入 'import [文件] [链]'")
+        elif command.startswith("metrics"):
+            parts = command.split()
+            if len(parts) == 1 or (len(parts) == 2 and parts[1].isdigit()):
+                start_metrics_server(int(parts[1]) if len(parts) == 2 else METRICS_PORT)
+            else:
+                print("无效的 metrics 指令，请输入 'metrics [端口]'")
+        elif command.startswith("book"):
+            address_book_command(raw_command.split()[1:])
+        elif command.startswith("pace"):
+            pace_command(command.split()[1:])
+        elif command.startswith("profile"):
+            sampling_profiler.command(raw_command.split()[1:])
+        elif command == "startup":
+            startup_profile.report()
         elif command == "help":
             show_help()
         elif command == "exit":
+            ledger.close()
             print("退出程序...")
             break
         else:
@@ -171,7 +598,10 @@ def waitForCmd():
 if __name__ == "__main__":
     # 看版本 chrome://settings/help
     # https://www.bitget.com/asset/addressBook
-    driver = openChrome("https://www.bitget.com/asset/batchAdd?batchType=1")
+    ledger = SubmissionLedger(os.path.join(get_base_path(), "submit_ledger.log"))
+    address_book = AddressBook(current_account(get_base_path()), get_base_path())
+    if not startup_profile.BENCH_MODE:
+        start_browser("https://www.bitget.com/asset/batchAdd?batchType=1")
     waitForCmd()
     # driver.quit()
 
@@ -0,0 +1,187 @@
+"""
+会话内存预算
+
+定时采样每个会话整个进程树（chromedriver + Chrome 及其子进程）的 RSS，超过预算时：
+1. 先通过 DevTools 释放内存：标签页池只保留最近使用的一个，关闭其他后台标签页、清空缓存、触发垃圾回收和内存压力通知
+   （和重启一样要先占用会话，正在执行任务的会话下次检查再处理，不会关掉任务正在用的标签页）
+   正在执行调度任务或交互模式后台任务（jobs）的会话都算正在执行任务
+2. 仍然超出预算，则在会话空闲时用 restart_session 重启
+
+默认预算 DEFAULT_BUDGET_MB，单个会话可以在会话文件中设置 "memory_budget_mb" 覆盖
+"""
+
+import time
+import threading
+
+from process_stats import process_table, tree_usage
+from background_jobs import current_job, session_key
+
+DEFAULT_BUDGET_MB = 1500
+DEFAULT_INTERVAL = 30
+RELIEF_SETTLE = 3  # 释放内存后等待几秒再重新采样
+
+def relieve_memory(driver, keep=()):
+    """通过 DevTools 释放内存，返回关闭的后台标签页数；keep 中的标签页（窗口句柄）保留"""
+    closed = 0
+    current = driver.current_window_handle
+    targets = driver.execute_cdp_cmd("Target.getTargets", {}).get("targetInfos", [])
+    for target in targets:
+        # 只关闭普通网页的后台标签，保留当前标签和插件（钱包）页面
+        if target.get("type") != "page" or target.get("targetId") == current or target.get("targetId") in keep:
+            continue
+        if target.get("url", "").startswith("chrome-extension://"):
+            continue
+        try:
+            driver.execute_cdp_cmd("Target.closeTarget", {"targetId": target["targetId"]})
+            closed += 1
+        except Exception:
+            pass
+    for command, params in (
+        ("Network.clearBrowserCache", {}),
+        ("HeapProfiler.collectGarbage", {}),
+        ("Memory.simulatePressureNotification", {"level": "critical"}),
+    ):
+        try:
+            driver.execute_cdp_cmd(command, params)
+        except Exception:
+            pass
+    return closed
+
+class MemoryMonitor:
+    """后台检查各会话的内存占用，超出预算时释放内存或重启会话"""
+
+    def __init__(self, manager, scheduler=None, budget_mb=DEFAULT_BUDGET_MB, interval=DEFAULT_INTERVAL, jobs=None):
+        self.manager = manager
+        self.scheduler = scheduler
+        self.jobs = jobs  # 交互模式的 JobTable，有后台任务（包括 restore 等涉及所有会话的）在操作的会话不处理
+        self.budget_mb = budget_mb
+        self.interval = interval
+        self._pending_recycle = set()  # 等待空闲后重启的会话
+        self._stop = threading.Event()
+        self._thread = None
+
+    def budget(self, session_id):
+        """会话的内存预算（字节）"""
+        info = self.manager.sessions.get(session_id, {})
+        return info.get("memory_budget_mb", self.budget_mb) * 1024 * 1024
+
+    def sample(self):
+        """采样所有活动会话的 RSS，结果同时保存到 manager.memory_usage"""
+        with self.manager.drivers_lock:
+            drivers = dict(self.manager.drivers)
+        table = process_table()
+        usage = {}
+        for session_id, driver in drivers.items():
+            pid = self.manager.session_root_pid(session_id, driver)
+            if pid:
+                usage[session_id] = tree_usage(pid, table)[0]
+        self.manager.memory_usage = usage
+        return usage
+
+    def _job_running(self, session_id):
+        # memory check 本身也是涉及所有会话的后台任务，不算
+        return bool(self.jobs) and any(job is not current_job() for job in self.jobs.running(session_key(session_id)))
+
+    def _reserve(self, session_id):
+        """占用会话，有后台任务或调度任务正在使用时返回 False"""
+        if self._job_running(session_id):
+            return False
+        return not self.scheduler or self.scheduler.reserve(session_id)
+
+    def check(self):
+        """检查一次所有会话，返回本次处理的 [(会话, 动作)]"""
+        actions = []
+        usage = self.sample()
+        for session_id, rss in sorted(usage.items()):
+            budget = self.budget(session_id)
+            if session_id in self._pending_recycle:
+                if self._recycle(session_id):
+                    actions.append((session_id, "recycled"))
+                continue
+            if rss <= budget:
+                continue
+            driver = self.manager.drivers.get(session_id)
+            if not driver:
+                continue
+            if not self._reserve(session_id):
+                print(f"会话 {session_id} 内存 {rss / 1024 / 1024:.0f} MB 超过预算，正在执行任务，下次检查再释放")
+                actions.append((session_id, "busy"))
+                continue
+            print(f"会话 {session_id} 内存 {rss / 1024 / 1024:.0f} MB 超过预算 {budget / 1024 / 1024:.0f} MB，正在释放内存...")
+            try:
+                pool = self.manager.tab_pools.get(session_id)
+                if pool and pool.driver is driver:
+                    # 标签页池按最近使用关闭，其余后台标签页直接关闭（窗口句柄就是 DevTools 的 targetId）
+                    with pool.lock:
+                        closed = pool.trim(1)
+                        closed += relieve_memory(driver, keep=set(pool.handles()))
+                else:
+                    closed = relieve_memory(driver)
+            except Exception as e:
+                print(f"会话 {session_id} 释放内存失败: {e}")
+                closed = 0
+            finally:
+                if self.scheduler:
+                    self.scheduler.release(session_id)
+            time.sleep(RELIEF_SETTLE)
+            pid = self.manager.session_root_pid(session_id, driver)
+            rss_after = tree_usage(pid)[0] if pid else 0
+            self.manager.memory_usage[session_id] = rss_after
+            print(f"会话 {session_id} 关闭了 {closed} 个后台标签页，内存 {rss / 1024 / 1024:.0f} MB -> {rss_after / 1024 / 1024:.0f} MB")
+            if rss_after <= budget:
+                actions.append((session_id, "relieved"))
+                continue
+            self._pending_recycle.add(session_id)
+            if self._recycle(session_id):
+                actions.append((session_id, "recycled"))
+            else:
+                print(f"会话 {session_id} 正在执行任务，空闲后重启")
+                actions.append((session_id, "pending"))
+        return actions
+
+    def _recycle(self, session_id):
+        """会话空闲时重启，正忙返回 False"""
+        if not self._reserve(session_id):
+            return False
+        try:
+            self._pending_recycle.discard(session_id)
+            old_driver = self.manager.untrack_driver(session_id)
+            if old_driver:
+                try:
+                    old_driver.quit()
+                except Exception:
+                    pass
+            result = self.manager.restart_session(session_id)
+            if result:
+                self.manager.track_drivers([result])
+                print(f"会话 {session_id} 已因内存超出预算重启")
+            return True
+        finally:
+            if self.scheduler:
+                self.scheduler.release(session_id)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"内存检查出错: {e}")
+
+    def start(self):
+        """在后台线程中定时检查"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        print(f"内存监控已启动: 预算 {self.budget_mb} MB/会话，每 {self.interval} 秒检查一次")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
@@ -0,0 +1,145 @@
+"""
+进程树资源统计（RSS 内存和累计 CPU 时间）
+
+优先使用 psutil（如已安装），否则在 macOS / Linux 上读取 ps 的输出
+"""
+
+import os
+import sys
+import subprocess
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def _parse_cpu_time(text):
+    """解析 ps 的 CPU 时间，格式为 [[dd-]hh:]mm:ss[.xx]，返回秒数"""
+    days = 0
+    if "-" in text:
+        day_text, text = text.split("-", 1)
+        days = int(day_text)
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+    return days * 86400 + seconds
+
+def process_table():
+    """返回 {pid: (ppid, rss字节, cpu秒)}，无法获取时返回空字典"""
+    table = {}
+    if psutil is not None:
+        for proc in psutil.process_iter(["pid", "ppid", "memory_info", "cpu_times"]):
+            info = proc.info
+            if info["memory_info"] is None or info["cpu_times"] is None:
+                continue
+            cpu = info["cpu_times"].user + info["cpu_times"].system
+            table[info["pid"]] = (info["ppid"], info["memory_info"].rss, cpu)
+        return table
+    if sys.platform == "win32":
+        return table
+    try:
+        output = subprocess.run(
+            ["ps", "-A", "-o", "pid=,ppid=,rss=,time="],
+            capture_output=True, text=True, timeout=10,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return table
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) != 4:
+            continue
+        try:
+            table[int(parts[0])] = (int(parts[1]), int(parts[2]) * 1024, _parse_cpu_time(parts[3]))
+        except ValueError:
+            continue
+    return table
+
+def tree_pids(root_pid, table):
+    """root_pid 及其所有子孙进程"""
+    children = {}
+    for pid, (ppid, _, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    pids = []
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        if pid in table:
+            pids.append(pid)
+            stack.extend(children.get(pid, []))
+    return pids
+
+def tree_usage(root_pid, table=None):
+    """进程树的 (RSS字节, 累计CPU秒, 进程数)"""
+    if table is None:
+        table = process_table()
+    pids = tree_pids(root_pid, table)
+    rss = sum(table[pid][1] for pid in pids)
+    cpu = sum(table[pid][2] for pid in pids)
+    return rss, cpu, len(pids)
+
+def driver_root_pid(driver):
+    """driver 对应的 chromedriver 进程号（Chrome 是它的子进程），取不到返回 None"""
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+def listening_pid(port):
+    """监听本机 TCP 端口的进程号，取不到返回 None"""
+    if psutil is not None:
+        try:
+            for conn in psutil.net_connections(kind="tcp"):
+                if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port and conn.pid:
+                    return conn.pid
+        except (psutil.AccessDenied, OSError):
+            pass
+    if sys.platform == "win32":
+        return None
+    try:
+        output = subprocess.run(
+            ["lsof", "-nP", "-t", f"-iTCP:{port}", "-sTCP:LISTEN"],
+            capture_output=True, text=True, timeout=5,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    for line in output.split():
+        if line.isdigit():
+            return int(line)
+    return None
+
+def load_per_cpu():
+    """1 分钟平均负载除以 CPU 核数，不支持时（Windows）返回 None"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return None
+
+def available_memory():
+    """可用内存字节数，无法获取时返回 None"""
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            return None
+    elif sys.platform == "darwin":
+        try:
+            output = subprocess.run(["vm_stat"], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        lines = output.splitlines()
+        try:
+            page_size = int(lines[0].split("page size of")[1].split()[0])
+            pages = {}
+            for line in lines[1:]:
+                key, _, value = line.partition(":")
+                pages[key.strip()] = int(value.strip().rstrip("."))
+            free = pages.get("Pages free", 0) + pages.get("Pages inactive", 0) + pages.get("Pages speculative", 0)
+            return free * page_size
+        except (IndexError, ValueError):
+            return None
+    return None
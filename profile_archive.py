@@ -0,0 +1,196 @@
+"""
+会话配置目录的导出 / 导入（迁移到另一台电脑）
+
+- 一个或多个 chrome_data/user_N 打包成一个归档文件（zip 容器）：文件按 1 MB 分块，
+  每块以 sha256 命名只保存一次，多个会话里相同的插件文件只占一份空间
+- 不导出缓存（见 profile_gc）、锁文件和崩溃报告
+- 导入时会话ID冲突会自动换成新的ID，用户数据目录、调试端口以及配置文件中的旧路径都会改成本机的
+
+命令行:
+    python profile_archive.py export profiles.cpa [会话ID ...] [--compare]
+    python profile_archive.py import profiles.cpa
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import zipfile
+import tarfile
+import argparse
+import tempfile
+
+from profile_gc import BASE_DIR, PROFILE_CACHE_DIRS, ROOT_CACHE_DIRS
+
+CHUNK_SIZE = 1024 * 1024
+ARCHIVE_VERSION = 1
+# 不导出的文件名和目录
+EXCLUDE_NAMES = {"SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile", "Crashpad", "BrowserMetrics"}
+# 导入后需要改写路径的配置文件
+PATH_FILES = [os.path.join("Default", "Preferences"), os.path.join("Default", "Secure Preferences"), "Local State"]
+
+def _excluded_dirs(user_data_dir):
+    excluded = {os.path.join(user_data_dir, name) for name in ROOT_CACHE_DIRS}
+    for entry in os.listdir(user_data_dir):
+        if entry == "Default" or entry.startswith("Profile "):
+            excluded.update(os.path.join(user_data_dir, entry, name) for name in PROFILE_CACHE_DIRS)
+    return excluded
+
+def profile_files(user_data_dir):
+    """要导出的文件，逐个返回 (相对路径, 完整路径)"""
+    excluded = _excluded_dirs(user_data_dir)
+    for root, dirs, files in os.walk(user_data_dir):
+        dirs[:] = [d for d in dirs if d not in EXCLUDE_NAMES and os.path.join(root, d) not in excluded]
+        for name in files:
+            path = os.path.join(root, name)
+            if name in EXCLUDE_NAMES or os.path.islink(path):
+                continue
+            yield os.path.relpath(path, user_data_dir).replace(os.sep, "/"), path
+
+def export_profiles(sessions, session_ids, archive_path):
+    """导出会话，返回统计 {"files", "logical", "unique", "archive", "seconds"}"""
+    start = time.perf_counter()
+    stored = set()
+    stats = {"files": 0, "logical": 0, "unique": 0}
+    manifest = {"version": ARCHIVE_VERSION, "sessions": {}}
+    with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for session_id in session_ids:
+            info = sessions[session_id]
+            user_data_dir = info["user_data_dir"]
+            files = []
+            for rel, path in profile_files(user_data_dir):
+                try:
+                    st = os.stat(path)
+                    hashes = []
+                    with open(path, "rb") as f:
+                        while True:
+                            chunk = f.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            digest = hashlib.sha256(chunk).hexdigest()
+                            hashes.append(digest)
+                            if digest not in stored:
+                                zf.writestr(f"chunks/{digest}", chunk)
+                                stored.add(digest)
+                                stats["unique"] += len(chunk)
+                except OSError as e:
+                    print(f"跳过无法读取的文件 {path}: {e}")
+                    continue
+                files.append([rel, hashes, st.st_mode & 0o777, st.st_mtime])
+                stats["files"] += 1
+                stats["logical"] += st.st_size
+            entry = {key: value for key, value in info.items() if key != "pid"}
+            manifest["sessions"][session_id] = {"info": entry, "files": files}
+            print(f"会话 {session_id}: {len(files)} 个文件")
+        zf.writestr("manifest.json", json.dumps(manifest))
+    stats["archive"] = os.path.getsize(archive_path)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def tarball_baseline(sessions, session_ids):
+    """直接把整个目录打成 tar.gz（以前手动复制的做法），返回 (字节数, 秒)"""
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tar_path = os.path.join(temp_dir, "profiles.tar.gz")
+        with tarfile.open(tar_path, "w:gz") as tar:
+            for session_id in session_ids:
+                user_data_dir = sessions[session_id]["user_data_dir"]
+                tar.add(user_data_dir, arcname=os.path.basename(user_data_dir))
+        return os.path.getsize(tar_path), time.perf_counter() - start
+
+def _safe_join(root, rel):
+    """拒绝归档中指向目录外的路径"""
+    path = os.path.normpath(os.path.join(root, *rel.split("/")))
+    if os.path.isabs(rel) or not path.startswith(os.path.normpath(root) + os.sep):
+        raise ValueError(f"归档中的路径无效: {rel}")
+    return path
+
+def _rewrite_paths(user_data_dir, old_dir):
+    """把配置文件中的旧用户数据目录改成新的（JSON 中的路径可能带转义）"""
+    replacements = [(old_dir, user_data_dir), (json.dumps(old_dir)[1:-1], json.dumps(user_data_dir)[1:-1])]
+    for name in PATH_FILES:
+        path = os.path.join(user_data_dir, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        for old, new in replacements:
+            text = text.replace(old, new)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+def import_profiles(manager, archive_path):
+    """导入归档中的会话，返回 [(原ID, 新ID)]"""
+    imported = []
+    with zipfile.ZipFile(archive_path) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        if manifest.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"不支持的归档版本: {manifest.get('version')}")
+        reserved = []
+        for old_id, item in manifest["sessions"].items():
+            new_id = old_id
+            user_data_dir = os.path.abspath(os.path.join(BASE_DIR, f"user_{new_id}"))
+            if new_id in manager.sessions or new_id in reserved or os.path.exists(user_data_dir):
+                # 本机已有的目录（包括不在会话列表中的）也不能覆盖
+                used = list(reserved)
+                if os.path.isdir(BASE_DIR):
+                    used.extend(name[5:] for name in os.listdir(BASE_DIR) if name.startswith("user_"))
+                new_id = manager._next_session_ids(1, reserved=used)[0]
+                user_data_dir = os.path.abspath(os.path.join(BASE_DIR, f"user_{new_id}"))
+            reserved.append(new_id)
+            for rel, hashes, mode, mtime in item["files"]:
+                dest = _safe_join(user_data_dir, rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                with open(dest, "wb") as f:
+                    for digest in hashes:
+                        f.write(zf.read(f"chunks/{digest}"))
+                os.chmod(dest, mode)
+                os.utime(dest, (mtime, mtime))
+            info = dict(item["info"])
+            _rewrite_paths(user_data_dir, info["user_data_dir"])
+            info["user_data_dir"] = user_data_dir
+            info["debug_port"] = manager.port_base + int(new_id)
+            manager.set_session(new_id, info, save=False)
+            imported.append((old_id, new_id))
+            print(f"已导入会话 {old_id}" + (f"（本机ID {new_id}）" if new_id != old_id else "") + f": {len(item['files'])} 个文件")
+    manager._save_sessions()
+    return imported
+
+def print_export_stats(stats, baseline=None):
+    mb = lambda value: value / 1024 / 1024
+    print(f"导出 {stats['files']} 个文件，原始 {mb(stats['logical']):.1f} MB，去重后 {mb(stats['unique']):.1f} MB，"
+          f"归档 {mb(stats['archive']):.1f} MB，用时 {stats['seconds']:.1f}s")
+    if baseline:
+        size, seconds = baseline
+        print(f"整个目录打成 tar.gz: {mb(size):.1f} MB，用时 {seconds:.1f}s")
+        if size:
+            print(f"归档大小为 tar.gz 的 {stats['archive'] / size * 100:.0f}%，用时为 {stats['seconds'] / max(seconds, 1e-9) * 100:.0f}%")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="导出 / 导入 Chrome 会话配置目录")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export")
+    export_parser.add_argument("archive")
+    export_parser.add_argument("session_ids", nargs="*", help="默认导出全部会话")
+    export_parser.add_argument("--compare", action="store_true", help="同时打一个 tar.gz 比较大小和用时")
+    import_parser = sub.add_parser("import")
+    import_parser.add_argument("archive")
+    args = parser.parse_args(argv)
+
+    from chrome_session_manager import ChromeSessionManager
+    manager = ChromeSessionManager()
+    if args.command == "export":
+        session_ids = args.session_ids or sorted(manager.sessions)
+        missing = [sid for sid in session_ids if sid not in manager.sessions]
+        if missing:
+            print(f"会话不存在: {', '.join(missing)}")
+            return 1
+        stats = export_profiles(manager.sessions, session_ids, args.archive)
+        print_export_stats(stats, tarball_baseline(manager.sessions, session_ids) if args.compare else None)
+    else:
+        import_profiles(manager, args.archive)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,245 @@
+"""
+Chrome 用户数据目录的缓存清理和后台删除
+
+- 只清理 Chrome 可以自动重新生成的缓存目录（PROFILE_CACHE_DIRS / ROOT_CACHE_DIRS），不动 Cookie、插件、钱包数据
+- 删除先把目录改名移入 chrome_data/.trash（同一磁盘上的改名是瞬间完成的），再在后台线程中删除
+- 正在运行的会话的目录会被跳过：调用方传入的目录，以及 Chrome 的锁文件指向存活进程、或 DevToolsActivePort 端口能访问的目录
+  （其他进程或没有被本程序登记的 Chrome 正在使用）
+
+命令行: python profile_gc.py [--max-age 天] [--max-size MB] [--dry-run]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import threading
+
+BASE_DIR = "chrome_data"
+TRASH_DIR = os.path.join(BASE_DIR, ".trash")
+
+# 每个配置文件（Default / Profile N）中的缓存目录
+PROFILE_CACHE_DIRS = [
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "DawnGraphiteCache",
+    "DawnWebGPUCache",
+    os.path.join("Service Worker", "CacheStorage"),
+    os.path.join("Service Worker", "ScriptCache"),
+]
+# 用户数据目录顶层的缓存目录
+ROOT_CACHE_DIRS = [
+    "GrShaderCache",
+    "ShaderCache",
+    "GraphiteDawnCache",
+    "component_crx_cache",
+]
+
+_delete_lock = threading.Lock()
+_worker_lock = threading.Lock()
+_trash_pending = threading.Event()
+_trash_worker = None
+
+def dir_stats(path):
+    """目录的 (总字节数, 最近修改时间)"""
+    total = 0
+    newest = 0.0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += st.st_size
+            newest = max(newest, st.st_mtime)
+    return total, newest
+
+def cache_dirs(user_data_dir):
+    """用户数据目录中存在的缓存目录"""
+    found = [os.path.join(user_data_dir, name) for name in ROOT_CACHE_DIRS]
+    try:
+        entries = os.listdir(user_data_dir)
+    except OSError:
+        return []
+    for entry in entries:
+        if entry == "Default" or entry.startswith("Profile "):
+            found.extend(os.path.join(user_data_dir, entry, name) for name in PROFILE_CACHE_DIRS)
+    return [path for path in found if os.path.isdir(path)]
+
+def profile_dirs(base=BASE_DIR):
+    """所有会话的用户数据目录（user_N）"""
+    if not os.path.isdir(base):
+        return []
+    return sorted(
+        os.path.join(base, name) for name in os.listdir(base)
+        if name.startswith("user_") and os.path.isdir(os.path.join(base, name))
+    )
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # 进程存在但没有权限
+    return True
+
+def _lock_held(user_data_dir):
+    """Chrome 的单实例锁是否被存活的进程持有"""
+    lock = os.path.join(user_data_dir, "SingletonLock")
+    if os.path.islink(lock):
+        # posix: 符号链接指向 "主机名-pid"
+        host, _, pid = os.readlink(lock).rpartition("-")
+        if not pid.isdigit():
+            return True
+        return host != socket.gethostname() or _pid_alive(int(pid))
+    lock = os.path.join(user_data_dir, "lockfile")
+    if os.name == "nt" and os.path.exists(lock):
+        # windows: Chrome 运行时独占打开 lockfile，删除会失败
+        try:
+            os.remove(lock)
+        except PermissionError:
+            return True
+        except OSError:
+            pass
+    return False
+
+def _devtools_alive(user_data_dir, timeout=0.5):
+    """DevToolsActivePort 记录的调试端口上是否有 Chrome 在响应"""
+    import http.client
+    try:
+        with open(os.path.join(user_data_dir, "DevToolsActivePort"), "r", encoding="utf-8") as f:
+            port = int(f.readline().strip())
+    except (OSError, ValueError):
+        return False
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request("GET", "/json/version")
+        return "Browser" in json.loads(conn.getresponse().read())
+    except (OSError, ValueError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+def in_use(user_data_dir):
+    """用户数据目录是否正被某个 Chrome 使用"""
+    return _lock_held(user_data_dir) or _devtools_alive(user_data_dir)
+
+def scan(skip=()):
+    """统计缓存占用，返回 [(用户数据目录, 缓存目录, 字节数, 最近修改时间)]"""
+    skip = {os.path.abspath(path) for path in skip}
+    results = []
+    for user_data_dir in profile_dirs():
+        if os.path.abspath(user_data_dir) in skip:
+            continue
+        if in_use(user_data_dir):
+            print(f"跳过正在被 Chrome 使用的目录: {user_data_dir}")
+            continue
+        for path in cache_dirs(user_data_dir):
+            size, newest = dir_stats(path)
+            results.append((user_data_dir, path, size, newest))
+    return results
+
+def collect(max_age_days=None, max_size_mb=None, skip=(), dry_run=False):
+    """按策略清理缓存
+
+    - max_age_days: 最近修改时间早于这么多天的缓存目录全部清理
+    - max_size_mb: 单个用户数据目录的缓存超过这个大小时，从最大的缓存目录开始清理，直到不超过
+    两者都为 None 时清理全部缓存。skip 为正在使用的用户数据目录。
+    返回 (清理的字节数, 统计的总字节数)
+    """
+    entries = scan(skip)
+    total = sum(size for _, _, size, _ in entries)
+    now = time.time()
+    chosen = []
+    by_profile = {}
+    for entry in entries:
+        by_profile.setdefault(entry[0], []).append(entry)
+    for user_data_dir, items in by_profile.items():
+        if max_age_days is None and max_size_mb is None:
+            chosen.extend(items)
+            continue
+        remaining = []
+        for item in items:
+            if max_age_days is not None and now - item[3] > max_age_days * 86400:
+                chosen.append(item)
+            else:
+                remaining.append(item)
+        if max_size_mb is not None:
+            size = sum(item[2] for item in remaining)
+            for item in sorted(remaining, key=lambda item: -item[2]):
+                if size <= max_size_mb * 1024 * 1024:
+                    break
+                chosen.append(item)
+                size -= item[2]
+    freed = 0
+    for user_data_dir, path, size, _ in chosen:
+        print(f"{'将清理' if dry_run else '清理'}: {path} ({size / 1024 / 1024:.1f} MB)")
+        if not dry_run:
+            move_to_trash(path, empty=False)
+        freed += size
+    if chosen and not dry_run:
+        empty_trash_async()
+    return freed, total
+
+def move_to_trash(path, empty=True):
+    """把目录改名移入回收区，empty 为真时随后在后台删除"""
+    os.makedirs(TRASH_DIR, exist_ok=True)
+    name = os.path.basename(os.path.normpath(path)).replace(" ", "_")
+    target = os.path.join(TRASH_DIR, f"{name}-{time.time_ns()}")
+    os.rename(path, target)
+    if empty:
+        empty_trash_async()
+    return target
+
+def empty_trash():
+    """删除回收区中的所有内容"""
+    with _delete_lock:
+        if not os.path.isdir(TRASH_DIR):
+            return
+        for name in os.listdir(TRASH_DIR):
+            path = os.path.join(TRASH_DIR, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+def empty_trash_async():
+    """在后台线程中清空回收区（已有线程在运行时由它再清理一轮）"""
+    global _trash_worker
+    _trash_pending.set()
+    with _worker_lock:
+        if _trash_worker is None:
+            _trash_worker = threading.Thread(target=_trash_loop, daemon=True)
+            _trash_worker.start()
+
+def _trash_loop():
+    global _trash_worker
+    while True:
+        _trash_pending.clear()
+        empty_trash()
+        with _worker_lock:
+            if not _trash_pending.is_set():
+                _trash_worker = None
+                return
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="清理 Chrome 用户数据目录中的缓存")
+    parser.add_argument("--max-age", type=float, help="清理超过多少天没有更新的缓存")
+    parser.add_argument("--max-size", type=float, help="每个用户数据目录最多保留多少 MB 缓存")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    args = parser.parse_args(argv)
+    freed, total = collect(args.max_age, args.max_size, dry_run=args.dry_run)
+    print(f"缓存共 {total / 1024 / 1024:.1f} MB，{'可' if args.dry_run else '已'}清理 {freed / 1024 / 1024:.1f} MB")
+    if not args.dry_run:
+        empty_trash()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,20 +2,37 @@ import os
 import time
 import sys
 import json
+import socket
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
+
+import startup_profile
+import token_resolver
+from launch_profiles import apply_profile
+from startup_profile import timed_import
+
+# selenium 在第一次打开浏览器时才导入（见 load_selenium），窗口可以立即显示
+webdriver = By = WebDriverWait = EC = ChromeDriverManager = Service = None
+
+# 购买按钮位置
+BUY_BUTTON_XPATH = "/html/body/main/div/div[1]/div[2]/div/div/div[5]"
+# 预备模式下的触发方式：快捷键，以及本地 UDP 端口（发送 "fire" 即触发）
+FIRE_HOTKEY = "<F8>"
+FIRE_SIGNAL_PORT = 18626
+# 预备后每隔多少秒检查一次按钮是否仍然有效
+ARM_CHECK_INTERVAL = 1.0
+# 预备后每隔多少秒刷新一次页面，避免页面数据过旧
+ARM_RELOAD_INTERVAL = 300
 
 class PumpAutoBuyApp:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Pump Auto Buy")
         self.driver = None  # 添加driver作为类属性
+        self.armed = None  # 预备状态：已定位好的购买按钮等信息
+        self.driver_lock = threading.Lock()  # 保护 driver，避免触发和保活检查同时操作页面
+        self.arm_stop = threading.Event()
         
         # 获取可执行文件所在目录
         if getattr(sys, 'frozen', False):
@@ -40,7 +57,7 @@ class PumpAutoBuyApp:
         
         # 计算窗口位置
         window_width = 420
-        window_height = 280
+        window_height = 320
         x = (screen_width - window_width) // 2
         y = (screen_height - window_height) // 2
         
@@ -67,8 +84,12 @@ class PumpAutoBuyApp:
         self.sol_amount_entry = ttk.Entry(main_frame, width=40)
         self.sol_amount_entry.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E))
         
-        # 开始按钮
-        ttk.Button(main_frame, text="Start Auto Buy", command=self.start_auto_buy).grid(row=4, column=0, columnspan=2, pady=20)
+        # 按钮区：开始 / 预备 / 触发
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=4, column=0, columnspan=2, pady=20)
+        ttk.Button(button_frame, text="Start Auto Buy", command=self.start_auto_buy).grid(row=0, column=0, padx=4)
+        ttk.Button(button_frame, text="Arm", command=self.arm).grid(row=0, column=1, padx=4)
+        ttk.Button(button_frame, text=f"Fire ({FIRE_HOTKEY.strip('<>')})", command=self.fire).grid(row=0, column=2, padx=4)
         
         # 状态标签
         self.status_label = ttk.Label(main_frame, text="")
@@ -83,6 +104,10 @@ class PumpAutoBuyApp:
         # 绑定关闭窗口事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        # 绑定触发快捷键，并监听本地触发信号
+        self.root.bind(FIRE_HOTKEY, lambda event: self.fire("hotkey"))
+        self.start_fire_listener()
+        
     def load_settings(self):
         """从配置文件加载设置"""
         try:
@@ -111,6 +136,7 @@ class PumpAutoBuyApp:
     def on_closing(self):
         """窗口关闭时保存设置并关闭浏览器"""
         self.save_settings()
+        self.disarm()
         if self.driver:
             try:
                 self.driver.quit()
@@ -133,20 +159,32 @@ class PumpAutoBuyApp:
         except ValueError as e:
             return False, str(e)
             
-    def start_auto_buy(self):
-        """开始自动购买流程"""
+    def post_status(self, message):
+        """从后台线程更新状态标签"""
+        self.root.after(0, self.update_status, message)
+        
+    def read_inputs(self):
+        """读取并验证输入，无效时弹窗提示并返回 None"""
         contract_address = self.contract_entry.get().strip()
         sol_amount = self.sol_amount_entry.get().strip()
         
-        # 验证输入
         if not contract_address:
             messagebox.showerror("Error", "Please enter token contract address")
-            return
+            return None
             
         is_valid, result = self.validate_sol_amount(sol_amount)
         if not is_valid:
             messagebox.showerror("Error", f"Invalid SOL amount: {result}")
+            return None
+        return contract_address, result
+        
+    def start_auto_buy(self):
+        """开始自动购买流程"""
+        inputs = self.read_inputs()
+        if not inputs:
             return
+        contract_address, result = inputs
+        self.disarm()
             
         self.update_status("Launching browser...")
         self.root.update()
@@ -183,12 +221,185 @@ class PumpAutoBuyApp:
         except Exception as e:
             self.update_status(f"Error occurred: {str(e)}")
             
+    def ensure_browser(self):
+        """复用已打开且已连接钱包的浏览器，没有则新开一个"""
+        if self.driver:
+            try:
+                self.driver.current_url
+                return True
+            except:
+                self.driver = None
+                
+        self.update_status("Launching browser...")
+        self.driver = open_chrome("https://pump.fun")
+        self.update_status("Handling initial popup...")
+        if not handle_initial_popup(self.driver):
+            print("No popup found, please handle manually if needed")
+        self.update_status("Please connect your wallet in the browser...")
+        if not wait_for_wallet_connection(self.driver):
+            self.update_status("Wallet connection failed")
+            return False
+        return True
+        
+    def arm(self):
+        """预备：提前打开代币页面、填好数量并定位购买按钮，触发时只需点击"""
+        inputs = self.read_inputs()
+        if not inputs:
+            return
+        contract_address, sol_amount = inputs
+        self.disarm()
+        
+        start = time.perf_counter()
+        try:
+            if not self.ensure_browser():
+                return
+            self.update_status("Arming...")
+            with self.driver_lock:
+                buy_button = prepare_buy(self.driver, contract_address, sol_amount)
+                url = self.driver.current_url if buy_button else None
+        except Exception as e:
+            self.update_status(f"Arm failed: {e}")
+            return
+        if not buy_button:
+            self.update_status("Arm failed")
+            return
+            
+        ready_ms = (time.perf_counter() - start) * 1000
+        self.armed = {
+            "contract_address": contract_address,
+            "sol_amount": sol_amount,
+            "button": buy_button,
+            "url": url,
+            "loaded_at": time.time(),
+        }
+        print(f"Armed {contract_address}: arm-to-ready {ready_ms:.0f} ms")
+        self.update_status(f"Armed in {ready_ms:.0f} ms, press Fire / {FIRE_HOTKEY.strip('<>')}")
+        
+        self.arm_stop = threading.Event()
+        threading.Thread(target=self.keep_armed, args=(self.arm_stop,), daemon=True).start()
+        
+    def disarm(self):
+        """取消预备状态并停止保活检查"""
+        self.arm_stop.set()
+        self.armed = None
+        
+    def keep_armed(self, stop_event):
+        """预备期间定期检查按钮和数量是否仍然有效，失效则重新定位，定期刷新页面
+        
+        刷新只发出跳转、不等页面加载，等待元素出现时也不持有 driver_lock，这期间触发会被拒绝而不是等待
+        """
+        while not stop_event.wait(ARM_CHECK_INTERVAL):
+            armed = self.armed
+            if not armed:
+                return
+            with self.driver_lock:
+                if stop_event.is_set() or self.armed is not armed:
+                    return
+                try:
+                    reload = time.time() - armed["loaded_at"] >= ARM_RELOAD_INTERVAL
+                    if reload or self.driver.current_url != armed["url"]:
+                        # 定期刷新页面，保持价格等数据最新
+                        armed["stale"] = True
+                        self.driver.execute_script("window.location.href = arguments[0]", armed["url"])
+                        armed["loaded_at"] = time.time()
+                        raise RuntimeError("page reloaded" if reload else "page changed")
+                    amount_input = self.driver.find_element(By.XPATH, "//*[@id='amount']")
+                    if amount_input.get_attribute("value") != str(armed["sol_amount"]):
+                        raise RuntimeError("amount changed")
+                    if not armed["button"].is_enabled():
+                        raise RuntimeError("button disabled")
+                    continue
+                except Exception as e:
+                    reason = e
+            # 页面重新渲染后元素会失效，等元素出现后重新填写并定位
+            try:
+                resolve_buy_button(self.driver)
+                with self.driver_lock:
+                    if stop_event.is_set() or self.armed is not armed:
+                        return
+                    fill_sol_amount(self.driver, armed["sol_amount"])
+                    armed["button"] = resolve_buy_button(self.driver)
+                    armed["stale"] = False
+                print(f"Re-armed after: {reason}")
+            except Exception as e:
+                print(f"Re-arm failed: {e}")
+                self.post_status("Armed button lost, please arm again")
+                        
+    def fire(self, source="button"):
+        """触发：只执行最后的点击，并报告触发到点击完成的耗时
+
+        这里不做任何等待（热键触发时在界面线程中执行）：保活刚刷新页面、还没重新预备时拒绝触发并保持预备，由保活线程重新填写
+        """
+        start = time.perf_counter()
+        armed = self.armed
+        if not armed:
+            print("Not armed, ignoring fire")
+            return False
+        with self.driver_lock:
+            if self.armed is not armed:
+                return False
+            if armed.get("stale"):
+                message = "Page is reloading, re-arming; fire again in a moment"
+                print(message)
+                self.post_status(message)
+                return False
+            self.disarm()
+            try:
+                armed["button"].click()
+            except Exception:
+                # 按钮刚好失效时立即重新定位再点击（只查找一次，不等待）
+                try:
+                    self.driver.find_element(By.XPATH, BUY_BUTTON_XPATH).click()
+                except Exception as e:
+                    message = f"Fire failed: {e}"
+                    print(message)
+                    self.post_status(message)
+                    return False
+        click_ms = (time.perf_counter() - start) * 1000
+        message = f"Fired via {source}: fire-to-click {click_ms:.1f} ms"
+        print(f"Purchase initiated. {message}")
+        self.post_status(message)
+        return True
+        
+    def start_fire_listener(self):
+        """监听本地 UDP 触发信号，收到 "fire" 时立即触发"""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(("127.0.0.1", FIRE_SIGNAL_PORT))
+        except OSError as e:
+            print(f"Fire signal listener disabled: {e}")
+            return
+            
+        def listen():
+            while True:
+                data, _ = sock.recvfrom(64)
+                if data.strip().lower() == b"fire":
+                    self.fire("signal")
+                    
+        threading.Thread(target=listen, daemon=True).start()
+        print(f"Listening for fire signal on udp://127.0.0.1:{FIRE_SIGNAL_PORT}")
+            
     def run(self):
         """运行应用"""
+        self.root.after(0, startup_profile.ready, "window ready")
         self.root.mainloop()
 
+def load_selenium():
+    """导入 selenium 相关模块到全局变量，只在第一次调用时导入"""
+    global webdriver, By, WebDriverWait, EC, ChromeDriverManager, Service
+    if webdriver is not None:
+        return
+    webdriver = timed_import("selenium.webdriver")
+    By = timed_import("selenium.webdriver.common.by").By
+    WebDriverWait = timed_import("selenium.webdriver.support.ui").WebDriverWait
+    EC = timed_import("selenium.webdriver.support.expected_conditions")
+    Service = timed_import("selenium.webdriver.chrome.service").Service
+    ChromeDriverManager = timed_import("webdriver_manager.chrome").ChromeDriverManager
+
 def open_chrome(url):
+    load_selenium()
     chrome_options = webdriver.ChromeOptions()
+    apply_profile(chrome_options)  # 可用环境变量 CHROME_LAUNCH_PROFILE 修改，见 launch_profiles.py
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
     driver.get(url)
     return driver
@@ -305,27 +516,42 @@ def search_and_select_token(driver, contract_address):
         print(f"Error searching for token: {e}")
         return False
 
+def fill_sol_amount(driver, sol_amount):
+    """填写SOL数量"""
+    # 等待SOL输入框可用
+    sol_input = WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.XPATH, "//*[@id='amount']"))
+    )
+    sol_input.clear()  # 清除默认值
+    sol_input.send_keys(str(sol_amount))  # 输入SOL数量
+    
+def resolve_buy_button(driver, timeout=10):
+    """等待并返回可点击的购买按钮"""
+    return WebDriverWait(driver, timeout).until(
+        EC.element_to_be_clickable((By.XPATH, BUY_BUTTON_XPATH))
+    )
+
+def prepare_buy(driver, contract_address, sol_amount):
+    """打开代币页面（直接打开失败时搜索）、填好数量，返回购买按钮（失败返回 None）"""
+    method = token_resolver.open_token_page(
+        driver, contract_address, search=lambda: search_and_select_token(driver, contract_address)
+    )
+    if not method:
+        return None
+    if method == "search":
+        time.sleep(2)  # 等待点击搜索结果后的页面加载；直接打开时已确认页面内容出现
+    
+    fill_sol_amount(driver, sol_amount)
+    time.sleep(1)  # 等待输入完成
+    
+    return resolve_buy_button(driver)
+
 def auto_buy_token(driver, contract_address, sol_amount):
     """自动购买代币"""
     try:
-        # 先搜索并选择代币
-        if not search_and_select_token(driver, contract_address):
+        buy_button = prepare_buy(driver, contract_address, sol_amount)
+        if not buy_button:
             return False
-            
-        time.sleep(2)  # 等待页面加载
-            
-        # 等待SOL输入框可用
-        sol_input = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//*[@id='amount']"))
-        )
-        sol_input.clear()  # 清除默认值
-        sol_input.send_keys(str(sol_amount))  # 输入SOL数量
-        time.sleep(1)  # 等待输入完成
-        
-        # 等待并点击购买按钮
-        buy_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, "/html/body/main/div/div[1]/div[2]/div/div/div[5]"))
-        )
         buy_button.click()
         
         print("Purchase initiated")
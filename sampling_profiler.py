@@ -0,0 +1,241 @@
+"""
+按需开启的采样分析器
+
+交互模式中输入 profile start 开始、profile stop 结束，不需要重启程序。
+后台线程每隔 interval 秒用 sys._current_frames() 读取所有线程的调用栈（不停下其他线程，开销很小），结束时：
+- 写出 flamegraph.pl / speedscope 可以直接读取的折叠调用栈文件（每行: 线程;函数;...;函数 次数）
+- 按时间都花在哪里分类：Python 代码、Selenium 序列化/协议、等待 chromedriver/浏览器、等待被占用的锁、空闲（包括等待队列、事件和其他线程）
+- 列出自身耗时和累计耗时最多的函数（不含空闲的线程）
+
+生成火焰图: flamegraph.pl profiles/xxx.collapsed > xxx.svg，或把文件拖到 https://www.speedscope.app
+"""
+
+import os
+import re
+import sys
+import time
+import linecache
+import threading
+from collections import Counter
+
+PROFILE_DIR = "profiles"
+DEFAULT_HZ = 100
+DEFAULT_TOP = 15
+
+CATEGORIES = {
+    "python": "Python 代码",
+    "selenium": "Selenium 序列化/协议",
+    "browser": "等待 chromedriver/浏览器",
+    "lock": "等待被其他线程占用的锁",
+    "idle": "空闲（sleep/输入/等待连接、队列、事件、其他线程）",
+}
+
+# 同步原语所在的文件：调用栈最内层停在这里时，按外面调用它的入口函数判断是在抢锁还是在等待
+SYNC_FILES = ("threading.py", "queue.py", os.path.join("concurrent", "futures", "_base.py"))
+# 只有这些入口是在抢被占用的锁（Semaphore.acquire、with Condition、满队列的 put）；
+# 其余入口（Condition/Event.wait、Queue.get、join、Future.result 等）是在等任务、事件或其他线程，算作空闲
+LOCK_FUNCTIONS = ("acquire", "__enter__", "put")
+# threading.py 中启动线程的函数，不是同步原语
+THREAD_START = ("_bootstrap", "_bootstrap_inner", "run")
+# 同步原语内部等待通知的函数，它们的最内层代码行（waiter.acquire()）不是在抢锁
+WAIT_FUNCTIONS = ("wait", "_wait_for_tstate_lock")
+# Lock.acquire 和 with 锁 是 C 实现的，栈中只能看到调用它的这一行
+LOCK_LINE = re.compile(r"\.acquire\(|^\s*with\s.*(lock|_cond)\b", re.IGNORECASE)
+IDLE_FILES = ("selectors.py", "socketserver.py")
+# 线程池的工作线程在 _worker 中停在 work_queue.get（SimpleQueue 是 C 实现的，栈中看不到）时是在等任务
+IDLE_FRAMES = ((os.path.join("concurrent", "futures", "thread.py"), "_worker"),)
+# 最内层这一行调用的是会阻塞的 C 函数（栈中看不到）时视为空闲
+IDLE_CALLS = ("sleep(", "input(", "select(", "accept(")
+# Selenium 通过这些模块向 chromedriver 发送 HTTP 请求，停在这里就是在等 chromedriver/浏览器的响应
+NETWORK_MODULES = ("urllib3", os.path.join("http", "client.py"), "socket.py", "ssl.py")
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def classify(frames, leaf_line):
+    """根据调用栈（从外到内的 (文件, 函数)）和最内层正在执行的代码行判断分类"""
+    in_selenium = any("selenium" in filename for filename, _ in frames)
+    leaf, leaf_function = frames[-1]
+    if in_selenium and any(module in leaf for module in NETWORK_MODULES):
+        return "browser"
+    if leaf.endswith(SYNC_FILES):
+        if leaf_function not in WAIT_FUNCTIONS and LOCK_LINE.search(leaf_line):
+            return "lock"
+        # 从最内层往外找到第一个同步原语的函数，也就是业务代码调用的入口
+        entry = len(frames) - 1
+        while entry > 0 and frames[entry - 1][0].endswith(SYNC_FILES) and frames[entry - 1][1] not in THREAD_START:
+            entry -= 1
+        return "lock" if frames[entry][1] in LOCK_FUNCTIONS else "idle"
+    if (leaf.endswith(IDLE_FILES) or any(call in leaf_line for call in IDLE_CALLS)
+            or any(leaf.endswith(filename) and leaf_function == function for filename, function in IDLE_FRAMES)):
+        return "idle"
+    if LOCK_LINE.search(leaf_line):
+        return "lock"
+    if in_selenium:
+        return "selenium"
+    return "python"
+
+class SamplingProfiler:
+    """定时读取所有线程的调用栈并计数"""
+
+    def __init__(self, hz=DEFAULT_HZ):
+        self.interval = 1.0 / hz
+        self.stacks = Counter()  # (线程名, (函数, ...)) -> 次数，函数从外到内
+        self.busy = Counter()  # 同上，不含空闲的样本
+        self.categories = Counter()
+        self._category_cache = {}  # (线程名, 调用栈, 最内层代码行) -> 分类
+        self.samples = 0
+        self.overhead = 0.0  # 采样本身用掉的秒数
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def elapsed(self):
+        return ((self.stopped_at or time.time()) - self.started_at) if self.started_at else 0.0
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped_at = time.time()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            begin = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self._sample(names.get(ident, str(ident)), frame)
+            self.samples += 1
+            self.overhead += time.perf_counter() - begin
+
+    def _sample(self, thread_name, frame):
+        leaf_line = linecache.getline(frame.f_code.co_filename, frame.f_lineno)
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        key = (thread_name, tuple(_frame_label(code) for code in codes))
+        category = self._category_cache.get((key, leaf_line))
+        if category is None:
+            category = self._category_cache[(key, leaf_line)] = classify([(code.co_filename, code.co_name) for code in codes], leaf_line)
+        self.stacks[key] += 1
+        self.categories[category] += 1
+        if category != "idle":
+            self.busy[key] += 1
+
+    def write_collapsed(self, path):
+        """写出折叠调用栈文件，返回行数"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for (thread_name, frames), count in self.stacks.most_common():
+                f.write(";".join((thread_name.replace(";", ":"),) + frames) + f" {count}\n")
+        return len(self.stacks)
+
+    def report(self, top=DEFAULT_TOP):
+        total = sum(self.categories.values())
+        if not total:
+            print("没有采集到样本")
+            return
+        threads = len({thread_name for thread_name, _ in self.stacks})
+        overhead = self.overhead / self.elapsed * 100 if self.elapsed else 0.0
+        print(f"采样 {self.samples} 次（间隔 {self.interval * 1000:.0f} ms，用时 {self.elapsed:.1f}s，"
+              f"{threads} 个线程，采样开销 {overhead:.1f}%）")
+        print("时间分布（线程样本）:")
+        for category, count in self.categories.most_common():
+            print(f"  {count / total * 100:5.1f}%  {CATEGORIES[category]}")
+        busy_total = sum(self.busy.values())
+        if not busy_total:
+            print("所有线程都处于空闲")
+            return
+        own = Counter()
+        inclusive = Counter()
+        for (_, frames), count in self.busy.items():
+            own[frames[-1]] += count
+            for label in set(frames):
+                inclusive[label] += count
+        print(f"自身耗时最多的函数（不含空闲，共 {busy_total} 个样本）:")
+        for label, count in own.most_common(top):
+            print(f"  {count / busy_total * 100:5.1f}%  {label}")
+        print("累计耗时最多的函数（包括调用的函数）:")
+        for label, count in inclusive.most_common(top):
+            print(f"  {count / busy_total * 100:5.1f}%  {label}")
+
+_active = None
+_active_lock = threading.Lock()
+
+def start(hz=DEFAULT_HZ):
+    global _active
+    with _active_lock:
+        if _active and _active.running:
+            print(f"分析器已在运行（{_active.elapsed:.0f}s），输入 profile stop 结束")
+            return None
+        _active = SamplingProfiler(hz)
+        _active.start()
+    print(f"已开始采样（每秒 {hz} 次，所有线程），输入 profile stop 结束并查看结果")
+    return _active
+
+def stop(path=None, top=DEFAULT_TOP):
+    """结束采样，打印汇总并写出折叠调用栈文件，返回文件路径（写入失败返回 None）"""
+    global _active
+    with _active_lock:
+        profiler, _active = _active, None
+    if not profiler or not profiler.running:
+        print("分析器没有在运行，输入 profile start 开始")
+        return None
+    profiler.stop()
+    default_path = os.path.join(PROFILE_DIR, time.strftime("profile_%Y%m%d_%H%M%S.collapsed"))
+    profiler.report(top)
+    # 写文件失败（目录不存在、没有权限、磁盘满）不影响已经打印的结果；指定的路径写不了时改写到默认位置
+    for candidate in dict.fromkeys([path or default_path, default_path]):
+        try:
+            lines = profiler.write_collapsed(candidate)
+        except OSError as e:
+            print(f"折叠调用栈写入 {candidate} 失败: {e}")
+            continue
+        print(f"折叠调用栈已写入 {candidate}（{lines} 行），可用 flamegraph.pl 或 speedscope 查看")
+        return candidate
+    return None
+
+def command(args):
+    """交互模式的 profile 指令: profile / profile start [每秒次数] / profile stop [文件] [top=数量]"""
+    action = args[0].lower() if args else ""
+    if not args:
+        with _active_lock:
+            profiler = _active
+        if profiler and profiler.running:
+            print(f"分析器运行中: {profiler.elapsed:.0f}s，已采样 {profiler.samples} 次")
+        else:
+            print("分析器没有在运行，输入 profile start 开始")
+    elif action == "start" and len(args) <= 2:
+        if len(args) == 2 and not (args[1].isdigit() and 1 <= int(args[1]) <= 1000):
+            print("每秒采样次数应为 1 到 1000 之间的整数")
+            return
+        start(int(args[1]) if len(args) == 2 else DEFAULT_HZ)
+    elif action == "stop":
+        path, top = None, DEFAULT_TOP
+        for arg in args[1:]:
+            if arg.startswith("top=") and arg[4:].isdigit():
+                top = int(arg[4:])
+            elif path is None and not arg.startswith("top="):
+                path = arg
+            else:
+                print("请使用正确的格式: profile stop [文件] [top=数量]")
+                return
+        stop(path, top)
+    else:
+        print("请使用正确的格式: profile / profile start [每秒次数] / profile stop [文件] [top=数量]")
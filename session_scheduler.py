@@ -0,0 +1,354 @@
+import json
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+TASK_SECONDS = metrics.histogram("chrome_task_seconds", "任务执行耗时", ["task"])
+TASK_WAIT_SECONDS = metrics.histogram("chrome_task_wait_seconds", "任务从提交到开始执行的等待时间", ["task"])
+TASKS_FINISHED = metrics.counter("chrome_tasks_total", "结束的任务数", ["task", "status"])
+TASK_RETRIES = metrics.counter("chrome_task_retries_total", "任务失败后重试的次数", ["task"])
+
+# 任务注册表：任务名 -> 函数(manager, session_id, driver, **params)，返回真值表示成功
+TASKS = {}
+
+def register_task(name):
+    """注册一个可被调度的任务"""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+@register_task("search")
+def task_search(manager, session_id, driver, contract_address=None):
+    """打开合约的代币页面（直接打开失败时在首页搜索）"""
+    if contract_address:
+        return manager._do_task(session_id, driver, contract_address)
+    return manager._do_task(session_id, driver)
+
+@register_task("token")
+def task_token(manager, session_id, driver, contract_address):
+    """在会话的标签页池中打开（或切换到已打开的）代币页面"""
+    ok, _ = manager.open_token_tab(session_id, contract_address, driver)
+    return ok
+
+@register_task("tab")
+def task_tab(manager, session_id, driver, key, url):
+    """在会话的标签页池中打开（或切换到已打开的）任意网页，key 为标签页名称"""
+    handle, _ = manager.tab_pool(session_id, driver).open(key, url)
+    return bool(handle)
+
+@register_task("open")
+def task_open(manager, session_id, driver, url):
+    """打开指定网址"""
+    driver.get(url)
+    return True
+
+@register_task("ping")
+def task_ping(manager, session_id, driver):
+    """空任务，用于测量调度延迟"""
+    return True
+
+@register_task("script")
+def task_script(manager, session_id, driver, js):
+    """在页面中执行一段脚本"""
+    driver.execute_script(js)
+    return True
+
+class Job:
+    """调度队列中的一个任务"""
+    _ids = itertools.count(1)
+
+    def __init__(self, task, params=None, session_id=None, priority=0, retries=2, timeout=None, wait_for_session=False):
+        self.id = next(Job._ids)
+        self.task = task
+        self.params = params or {}
+        self.session_id = session_id  # 指定会话，None 表示任意空闲会话
+        self.wait_for_session = wait_for_session  # 指定的会话没有运行时等它启动（否则任务失败）
+        self.priority = priority  # 数字越大越优先
+        self.retries = retries
+        self.submitted_at = time.time()
+        self.deadline = self.submitted_at + timeout if timeout else None
+        self.attempts = 0
+        self.status = "queued"  # queued / running / done / failed / expired
+        self.ran_on = None
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.done = threading.Event()
+
+    def expired(self, now=None):
+        return self.deadline is not None and (now or time.time()) >= self.deadline
+
+    def to_dict(self):
+        """任务状态（可序列化为 JSON）"""
+        return {
+            "id": self.id,
+            "task": self.task,
+            "session_id": self.ran_on or self.session_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "wait_seconds": round(self.started_at - self.submitted_at, 4) if self.started_at else None,
+            "run_seconds": round(self.finished_at - self.started_at, 4) if self.finished_at and self.started_at else None,
+        }
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+class SessionScheduler:
+    """把任务分发到空闲且健康的会话，控制并发、重试和截止时间"""
+
+    def __init__(self, manager, max_concurrency=8):
+        self.manager = manager
+        self.max_concurrency = max_concurrency
+        self._queue = []  # (-priority, 序号, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._busy = set()  # 正在执行任务的会话
+        self._unhealthy = set()  # 健康检查失败的 driver
+        self._running = 0
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        # 统计
+        self._wait_times = []
+        self._run_times = []
+        self._counts = {"done": 0, "failed": 0, "expired": 0, "retried": 0}
+        self._first_submit = None
+        self.jobs = {}  # job_id -> Job
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, task, params=None, session_id=None, priority=0, retries=2, timeout=None, wait_for_session=False):
+        """提交任务，返回 Job
+
+        指定的会话没有运行时拒绝，wait_for_session 为真时排队等它启动（最好同时设置 timeout）
+        """
+        if task not in TASKS:
+            raise ValueError(f"未知任务: {task}，可用任务: {', '.join(sorted(TASKS))}")
+        if session_id is not None and session_id not in self.manager.sessions:
+            raise ValueError(f"会话 {session_id} 不存在")
+        if session_id is not None and not wait_for_session and session_id not in self.manager.drivers:
+            raise ValueError(f"会话 {session_id} 没有运行（需要等它启动时指定 wait_for_session）")
+        job = Job(task, params, session_id, priority, retries, timeout, wait_for_session)
+        with self._cond:
+            self.jobs[job.id] = job
+            if self._first_submit is None:
+                self._first_submit = job.submitted_at
+            self._push(job)
+            self._cond.notify_all()
+        return job
+
+    def submit_file(self, path):
+        """从 JSONL 文件批量提交任务，每行形如 {"task": "search", "params": {...}, "session_id": "1"}"""
+        jobs = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    spec = json.loads(line)
+                    if not isinstance(spec, dict):
+                        raise ValueError("每行必须是一个 JSON 对象")
+                    if not isinstance(spec.get("params", {}), (dict, type(None))):
+                        raise ValueError("params 必须是 JSON 对象")
+                    jobs.append(self.submit(
+                        spec["task"],
+                        params=spec.get("params"),
+                        session_id=spec.get("session_id"),
+                        priority=spec.get("priority", 0),
+                        retries=spec.get("retries", 2),
+                        timeout=spec.get("timeout"),
+                        wait_for_session=bool(spec.get("wait_for_session")),
+                    ))
+                except (KeyError, ValueError, TypeError) as e:
+                    print(f"第 {line_no} 行任务无效: {e}")
+        return jobs
+
+    def _push(self, job):
+        job.status = "queued"
+        heapq.heappush(self._queue, (-job.priority, next(self._seq), job))
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self._counts[status] += 1
+        TASKS_FINISHED.inc(task=job.task, status=status)
+        job.done.set()
+
+    def _idle_sessions(self):
+        """空闲且健康的会话，需持有锁"""
+        with self.manager.drivers_lock:
+            drivers = dict(self.manager.drivers)
+        # track_drivers 换掉或移除的 driver 不再记录（重启后的新 driver 重新参与分发）
+        self._unhealthy &= set(drivers.values())
+        return {
+            sid: drv for sid, drv in drivers.items()
+            if sid not in self._busy and drv not in self._unhealthy
+        }
+
+    def _pick(self):
+        """按优先级选出下一个可以执行的任务及会话，需持有锁"""
+        now = time.time()
+        idle = self._idle_sessions()
+        with self.manager.drivers_lock:
+            live = set(self.manager.drivers)
+            broken = {sid for sid, drv in self.manager.drivers.items() if drv in self._unhealthy}
+        for entry in sorted(self._queue):
+            job = entry[2]
+            if job.expired(now):
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._finish(job, "expired", "超过截止时间")
+                continue
+            if job.session_id in broken or (
+                    job.session_id is not None and job.session_id not in live and not job.wait_for_session):
+                # 指定的会话不可用或已经关闭，等下去队列永远不会清空
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._finish(job, "failed", f"会话 {job.session_id} {'不可用' if job.session_id in broken else '没有运行'}")
+                continue
+            if job.session_id is not None:
+                session_id = job.session_id if job.session_id in idle else None
+            else:
+                session_id = next(iter(sorted(idle, key=lambda sid: int(sid) if sid.isdigit() else 0)), None)
+            if session_id is not None:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                return job, session_id, idle[session_id]
+        return None
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._stopped:
+                while self._running < self.max_concurrency:
+                    picked = self._pick()
+                    if not picked:
+                        break
+                    job, session_id, driver = picked
+                    self._busy.add(session_id)
+                    self._running += 1
+                    job.status = "running"
+                    self._executor.submit(self._run, job, session_id, driver)
+                # 定时醒来检查截止时间和新登记的会话
+                self._cond.wait(timeout=0.5)
+
+    def _run(self, job, session_id, driver):
+        ok = False
+        error = None
+        healthy = True
+        started = time.time()
+        try:
+            # 健康检查：浏览器已关闭或崩溃时不执行任务
+            driver.current_window_handle
+        except Exception as e:
+            healthy = False
+            error = f"会话 {session_id} 不可用: {e}"
+        if healthy:
+            job.attempts += 1
+            job.ran_on = session_id
+            if job.started_at is None:
+                job.started_at = started
+                self._wait_times.append(started - job.submitted_at)
+                TASK_WAIT_SECONDS.observe(started - job.submitted_at, task=job.task)
+            try:
+                ok = bool(TASKS[job.task](self.manager, session_id, driver, **job.params))
+                if not ok:
+                    error = "任务返回失败"
+            except Exception as e:
+                error = str(e)
+            self._run_times.append(time.time() - started)
+            TASK_SECONDS.observe(time.time() - started, task=job.task)
+
+        with self._cond:
+            self._busy.discard(session_id)
+            self._running -= 1
+            if not healthy:
+                # 不可用的会话也算一次尝试，没有健康的会话时任务最终会失败而不是一直排队
+                self._unhealthy.add(driver)
+                job.attempts += 1
+                print(error)
+                if job.session_id is None and job.attempts <= job.retries and not job.expired():
+                    self._push(job)
+                else:
+                    self._finish(job, "failed", error)
+            elif ok:
+                self._finish(job, "done")
+            elif job.attempts <= job.retries and not job.expired():
+                self._counts["retried"] += 1
+                TASK_RETRIES.inc(task=job.task)
+                print(f"任务 #{job.id} 在会话 {session_id} 失败 ({error})，重试 {job.attempts}/{job.retries}")
+                self._push(job)
+            else:
+                print(f"任务 #{job.id} 失败: {error}")
+                self._finish(job, "failed", error)
+            self._cond.notify_all()
+
+    def reserve(self, session_id):
+        """会话空闲时把它标记为占用（不再分发任务），成功返回 True"""
+        with self._cond:
+            if session_id in self._busy:
+                return False
+            self._busy.add(session_id)
+            return True
+
+    def release(self, session_id):
+        """释放 reserve 占用的会话"""
+        with self._cond:
+            self._busy.discard(session_id)
+            self._cond.notify_all()
+
+    def drain(self, timeout=None):
+        """等待队列清空且没有正在执行的任务，超时返回 False"""
+        end = time.time() + timeout if timeout else None
+        with self._cond:
+            while self._queue or self._running:
+                remaining = end - time.time() if end else 1.0
+                if remaining <= 0:
+                    return False
+                self._cond.wait(timeout=min(remaining, 1.0))
+        return True
+
+    def stats(self):
+        """队列深度、等待时间和执行时间统计"""
+        with self._cond:
+            waits = list(self._wait_times)
+            runs = list(self._run_times)
+            finished = self._counts["done"] + self._counts["failed"] + self._counts["expired"]
+            elapsed = time.time() - self._first_submit if self._first_submit else 0
+            return {
+                "queue_depth": len(self._queue),
+                "running": self._running,
+                "idle_sessions": len(self._idle_sessions()),
+                **self._counts,
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95": _percentile(waits, 0.95),
+                "wait_max": max(waits, default=0.0),
+                "run_avg": sum(runs) / len(runs) if runs else 0.0,
+                "run_p95": _percentile(runs, 0.95),
+                "run_max": max(runs, default=0.0),
+                "throughput_per_min": finished / elapsed * 60 if elapsed else 0.0,
+            }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"\n队列: 等待 {s['queue_depth']} 个, 执行中 {s['running']} 个, 空闲会话 {s['idle_sessions']} 个")
+        print(f"完成 {s['done']} / 失败 {s['failed']} / 超时 {s['expired']} / 重试 {s['retried']}")
+        print(f"等待时间: 平均 {s['wait_avg']:.2f}s  P95 {s['wait_p95']:.2f}s  最长 {s['wait_max']:.2f}s")
+        print(f"执行时间: 平均 {s['run_avg']:.2f}s  P95 {s['run_p95']:.2f}s  最长 {s['run_max']:.2f}s")
+        print(f"吞吐量: {s['throughput_per_min']:.1f} 个/分钟")
+
+    def shutdown(self):
+        """停止分发，等待正在执行的任务结束"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,72 @@
+"""
+启动耗时统计
+
+- timed_import(name): 按需导入重量级模块，并记录导入耗时
+- ready(label): 程序可以使用（出现第一个提示符/窗口）时调用，记录到达时间
+- 设置环境变量 STARTUP_PROFILE=1 时在 ready 时打印报告
+- 设置环境变量 STARTUP_EXIT=1 时在 ready 后立即退出（供 bench_startup.py 测量启动时间）
+"""
+
+import os
+import sys
+import time
+import importlib
+
+_T0 = time.perf_counter()
+_imports = []  # (模块, 秒)
+_marks = []    # (标签, 距进程内计时起点的秒数)
+_reported = False
+
+BENCH_MODE = os.environ.get("STARTUP_EXIT") == "1"
+
+def timed_import(name):
+    """导入模块；第一次导入时记录耗时"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _imports.append((name, time.perf_counter() - start))
+    return module
+
+def mark(label):
+    """记录一个时间点"""
+    _marks.append((label, time.perf_counter() - _T0))
+
+def ready(label="first prompt"):
+    """程序已可以使用"""
+    global _reported
+    mark(label)
+    if os.environ.get("STARTUP_PROFILE") == "1" and not _reported:
+        _reported = True
+        report()
+    if BENCH_MODE:
+        sys.stdout.flush()
+        os._exit(0)
+
+def _process_age():
+    """进程从创建到现在的秒数（包含解释器启动和 onefile 解包），无法获取时返回 None"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+_AGE_AT_LOAD = _process_age()
+
+def report():
+    """打印各模块导入耗时和到达各时间点的耗时"""
+    print("\n启动耗时:")
+    if _AGE_AT_LOAD is not None:
+        print(f"  进程创建到开始执行程序: {_AGE_AT_LOAD * 1000:.0f} ms（解释器启动，onefile 的解包耗时请用 bench_startup.py 测量）")
+    for label, seconds in _marks:
+        print(f"  {label}: {seconds * 1000:.0f} ms")
+    if _imports:
+        print("  按需导入:")
+        for name, seconds in sorted(_imports, key=lambda item: -item[1]):
+            print(f"    {name}: {seconds * 1000:.0f} ms")
+    else:
+        print("  按需导入: 尚未导入重量级模块")
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+
+# 地址状态
+QUEUED = "queued"        # 已读入本批
+FILLED = "filled"        # 已填入表单
+SUBMITTED = "submitted"  # 已确认提交
+FAILED = "failed"        # 填写失败
+
+class SubmissionLedger:
+    """只追加的提交记录，批量 fsync，崩溃后可以准确续跑
+
+    记录文件每行一个 JSON: {"t": 时间, "pos": 第几个地址, "addr": 地址, "status": 状态}
+    索引快照保存在 <记录文件>.idx，打开时只需重放快照之后追加的部分
+    """
+
+    def __init__(self, path, sync_every=32, sync_interval=0.5):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.positions = {}  # pos -> [status, addr]
+        self.addresses = {}  # addr -> pos（最近一次）
+        self._pending = 0
+        self._last_sync = time.time()
+        offset = self._load_index()
+        self._replay(offset)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load_index(self):
+        """读取索引快照，返回快照对应的记录文件偏移"""
+        if not os.path.exists(self.index_path) or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot["offset"] > os.path.getsize(self.path):
+                return 0
+            self.positions = {int(pos): value for pos, value in snapshot["positions"].items()}
+            self.addresses = {value[1]: pos for pos, value in self.positions.items()}
+            return snapshot["offset"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"索引快照无效，重新读取记录: {e}")
+            self.positions = {}
+            self.addresses = {}
+            return 0
+
+    def _replay(self, offset):
+        """从 offset 开始重放记录，丢弃崩溃时写了一半的最后一行"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(offset)
+            good_end = offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                    self._apply(entry["pos"], entry["addr"], entry["status"])
+                except (ValueError, KeyError):
+                    break
+                good_end += len(line)
+            if good_end < os.path.getsize(self.path):
+                print("记录文件末尾有不完整的数据（上次可能异常退出），已截断")
+                f.truncate(good_end)
+
+    def _apply(self, pos, addr, status):
+        self.positions[pos] = [status, addr]
+        self.addresses[addr] = pos
+
+    def record(self, pos, addr, status):
+        """追加一条地址状态"""
+        self._apply(pos, addr, status)
+        self._file.write(json.dumps({"t": round(time.time(), 3), "pos": pos, "addr": addr, "status": status}) + "\n")
+        self._pending += 1
+        if self._pending >= self.sync_every or time.time() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """把缓冲的记录落盘"""
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.time()
+
+    def checkpoint(self):
+        """落盘并保存索引快照"""
+        self.sync()
+        snapshot = {"offset": os.fstat(self._file.fileno()).st_size, "positions": self.positions}
+        temp_path = self.index_path + ".temp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.index_path)
+
+    def close(self):
+        self.checkpoint()
+        self._file.close()
+
+    def status(self, pos):
+        """第 pos 个地址的 (状态, 地址)，没有记录返回 None"""
+        value = self.positions.get(pos)
+        return tuple(value) if value else None
+
+    def lookup(self, addr):
+        """地址最近一次记录的 (第几个, 状态)，没有记录返回 None"""
+        pos = self.addresses.get(addr)
+        if pos is None:
+            return None
+        return pos, self.positions[pos][0]
+
+    def is_submitted(self, addr):
+        found = self.lookup(addr)
+        return bool(found) and found[1] == SUBMITTED
+
+    def unconfirmed(self):
+        """已填写但还没确认提交的位置"""
+        return sorted(pos for pos, (status, _) in self.positions.items() if status == FILLED)
+
+    def last_submitted(self):
+        """最后一个已提交的 (第几个, 地址)，没有返回 None"""
+        submitted = [pos for pos, (status, _) in self.positions.items() if status == SUBMITTED]
+        if not submitted:
+            return None
+        pos = max(submitted)
+        return pos, self.positions[pos][1]
+
+    def mark_submitted(self, positions):
+        """把已填写的位置标记为已提交，返回标记的数量"""
+        count = 0
+        for pos in positions:
+            status, addr = self.positions[pos]
+            if status == FILLED:
+                self.record(pos, addr, SUBMITTED)
+                count += 1
+        self.checkpoint()
+        return count
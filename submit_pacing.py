@@ -0,0 +1,175 @@
+"""
+批量添加地址的自适应填写速度（AIMD）
+
+填写太快时 Bitget 可能提示操作频繁、弹出验证码，或者不提示但输入框里的地址被清掉（静默拒绝）。
+以前这些情况只会表现为"界面不对"，整批停止。现在每填写一行都检查页面上的这些信号：
+- 连续 PROBE_EVERY 行没有信号：速度（每秒操作数）加一个固定值，逐步试探更快的速度
+- 出现信号：速度减半并暂停一段时间（连续出现时暂停时间加倍），出现验证码时等待操作员在网页上完成验证，之后重试这一行
+- 填写失败但页面上没有提示（界面不对）同样减速，可能只是页面没跟上
+上次出现信号的速度记为上限，恢复时在上限的 RECOVER_RATIO 以下加速更快，接近上限时再慢慢试探。
+速度在同一次运行的各批之间保留，pace 指令查看当前速度、有效速度和退避记录。
+"""
+
+import re
+import time
+
+import metrics
+
+DEFAULT_DELAY = 0.5  # 每步操作后等待的秒数（原来固定的 0.5s）
+MIN_DELAY = 0.15
+MAX_DELAY = 4.0
+INCREASE = 0.25  # 每次加速增加的每秒操作数
+DECREASE = 0.5  # 出现信号时速度乘以这个值
+PROBE_EVERY = 10  # 连续这么多行没有信号后加速一次
+RECOVER_RATIO = 0.8  # 低于上限的这个比例时加速加倍
+COOLDOWN = 15  # 第一次退避暂停的秒数，连续退避时加倍
+MAX_COOLDOWN = 300
+CAPTCHA_TIMEOUT = 600  # 等待操作员完成验证码的最长秒数
+
+BACKOFFS = metrics.counter("bitget_backoffs_total", "填写地址时的退避次数", ["reason"])
+FILL_DELAY = metrics.gauge("bitget_fill_delay_seconds", "当前每步操作后等待的秒数")
+
+REASONS = {"throttled": "操作频繁", "captcha": "验证码", "rejected": "静默拒绝", "ui": "界面不对"}
+
+# 提示信息中的这些文字视为限流
+THROTTLE_PATTERN = "频繁|稍后|过多|太快|繁忙|too many|too frequent|rate limit|try again later"
+
+# 返回 [信号, 说明] 或 null；expected 不为空时还检查 xpath 对应的输入框是否保留了填写的值
+CHECK_SCRIPT = """
+const xpath = arguments[0], expected = arguments[1], pattern = new RegExp(arguments[2], 'i');
+const visible = el => !!el && el.offsetParent !== null;
+const frames = Array.from(document.querySelectorAll('iframe'));
+if (frames.some(f => visible(f) && /captcha|geetest|recaptcha|hcaptcha/i.test(f.src || ''))) return ['captcha', 'iframe'];
+const widgets = document.querySelectorAll('[class*="geetest"], [class*="captcha"], [id*="captcha"]');
+if (Array.from(widgets).some(visible)) return ['captcha', 'widget'];
+const messages = document.querySelectorAll('.el-message, .el-notification, .el-message-box, [class*="toast"], [role="alert"]');
+for (const el of messages) {
+    const text = (el.innerText || '').trim();
+    if (text && visible(el) && pattern.test(text)) return ['throttled', text.slice(0, 80)];
+}
+if (expected) {
+    const input = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (input && input.value !== expected) return ['rejected', '输入框的值是 "' + input.value.slice(0, 20) + '"'];
+}
+return null;
+"""
+
+def check_page(driver, input_xpath=None, expected=None):
+    """检查页面上的限流信号，返回 (信号, 说明)，没有信号返回 None"""
+    try:
+        found = driver.execute_script(CHECK_SCRIPT, input_xpath, expected, THROTTLE_PATTERN)
+    except Exception:
+        return None
+    return tuple(found) if found else None
+
+class AdaptivePacer:
+    """按页面上的限流信号调整填写速度：没有信号时线性加速，出现信号时减半"""
+
+    def __init__(self, delay=DEFAULT_DELAY, min_delay=MIN_DELAY, max_delay=MAX_DELAY,
+                 increase=INCREASE, decrease=DECREASE, probe_every=PROBE_EVERY, cooldown=COOLDOWN):
+        self.min_rate = 1 / max_delay
+        self.max_rate = 1 / min_delay
+        self.increase = increase
+        self.decrease = decrease
+        self.probe_every = probe_every
+        self.cooldown = cooldown
+        self.events = []  # [(时间, 信号, 说明, 退避前间隔, 退避后间隔, 暂停秒数)]
+        self.begin()
+        self.reset(delay)
+
+    @property
+    def delay(self):
+        return 1 / self.rate
+
+    def begin(self):
+        """开始统计一次运行的有效速度（速度本身保留）"""
+        self.started = time.time()
+        self.filled = 0
+        self.run_events = 0
+
+    def reset(self, delay=DEFAULT_DELAY):
+        """从 delay 重新开始，忘掉上限和退避记录"""
+        self.rate = 1 / delay  # 每秒操作数
+        self.ceiling = None  # 上次出现信号时的速度
+        self.best = None  # 持续了 probe_every 行没有信号的最高速度
+        self.clean = 0  # 上次加速或退避后没有信号的行数
+        self.consecutive = 0  # 中间没有加速过的连续退避次数
+        FILL_DELAY.set(round(self.delay, 3))
+
+    def success(self):
+        """一行填写成功且没有信号"""
+        self.filled += 1
+        self.clean += 1
+        if self.clean < self.probe_every:
+            return
+        self.clean = 0
+        self.consecutive = 0
+        self.best = max(self.best or 0, self.rate)
+        step = self.increase
+        if self.ceiling and self.rate < self.ceiling * RECOVER_RATIO:
+            step *= 2  # 离上次出问题的速度还远，快速恢复
+        self.rate = min(self.max_rate, self.rate + step)
+        FILL_DELAY.set(round(self.delay, 3))
+
+    def backoff(self, reason, detail=""):
+        """出现信号：速度减半，返回需要暂停的秒数"""
+        before = self.delay
+        self.ceiling = self.rate
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        if self.best and self.ceiling <= self.best:
+            self.best = self.rate  # 以前持续过的速度现在也不行了
+        self.clean = 0
+        self.consecutive += 1
+        pause = min(MAX_COOLDOWN, self.cooldown * 2 ** (self.consecutive - 1))
+        self.events.append((time.time(), reason, detail, before, self.delay, pause))
+        self.run_events += 1
+        BACKOFFS.inc(reason=reason)
+        FILL_DELAY.set(round(self.delay, 3))
+        print(f"检测到{REASONS.get(reason, reason)}（{detail}），每步间隔 {before:.2f}s -> {self.delay:.2f}s，暂停 {pause}s")
+        return pause
+
+    def wait_out(self, driver, reason, pause):
+        """暂停 pause 秒；验证码需要操作员处理，等到验证码消失，超时返回 False"""
+        time.sleep(pause)
+        if reason != "captcha":
+            return True
+        print("请在网页上完成验证，完成后会自动继续")
+        end = time.time() + CAPTCHA_TIMEOUT
+        while time.time() < end:
+            found = check_page(driver)
+            if not found or found[0] != "captcha":
+                return True
+            time.sleep(1)
+        print(f"{CAPTCHA_TIMEOUT}s 内没有完成验证")
+        return False
+
+    def per_minute(self):
+        """本次运行的有效速度（个/分钟，包括暂停的时间）"""
+        minutes = (time.time() - self.started) / 60
+        return self.filled / minutes if minutes else 0.0
+
+    def summary(self):
+        counts = {}
+        for event in self.events[len(self.events) - self.run_events:]:
+            counts[event[1]] = counts.get(event[1], 0) + 1
+        text = f"填写 {self.filled} 个地址，有效速度 {self.per_minute():.1f} 个/分钟，当前每步间隔 {self.delay:.2f}s"
+        if self.best:
+            text += f"，无信号的最快间隔 {1 / self.best:.2f}s"
+        if counts:
+            text += "，退避 " + "、".join(f"{REASONS.get(reason, reason)} {count} 次" for reason, count in counts.items())
+        return text
+
+    def print_status(self, last=10):
+        print(self.summary())
+        if self.ceiling:
+            print(f"上次出现信号时的间隔 {1 / self.ceiling:.2f}s")
+        for at, reason, detail, before, after, pause in self.events[-last:]:
+            clock = time.strftime("%H:%M:%S", time.localtime(at))
+            print(f"  {clock} {REASONS.get(reason, reason)}: {detail}  间隔 {before:.2f}s -> {after:.2f}s，暂停 {pause}s")
+
+def parse_delay(text):
+    """pace 指令的间隔参数，必须在 MIN_DELAY 到 MAX_DELAY 之间"""
+    if not re.fullmatch(r"\d+(\.\d+)?", text):
+        return None
+    delay = float(text)
+    return delay if MIN_DELAY <= delay <= MAX_DELAY else None
@@ -0,0 +1,126 @@
+"""
+会话内的标签页池
+
+一个会话（同一个钱包配置）可以同时打开多个代币页面：每个页面放在一个标签页中，按 key（合约地址或任务名）保存。
+再次使用已打开的页面时只切换标签页，不重新加载；标签页数量超过上限时关闭最久没用的。
+会话原来的标签页（主标签页）不属于池，不会被关闭，_do_task 等单页面任务总在主标签页中执行。
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_TABS = 5
+
+class TabPool:
+    """一个 driver 的标签页池: key -> 窗口句柄，按最近使用排序"""
+
+    def __init__(self, driver, max_tabs=DEFAULT_MAX_TABS):
+        self.driver = driver
+        self.max_tabs = max_tabs
+        self.tabs = OrderedDict()  # key -> {"handle": 句柄, "opened_at": 时间, "hits": 切换次数}
+        self.lock = threading.RLock()  # 同一个 driver 同一时间只能操作一个标签页
+        self.home_handle = driver.current_window_handle
+
+    def handles(self):
+        with self.lock:
+            return [tab["handle"] for tab in self.tabs.values()]
+
+    def _switch(self, handle):
+        """切换到句柄，标签页已被关闭返回 False"""
+        try:
+            self.driver.switch_to.window(handle)
+            return True
+        except Exception:
+            return False
+
+    def open(self, key, url=None, loader=None):
+        """切换到 key 的标签页，没有则新开一个并加载，返回 (句柄, 是否新加载)
+
+        loader(driver): 在新标签页中加载页面的函数，返回假值表示失败（关闭该标签页并返回 (None, True)）；
+        不提供时打开 url
+        """
+        with self.lock:
+            tab = self.tabs.get(key)
+            if tab and self._switch(tab["handle"]):
+                self.tabs.move_to_end(key)
+                tab["hits"] += 1
+                return tab["handle"], False
+            if tab:
+                del self.tabs[key]  # 已被用户或内存监控关闭
+            self.driver.switch_to.new_window("tab")
+            handle = self.driver.current_window_handle
+            try:
+                ok = loader(self.driver) if loader else (self.driver.get(url) or True)
+            except Exception:
+                ok = False
+            if not ok:
+                self._close_handle(handle)
+                return None, True
+            self.tabs[key] = {"handle": handle, "opened_at": time.time(), "hits": 0}
+            # 新页面加载成功后才关闭最久没用的，加载失败时不影响已有的标签页
+            if len(self.tabs) > self.max_tabs:
+                while len(self.tabs) > self.max_tabs:
+                    self._close_oldest()
+                self._switch(handle)
+            return handle, True
+
+    def preload(self, items):
+        """预先打开多个标签页，items 为 [(key, url)]，完成后回到主标签页，返回新加载的数量"""
+        loaded = 0
+        with self.lock:
+            for key, url in items:
+                handle, fresh = self.open(key, url)
+                loaded += bool(handle and fresh)
+            self.home()
+        return loaded
+
+    def _close_handle(self, handle):
+        if self._switch(handle):
+            try:
+                self.driver.close()
+            except Exception:
+                pass
+        self.home()
+
+    def _close_oldest(self):
+        key, tab = self.tabs.popitem(last=False)
+        self._close_handle(tab["handle"])
+        print(f"标签页已满，关闭最久没用的 {key}")
+
+    def close(self, key):
+        with self.lock:
+            tab = self.tabs.pop(key, None)
+            if tab:
+                self._close_handle(tab["handle"])
+            return bool(tab)
+
+    def trim(self, keep):
+        """只保留最近使用的 keep 个标签页，返回关闭的数量"""
+        with self.lock:
+            closed = 0
+            while len(self.tabs) > keep:
+                key, tab = self.tabs.popitem(last=False)
+                self._close_handle(tab["handle"])
+                closed += 1
+            return closed
+
+    def home(self):
+        """切换回主标签页；主标签页已被关闭时改用第一个不属于池的标签页，没有则新开一个"""
+        with self.lock:
+            if self._switch(self.home_handle):
+                return
+            pooled = set(self.handles())
+            rest = [handle for handle in self.driver.window_handles if handle not in pooled]
+            if rest:
+                self.home_handle = rest[0]
+                self._switch(self.home_handle)
+            else:
+                self.driver.switch_to.new_window("tab")
+                self.home_handle = self.driver.current_window_handle
+
+    def describe(self):
+        """[(key, 打开秒数, 切换次数)]，按最近使用从新到旧"""
+        now = time.time()
+        with self.lock:
+            return [(key, now - tab["opened_at"], tab["hits"]) for key, tab in reversed(self.tabs.items())]
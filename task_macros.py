@@ -0,0 +1,464 @@
+"""
+录制和回放任务宏
+
+在一个会话中手动操作一遍（点击、输入、等待），录制成宏，之后在任意多个会话中并行回放，不用改 Python 代码。
+- 录制: 在页面中注入脚本记录点击、输入（change / 回车）和页面加载，Python 每 POLL_INTERVAL 秒取回一次；
+  跳转到新页面时脚本通过 Page.addScriptToEvaluateOnNewDocument 自动重新注入，未取回的记录暂存在 sessionStorage（同一个网站内不会丢）
+- 编译: 录制结束时把记录整理成回放计划并保存到 macros/名称.json：
+  点击输入框后输入只保留输入，连续输入同一个框只保留最后的值，输入后回车合并为一步，双击合并为一次点击，
+  点击引起的页面加载不再单独打开；每一步的定位方式（CSS 选择器，找不到时按标签和文字）在录制时就算好
+- 等待: 不按录制时的间隔固定等待，而是等下一步的元素出现就立即执行，录制时的间隔只用来定每一步最长等待多久
+- 参数: 录制时指定 槽位=值，输入的值与它完全相同、或网址中以它为一段（路径或参数值）时换成 {槽位}，
+  回放时可以换成别的值（不指定时使用录制时的值）；定位用的选择器和文字不替换
+- 密码: 密码框输入的值不录制，换成必填的槽位 {password}（有多个密码框时为 password_2 ...），回放时必须指定
+- 回放: 每一步只需要一次浏览器调用（在页面中等待元素、执行操作），多个会话并行执行，输出每一步的耗时
+
+也可以通过调度队列执行: submit macro name=名称 [槽位=值 ...]
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metrics
+from session_scheduler import register_task
+from background_jobs import cancelled, submit_with_job
+
+MACRO_DIR = "macros"
+POLL_INTERVAL = 0.3
+NAVIGATION_WINDOW = 5.0  # 点击或回车后这么多秒内的页面加载视为由它引起
+DOUBLE_CLICK = 0.4
+MIN_TIMEOUT = 5.0  # 每一步最长等待: 录制时间隔的 TIMEOUT_FACTOR 倍，限制在 MIN_TIMEOUT 到 MAX_TIMEOUT 之间
+MAX_TIMEOUT = 30.0
+TIMEOUT_FACTOR = 3
+
+MACRO_STEP_SECONDS = metrics.histogram("chrome_macro_step_seconds", "回放宏时每一步的耗时", ["macro", "action"])
+
+# 在页面中记录操作；window.__macroRecorder.drain() 取出并清空已记录的操作
+RECORDER_SCRIPT = r"""
+(() => {
+    if (window.__macroRecorder) return;
+    const KEY = '__macro_events';
+    let events = [];
+    try { events = JSON.parse(sessionStorage.getItem(KEY) || '[]'); } catch (e) {}
+    let stopped = false;
+    const save = () => { try { sessionStorage.setItem(KEY, JSON.stringify(events)); } catch (e) {} };
+    const push = (event) => { if (stopped) return; event.t = Date.now(); events.push(event); save(); };
+    const unique = (selector) => { try { return document.querySelectorAll(selector).length === 1; } catch (e) { return false; } };
+    const cssPath = (el) => {
+        if (el.id && unique('#' + CSS.escape(el.id))) return '#' + CSS.escape(el.id);
+        for (const attr of ['data-testid', 'name', 'aria-label', 'placeholder']) {
+            const value = el.getAttribute(attr);
+            const selector = value && `${el.tagName.toLowerCase()}[${attr}=${JSON.stringify(value)}]`;
+            if (selector && unique(selector)) return selector;
+        }
+        const parts = [];
+        for (let node = el; node && node.nodeType === 1 && node !== document.body; node = node.parentElement) {
+            if (node.id && unique('#' + CSS.escape(node.id))) { parts.unshift('#' + CSS.escape(node.id)); break; }
+            let part = node.tagName.toLowerCase();
+            const same = node.parentElement ? Array.from(node.parentElement.children).filter(c => c.tagName === node.tagName) : [];
+            if (same.length > 1) part += `:nth-of-type(${same.indexOf(node) + 1})`;
+            parts.unshift(part);
+        }
+        return parts.join(' > ');
+    };
+    const isField = (el) => ['INPUT', 'TEXTAREA', 'SELECT'].includes(el.tagName);
+    const describe = (el) => ({
+        css: cssPath(el),
+        tag: el.tagName.toLowerCase(),
+        text: isField(el) ? '' : (el.innerText || '').trim().slice(0, 40),
+    });
+    document.addEventListener('click', (e) => {
+        const el = e.target.closest('button, a, [role="button"], input, select, textarea, label, [onclick]') || e.target;
+        push({type: 'click', ...describe(el)});
+    }, true);
+    // 密码框只记录输入过，不记录值（记录会保存到 sessionStorage 和宏文件中）
+    const valueOf = (el) => el.type === 'password' ? {secret: true} : {value: el.value};
+    document.addEventListener('change', (e) => {
+        if (isField(e.target)) push({type: 'input', ...valueOf(e.target), ...describe(e.target)});
+    }, true);
+    document.addEventListener('keydown', (e) => {
+        if (e.key === 'Enter' && isField(e.target)) push({type: 'input', ...valueOf(e.target), enter: true, ...describe(e.target)});
+    }, true);
+    window.__macroRecorder = {
+        drain: () => { const out = events.splice(0); save(); return out; },
+        stop: () => { stopped = true; sessionStorage.removeItem(KEY); },
+    };
+    push({type: 'load', url: location.href});
+})();
+"""
+
+DRAIN_SCRIPT = "return window.__macroRecorder ? window.__macroRecorder.drain() : [];"
+STOP_SCRIPT = "if (window.__macroRecorder) { const out = window.__macroRecorder.drain(); window.__macroRecorder.stop(); return out; } return [];"
+
+# 回放一步: 在页面中等待元素出现后执行操作，成功返回 null，否则返回错误说明
+STEP_SCRIPT = r"""
+const step = arguments[0], timeout = arguments[1], done = arguments[arguments.length - 1];
+const shown = (el) => el && el.getClientRects().length > 0;
+const find = () => {
+    let el = null;
+    try { el = step.css ? document.querySelector(step.css) : null; } catch (e) {}
+    if (shown(el)) return el;
+    if (step.text) {
+        el = Array.from(document.querySelectorAll(step.tag || '*')).find(n => shown(n) && (n.innerText || '').trim() === step.text);
+        if (el) return el;
+    }
+    return null;
+};
+const act = (el) => {
+    el.scrollIntoView({block: 'center'});
+    if (step.action === 'click') { el.click(); return; }
+    el.focus();
+    // 用原型上的 setter 赋值，React 等框架才会收到输入
+    const proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : el.tagName === 'SELECT' ? HTMLSelectElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, step.value);
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+    if (step.enter) {
+        const key = {key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true, cancelable: true};
+        const handled = !el.dispatchEvent(new KeyboardEvent('keydown', key));
+        el.dispatchEvent(new KeyboardEvent('keyup', key));
+        if (!handled && el.form) el.form.requestSubmit();
+    }
+};
+const end = Date.now() + timeout;
+(function poll() {
+    const el = find();
+    if (el) {
+        try { act(el); done(null); } catch (e) { done(String(e)); }
+    } else if (Date.now() > end) {
+        done('找不到元素 ' + (step.css || step.text));
+    } else {
+        setTimeout(poll, 100);
+    }
+})();
+"""
+
+def macro_path(name):
+    return os.path.join(MACRO_DIR, f"{name}.json")
+
+def valid_name(name):
+    return bool(re.fullmatch(r"[\w-]+", name))
+
+def load_macro(name):
+    """读取宏，不存在时抛出 ValueError"""
+    path = macro_path(name)
+    if not valid_name(name) or not os.path.exists(path):
+        raise ValueError(f"宏 {name} 不存在")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_macro(plan):
+    os.makedirs(MACRO_DIR, exist_ok=True)
+    path = macro_path(plan["name"])
+    temp_path = path + ".temp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+    return path
+
+def list_macros():
+    if not os.path.isdir(MACRO_DIR):
+        return []
+    return sorted(name[:-5] for name in os.listdir(MACRO_DIR) if name.endswith(".json"))
+
+# ---- 录制 ----
+
+SECRET_SLOT = "password"
+# 网址中被分隔符隔开的一段
+URL_SEGMENT = r"(?<=[/?=&#]){}(?=[/?&#]|$)"
+
+def _step_timeout(gap):
+    return round(min(MAX_TIMEOUT, max(MIN_TIMEOUT, gap * TIMEOUT_FACTOR)), 1)
+
+def _parameterize(step, slot, value):
+    """把步骤中录制时的值换成 {槽位}：输入的值必须完全相同，网址中必须是完整的一段"""
+    placeholder = "{" + slot + "}"
+    if step.get("value") == value and not step.get("secret"):
+        step["value"] = placeholder
+    if "url" in step:
+        step["url"] = re.sub(URL_SEGMENT.format(re.escape(value)), lambda _: placeholder, step["url"])
+
+def secret_slots(steps):
+    """密码框对应的必填槽位"""
+    return [step["value"][1:-1] for step in steps if step.get("secret")]
+
+def compile_events(events, slots=None):
+    """把录制的操作整理成回放计划的步骤，slots: {槽位: 录制时的值}"""
+    steps = []
+    last_at = None  # 上一个保留下来的操作的时间（秒）
+    for event in events:
+        at = event["t"] / 1000
+        gap = at - last_at if last_at is not None else 0.0
+        prev = steps[-1] if steps else None
+        if event["type"] == "load":
+            if prev and prev["action"] != "open" and gap < NAVIGATION_WINDOW:
+                continue  # 点击或回车引起的跳转，回放时下一步会等新页面中的元素出现
+            if prev and prev["action"] == "open" and prev["url"] == event["url"]:
+                continue
+            steps.append({"action": "open", "url": event["url"]})
+            last_at = at
+            continue
+        step = {"action": event["type"], "css": event["css"], "tag": event["tag"], "text": event["text"],
+                "timeout": _step_timeout(gap)}
+        if event["type"] == "input":
+            if event.get("secret"):
+                step["secret"] = True
+                step["value"] = None  # 下面按密码框分配槽位
+            else:
+                step["value"] = event["value"]
+            if event.get("enter"):
+                step["enter"] = True
+        same = prev and prev["action"] != "open" and prev["css"] == step["css"]
+        if same and step["action"] == "input" and prev["action"] == "click":
+            step["timeout"] = max(step["timeout"], prev["timeout"])
+            steps[-1] = step  # 点击输入框后输入: 回放时输入会先聚焦，不需要点击
+        elif same and step["action"] == "input" and prev["action"] == "input":
+            prev["value"] = step["value"]
+            prev["secret"] = prev.get("secret") or step.get("secret")
+            prev["enter"] = prev.get("enter") or step.get("enter")
+        elif same and step["action"] == "click" and prev["action"] == "click" and gap < DOUBLE_CLICK:
+            pass
+        else:
+            steps.append(step)
+        last_at = at
+    secrets = {}  # 密码框的选择器 -> 槽位
+    for step in steps:
+        if not step.get("enter"):
+            step.pop("enter", None)
+        if not step.get("secret"):
+            step.pop("secret", None)
+        else:
+            if step["css"] not in secrets:
+                secrets[step["css"]] = SECRET_SLOT if not secrets else f"{SECRET_SLOT}_{len(secrets) + 1}"
+            step["value"] = "{" + secrets[step["css"]] + "}"
+        for slot, value in (slots or {}).items():
+            if value:
+                _parameterize(step, slot, value)
+    return steps
+
+class MacroRecorder:
+    """在一个会话中录制操作"""
+
+    def __init__(self, driver, name, slots=None, session_id=None):
+        self.driver = driver
+        self.name = name
+        self.slots = slots or {}
+        self.session_id = session_id
+        self.events = []
+        self.script_id = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        result = self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": RECORDER_SCRIPT})
+        self.script_id = result.get("identifier")
+        self.driver.execute_script(RECORDER_SCRIPT)
+
+    def poll(self, script=DRAIN_SCRIPT):
+        try:
+            self.events.extend(self.driver.execute_script(script) or [])
+        except Exception:
+            pass  # 页面正在跳转，下次再取
+
+    def run(self):
+        """一直录制到 stop_event 被设置或后台任务被取消，返回保存的回放计划"""
+        self.start()
+        print(f"开始录制宏 {self.name}，请在浏览器中操作，完成后输入 macro stop")
+        try:
+            while not self.stop_event.wait(POLL_INTERVAL) and not cancelled():
+                self.poll()
+        finally:
+            self.poll(STOP_SCRIPT)
+            if self.script_id:
+                try:
+                    self.driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": self.script_id})
+                except Exception:
+                    pass
+        steps = compile_events(self.events, self.slots)
+        # 密码槽位没有录制时的值（None），回放时必须指定
+        slots = {**self.slots, **{slot: None for slot in secret_slots(steps)}}
+        plan = {
+            "name": self.name,
+            "recorded_from": self.session_id,
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "slots": slots,
+            "events": len(self.events),
+            "steps": steps,
+        }
+        if not any(step["action"] != "open" for step in steps):
+            print("没有录制到任何操作，不保存")
+            return None
+        path = save_macro(plan)
+        print(f"已录制 {len(self.events)} 个操作，整理为 {len(steps)} 步，保存到 {path}")
+        print_plan(plan)
+        return plan
+
+_recording = None
+_recording_lock = threading.Lock()
+
+def record(driver, name, slots=None, session_id=None):
+    """录制宏（阻塞到 stop_recording），同一时间只能录制一个"""
+    global _recording
+    recorder = MacroRecorder(driver, name, slots, session_id)
+    with _recording_lock:
+        if _recording:
+            print(f"正在录制宏 {_recording.name}，请先输入 macro stop")
+            return None
+        _recording = recorder
+    try:
+        return recorder.run()
+    finally:
+        with _recording_lock:
+            _recording = None
+
+def stop_recording():
+    with _recording_lock:
+        if not _recording:
+            return False
+        _recording.stop_event.set()
+        return True
+
+# ---- 回放 ----
+
+def describe_step(step):
+    if step["action"] == "open":
+        return f"open {step['url']}"
+    target = step["css"] if len(step["css"]) <= 40 else f"{step['tag']} \"{step['text']}\"" if step["text"] else "..." + step["css"][-37:]
+    if step["action"] == "click":
+        return f"click {target}"
+    value = "***" if step.get("secret") else repr(step["value"])
+    return f"input {target} = {value}" + (" ⏎" if step.get("enter") else "")
+
+def print_plan(plan):
+    slots = ", ".join(f"{slot}={'<必填>' if value is None else value}" for slot, value in plan.get("slots", {}).items())
+    print(f"宏 {plan['name']}（录制自会话 {plan.get('recorded_from')}，{plan.get('recorded_at')}）" + (f" 槽位: {slots}" if slots else ""))
+    for index, step in enumerate(plan["steps"], start=1):
+        wait = f"  最长等待 {step['timeout']}s" if "timeout" in step else ""
+        print(f"  {index}. {describe_step(step)}{wait}")
+
+def fill_slots(plan, values=None):
+    """用 values（不指定的使用录制时的值）替换步骤中的 {槽位}，返回新的步骤列表"""
+    values = dict(values or {})
+    unknown = [slot for slot in values if slot not in plan.get("slots", {})]
+    if unknown:
+        raise ValueError(f"宏 {plan['name']} 没有槽位: {', '.join(unknown)}（可用: {', '.join(plan.get('slots', {})) or '无'}）")
+    slots = {**plan.get("slots", {}), **values}
+    missing = [slot for slot, value in slots.items() if value is None]
+    if missing:
+        raise ValueError(f"宏 {plan['name']} 需要指定槽位: {', '.join(missing)}（例如 {missing[0]}=...）")
+    steps = []
+    for step in plan["steps"]:
+        step = dict(step)
+        for field in ("url", "value"):
+            if step.get(field):
+                for slot, value in slots.items():
+                    step[field] = step[field].replace("{" + slot + "}", value)
+        steps.append(step)
+    return steps
+
+def run_step(driver, step):
+    """执行一步，成功返回 None，失败返回错误说明"""
+    if step["action"] == "open":
+        try:
+            driver.get(step["url"])
+            return None
+        except Exception as e:
+            return str(e).splitlines()[0] if str(e) else type(e).__name__
+    deadline = time.time() + step["timeout"]
+    driver.set_script_timeout(step["timeout"] + 5)
+    while True:
+        try:
+            return driver.execute_async_script(STEP_SCRIPT, step, int(max(0, deadline - time.time()) * 1000))
+        except Exception as e:
+            # 上一步引起的跳转还没完成时脚本会被中断，新页面出现后重试
+            if time.time() >= deadline:
+                return str(e).splitlines()[0] if str(e) else type(e).__name__
+            time.sleep(0.3)
+
+def replay(driver, plan, values=None, label=""):
+    """在一个会话中回放，返回 (是否成功, [(第几步, 说明, 秒数, 错误)])"""
+    timings = []
+    for index, step in enumerate(fill_slots(plan, values), start=1):
+        if cancelled():
+            print(f"{label}已取消，停在第 {index} 步之前")
+            return False, timings
+        start = time.perf_counter()
+        error = run_step(driver, step)
+        seconds = time.perf_counter() - start
+        timings.append((index, describe_step(step), seconds, error))
+        MACRO_STEP_SECONDS.observe(seconds, macro=plan["name"], action=step["action"])
+        if error:
+            print(f"{label}第 {index} 步失败（{describe_step(step)}）: {error}")
+            return False, timings
+    return True, timings
+
+def _replay_session(manager, session_id, driver, plan, values):
+    # 和 _do_task 一样在主标签页中执行，不改动标签页池中的页面
+    pool = manager.tab_pools.get(session_id)
+    if pool and pool.driver is driver:
+        pool.home()
+    start = time.perf_counter()
+    try:
+        ok, timings = replay(driver, plan, values, label=f"会话 {session_id} ")
+    except Exception as e:
+        print(f"会话 {session_id} 回放出错: {e}")
+        ok, timings = False, []
+    seconds = time.perf_counter() - start
+    print(f"会话 {session_id} {'完成' if ok else '失败'}: {len(timings)}/{len(plan['steps'])} 步，{seconds:.2f}s")
+    return ok, timings, seconds
+
+def replay_parallel(manager, plan, session_ids, values=None, scheduler=None):
+    """在多个会话中并行回放，返回 {会话: (是否成功, 每一步的耗时, 总秒数)}
+
+    scheduler: 回放期间占用这些会话，调度队列不会同时往这些会话分发任务；正在执行任务的会话跳过
+    """
+    fill_slots(plan, values)  # 先检查槽位，不对时一个会话也不启动
+    targets = []
+    for session_id in session_ids:
+        driver = manager.drivers.get(session_id)
+        if not driver:
+            print(f"会话 {session_id} 没有运行，跳过")
+        elif scheduler and not scheduler.reserve(session_id):
+            print(f"会话 {session_id} 正在执行调度任务，跳过")
+        else:
+            targets.append((session_id, driver))
+    if not targets:
+        return {}
+    results = {}
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            futures = {
+                submit_with_job(executor, _replay_session, manager, session_id, driver, plan, values): session_id
+                for session_id, driver in targets
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    finally:
+        if scheduler:
+            for session_id, _ in targets:
+                scheduler.release(session_id)
+    print_timings(plan, results, time.perf_counter() - start)
+    return results
+
+def print_timings(plan, results, wall_seconds):
+    """每一步在各会话中的平均和最长耗时"""
+    print(f"\n宏 {plan['name']} 在 {len(results)} 个会话中回放，成功 {sum(ok for ok, _, _ in results.values())} 个，总用时 {wall_seconds:.2f}s")
+    for index, step in enumerate(plan["steps"], start=1):
+        seconds = [timings[index - 1][2] for _, timings, _ in results.values() if len(timings) >= index]
+        failed = sum(1 for _, timings, _ in results.values() if len(timings) >= index and timings[index - 1][3])
+        if not seconds:
+            print(f"  {index}. {describe_step(step)}  未执行")
+            continue
+        print(f"  {index}. {describe_step(step)}  平均 {sum(seconds) / len(seconds):.2f}s  最长 {max(seconds):.2f}s"
+              + (f"  失败 {failed} 个" if failed else ""))
+
+@register_task("macro")
+def task_macro(manager, session_id, driver, name, **values):
+    """回放录制的宏，name 为宏名称，其余参数为槽位的值"""
+    ok, timings, _ = _replay_session(manager, session_id, driver, load_macro(name), values)
+    print(f"会话 {session_id} 宏 {name} 每一步: " + "，".join(f"{index}. {seconds:.2f}s" for index, _, seconds, _ in timings))
+    return ok
@@ -0,0 +1,244 @@
+"""
+合约地址 -> 代币页面的解析和缓存
+
+pump.fun 的代币页面地址是固定的 https://pump.fun/coin/<合约>，直接打开比在首页搜索
+（输入、点击、等待搜索结果、点击结果）快得多。open_token_page 先直接打开，页面没有出现代币内容时
+再用调用方提供的搜索流程，结果写入带有效期的缓存（token_cache.json）：
+- 直接打开成功的合约在 TTL 内不再检查
+- 直接打开失败（例如新币还没有页面）的合约在 FAILED_TTL 内直接走搜索，不再浪费一次尝试
+每次打开的耗时按方式（direct / search）累计保存在缓存文件中，用来计算每次节省的时间；
+耗时统计不是每次都写文件，最多每 SAVE_INTERVAL 秒写一次，程序退出时写入剩下的
+
+命令行（比较两种方式的耗时）:
+    python token_resolver.py bench [合约] [次数]
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import tempfile
+import threading
+
+import metrics
+
+TOKEN_URL = "https://pump.fun/coin/{mint}"
+CACHE_FILE = "token_cache.json"
+TTL = 7 * 24 * 3600
+FAILED_TTL = 600
+SAVE_INTERVAL = 60  # 只有耗时统计变化时，最多隔多少秒写一次缓存文件
+PAGE_TIMEOUT = 8  # 直接打开后等待代币内容出现的秒数，超过则改用搜索
+
+TOKEN_PAGE_SECONDS = metrics.histogram("token_page_seconds", "打开代币页面的耗时", ["method"])
+
+# 页面上出现买入数量输入框，或正文中出现合约地址，就认为代币页面已打开
+TOKEN_PAGE_SCRIPT = """
+const mint = arguments[0];
+if (document.readyState === 'loading') return false;
+if (document.querySelector('#amount')) return true;
+return !!document.body && document.body.innerText.includes(mint);
+"""
+
+def token_url(mint):
+    return TOKEN_URL.format(mint=mint)
+
+class TokenCache:
+    """合约 -> 代币页面地址，带有效期，多线程共用"""
+
+    def __init__(self, path=CACHE_FILE, ttl=TTL, failed_ttl=FAILED_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.failed_ttl = failed_ttl
+        self.entries = {}  # 合约 -> {"url": 地址或 None（直接打开失败）, "at": 时间}
+        self.timings = {"direct": [0, 0.0], "search": [0, 0.0]}  # 方式 -> [次数, 总秒数]
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # 保证后取的快照后写入
+        self._dirty = False  # 有还没写入文件的耗时统计
+        self._saved_at = time.time()
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.entries = data.get("entries", {})
+                self.timings.update(data.get("timings", {}))
+            except (OSError, ValueError) as e:
+                print(f"代币缓存读取失败，重新开始: {e}")
+
+    def lookup(self, mint):
+        """返回 (是否有未过期的记录, 地址)；地址为 None 表示最近直接打开失败"""
+        with self._lock:
+            entry = self.entries.get(mint)
+        if not entry:
+            return False, None
+        ttl = self.ttl if entry["url"] else self.failed_ttl
+        if time.time() - entry["at"] > ttl:
+            return False, None
+        return True, entry["url"]
+
+    def put(self, mint, url):
+        with self._lock:
+            self.entries[mint] = {"url": url, "at": time.time()}
+        self.save()
+
+    def record(self, method, seconds):
+        with self._lock:
+            count, total = self.timings.setdefault(method, [0, 0.0])
+            self.timings[method] = [count + 1, total + seconds]
+            self._dirty = True
+            due = time.time() - self._saved_at >= SAVE_INTERVAL
+        TOKEN_PAGE_SECONDS.observe(seconds, method=method)
+        if due:
+            self.save()
+
+    def flush(self):
+        """写入还没保存的耗时统计"""
+        if self._dirty:
+            self.save()
+
+    def average(self, method):
+        count, total = self.timings.get(method, [0, 0.0])
+        return total / count if count else None
+
+    def saving(self):
+        """直接打开比搜索平均每次节省的秒数，两种方式都有记录时才能计算"""
+        direct, search = self.average("direct"), self.average("search")
+        if direct is None or search is None:
+            return None
+        return search - direct
+
+    def save(self):
+        """写入缓存文件，返回是否成功；写入失败只提示，不影响已经打开的页面
+
+        每次写入用单独的临时文件，多个进程（例如 main 和会话管理）同时写也不会互相覆盖一半的内容
+        """
+        with self._save_lock:
+            with self._lock:
+                now = time.time()
+                # 顺便丢掉过期的记录
+                entries = {
+                    mint: entry for mint, entry in self.entries.items()
+                    if now - entry["at"] <= (self.ttl if entry["url"] else self.failed_ttl)
+                }
+                data = json.dumps({"entries": entries, "timings": self.timings})
+                self._dirty = False
+                self._saved_at = now
+            temp_path = None
+            try:
+                fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".",
+                                                 suffix=".temp", dir=os.path.dirname(self.path) or ".")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(temp_path, self.path)
+                return True
+            except OSError as e:
+                print(f"代币缓存写入失败: {e}")
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+                with self._lock:
+                    self._dirty = True
+                return False
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def default_cache():
+    """各模块共用的缓存"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TokenCache()
+            atexit.register(_default_cache.flush)
+        return _default_cache
+
+def wait_for_token_page(driver, mint, timeout=PAGE_TIMEOUT):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            if driver.execute_script(TOKEN_PAGE_SCRIPT, mint):
+                return True
+        except Exception:
+            pass
+        time.sleep(0.2)
+    return False
+
+def open_direct(driver, mint, url=None, timeout=PAGE_TIMEOUT, label=""):
+    """直接打开代币页面，页面上出现代币内容返回 True"""
+    try:
+        driver.get(url or token_url(mint))
+    except Exception as e:
+        # 页面加载超时时内容可能已经可用，继续检查
+        print(f"{label}打开代币页面时出错: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+    return wait_for_token_page(driver, mint, timeout)
+
+def open_token_page(driver, mint, search=None, cache=None, label=""):
+    """打开合约对应的代币页面，返回使用的方式 "direct" / "search"，都失败返回 None
+
+    search: 直接打开失败时调用的搜索流程，无参数，成功返回真值
+    label: 输出信息的前缀，例如 "会话 3 "
+    """
+    cache = cache or default_cache()
+    start = time.perf_counter()
+    known, url = cache.lookup(mint)
+    if not known or url:
+        if open_direct(driver, mint, url, label=label):
+            seconds = time.perf_counter() - start
+            if not known:
+                cache.put(mint, driver.current_url if "/coin/" in driver.current_url else token_url(mint))
+            cache.record("direct", seconds)
+            saving = cache.saving()
+            print(f"{label}已直接打开代币页面 ({seconds:.1f}s" + (f"，比搜索平均快 {saving:.1f}s)" if saving is not None else ")"))
+            return "direct"
+        print(f"{label}直接打开代币页面失败，改用搜索")
+        cache.put(mint, None)
+    if not search:
+        return None
+    search_start = time.perf_counter()
+    if not search():
+        return None
+    seconds = time.perf_counter() - search_start
+    cache.record("search", seconds)
+    print(f"{label}已通过搜索打开代币页面 ({seconds:.1f}s)")
+    return "search"
+
+def bench(driver, mint, rounds=3, search=None):
+    """交替用两种方式打开同一个代币页面，打印平均耗时和节省的时间（不使用缓存）"""
+    timings = {"direct": [], "search": []}
+    for _ in range(rounds):
+        start = time.perf_counter()
+        if open_direct(driver, mint):
+            timings["direct"].append(time.perf_counter() - start)
+        if search:
+            start = time.perf_counter()
+            if search():
+                timings["search"].append(time.perf_counter() - start)
+    for method, values in timings.items():
+        if values:
+            print(f"{method}: 平均 {sum(values) / len(values):.2f}s（{len(values)}/{rounds} 次成功）")
+    if timings["direct"] and timings["search"]:
+        saved = sum(timings["search"]) / len(timings["search"]) - sum(timings["direct"]) / len(timings["direct"])
+        print(f"直接打开每次节省 {saved:.2f}s")
+    return timings
+
+def main(argv):
+    if not argv or argv[0] != "bench" or len(argv) < 2:
+        print(__doc__)
+        return 1
+    mint = argv[1]
+    rounds = int(argv[2]) if len(argv) > 2 else 3
+    import pump_auto_buy
+    driver = pump_auto_buy.open_chrome("https://pump.fun")
+    try:
+        pump_auto_buy.handle_initial_popup(driver)
+
+        def search():
+            driver.get("https://pump.fun")
+            return pump_auto_buy.search_and_select_token(driver, mint) and wait_for_token_page(driver, mint)
+
+        bench(driver, mint, rounds, search)
+    finally:
+        driver.quit()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))